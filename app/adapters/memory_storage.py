@@ -0,0 +1,628 @@
+# app/adapters/memory_storage.py
+"""
+In-process storage engine with Firestore semantics, for benchmarks and load tests.
+
+Documents live in plain dicts keyed by collection path, so reads and writes cost
+only CPU. Values are copied on the way in and out (like a network round-trip
+would), server-side sentinels (SERVER_TIMESTAMP, Increment, ArrayUnion, ...)
+are resolved on write, and every call is counted through app.adapters.storage.
+"""
+import contextvars
+import random
+import string
+import threading
+import time
+from datetime import datetime, timezone
+from enum import Enum
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from app.config import settings
+from app.adapters.storage import (
+    _record,
+    SERVER_TIMESTAMP,
+    DELETE_FIELD,
+    Increment,
+    ArrayUnion,
+    ArrayRemove,
+    NotFound,
+    AlreadyExists,
+)
+
+_MISSING = object()
+_ID_CHARS = string.ascii_letters + string.digits
+
+
+def _round_trip() -> None:
+    """Simulated network latency (MEMORY_STORAGE_LATENCY_MS); never called under the store lock."""
+    if settings.MEMORY_STORAGE_LATENCY_MS:
+        time.sleep(settings.MEMORY_STORAGE_LATENCY_MS / 1000)
+
+
+def _auto_id() -> str:
+    return "".join(random.choices(_ID_CHARS, k=20))
+
+
+def _copy(value):
+    # Only containers need copying; everything else stored here is immutable.
+    if isinstance(value, dict):
+        return {k: _copy(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_copy(v) for v in value]
+    return value
+
+
+def _get_field(data: dict, field_path: str):
+    cur: Any = data
+    for part in field_path.split("."):
+        if not isinstance(cur, dict) or part not in cur:
+            return _MISSING
+        cur = cur[part]
+    return cur
+
+
+def _resolve(current, value, now: datetime):
+    if value is SERVER_TIMESTAMP:
+        return now
+    if isinstance(value, Increment):
+        base = current if isinstance(current, (int, float)) else 0
+        return base + value.value
+    if isinstance(value, ArrayUnion):
+        out = list(current) if isinstance(current, list) else []
+        for v in value.values:
+            if v not in out:
+                out.append(v)
+        return out
+    if isinstance(value, ArrayRemove):
+        return [v for v in current if v not in value.values] if isinstance(current, list) else []
+    if isinstance(value, dict):
+        return {k: _resolve(_MISSING, v, now) for k, v in value.items() if v is not DELETE_FIELD}
+    if isinstance(value, list):
+        return [_copy(v) for v in value]
+    return value
+
+
+def _set_field(data: dict, field_path: str, value, now: datetime) -> None:
+    parts = field_path.split(".")
+    cur = data
+    for part in parts[:-1]:
+        nxt = cur.get(part)
+        if not isinstance(nxt, dict):
+            nxt = cur[part] = {}
+        cur = nxt
+    leaf = parts[-1]
+    if value is DELETE_FIELD:
+        cur.pop(leaf, None)
+    else:
+        cur[leaf] = _resolve(cur.get(leaf, _MISSING), value, now)
+
+
+def _merge(target: dict, data: dict, now: datetime) -> None:
+    for key, value in data.items():
+        if isinstance(value, dict) and isinstance(target.get(key), dict):
+            _merge(target[key], value, now)
+        elif value is DELETE_FIELD:
+            target.pop(key, None)
+        else:
+            target[key] = _resolve(target.get(key, _MISSING), value, now)
+
+
+def _sort_key(value):
+    # Firestore orders mixed types by type first; None/missing sort lowest.
+    if value is _MISSING or value is None:
+        return (0, 0)
+    if isinstance(value, bool):
+        return (1, value)
+    if isinstance(value, (int, float)):
+        return (2, value)
+    if isinstance(value, datetime):
+        return (3, value.timestamp())
+    if isinstance(value, str):
+        return (4, value)
+    return (5, str(value))
+
+
+def _matches(value, op: str, expected) -> bool:
+    if value is _MISSING:
+        return False
+    if op == "==":
+        return value == expected
+    if op == "!=":
+        return value != expected and value is not None
+    if op == "in":
+        return value in expected
+    if op == "not-in":
+        return value not in expected and value is not None
+    if op == "array_contains":
+        return isinstance(value, list) and expected in value
+    if op == "array_contains_any":
+        return isinstance(value, list) and any(v in value for v in expected)
+    if value is None or expected is None:
+        return False
+    try:
+        if op == "<":
+            return value < expected
+        if op == "<=":
+            return value <= expected
+        if op == ">":
+            return value > expected
+        if op == ">=":
+            return value >= expected
+    except TypeError:
+        return False
+    raise ValueError(f"Unsupported operator {op!r}")
+
+
+class MemorySnapshot:
+    __slots__ = ("reference", "_data", "update_time")
+
+    def __init__(self, reference: "MemoryDocument", data: Optional[dict], update_time=None):
+        self.reference = reference
+        self._data = data
+        self.update_time = update_time
+
+    @property
+    def exists(self) -> bool:
+        return self._data is not None
+
+    @property
+    def id(self) -> str:
+        return self.reference.id
+
+    def to_dict(self) -> Optional[dict]:
+        return _copy(self._data) if self._data is not None else None
+
+    def get(self, field_path: str):
+        if self._data is None:
+            return None
+        value = _get_field(self._data, field_path)
+        if value is _MISSING:
+            raise KeyError(field_path)
+        return _copy(value)
+
+
+class MemoryQuery:
+    def __init__(self, store: "MemoryStorage", collection_path: Optional[str], group: Optional[str] = None,
+                 filters: Tuple = (), orders: Tuple = (), limit_to: Optional[int] = None,
+                 offset_by: int = 0, cursor: Optional[tuple] = None, fields: Optional[tuple] = None):
+        self._store = store
+        self._collection_path = collection_path
+        self._group = group
+        self._filters = filters
+        self._orders = orders
+        self._limit = limit_to
+        self._offset = offset_by
+        self._cursor = cursor
+        self._fields = fields
+
+    def _clone(self, **changes) -> "MemoryQuery":
+        kw = dict(
+            filters=self._filters, orders=self._orders, limit_to=self._limit,
+            offset_by=self._offset, cursor=self._cursor, fields=self._fields,
+        )
+        kw.update(changes)
+        return MemoryQuery(self._store, self._collection_path, self._group, **kw)
+
+    def where(self, field_path: Optional[str] = None, op_string: Optional[str] = None, value=None,
+              *, filter=None) -> "MemoryQuery":
+        if filter is not None:
+            field_path, op_string, value = filter.field_path, filter.op_string, filter.value
+        return self._clone(filters=self._filters + ((field_path, op_string, value),))
+
+    def order_by(self, field_path: str, direction: str = "ASCENDING") -> "MemoryQuery":
+        return self._clone(orders=self._orders + ((field_path, direction.upper() == "DESCENDING"),))
+
+    def limit(self, count: int) -> "MemoryQuery":
+        return self._clone(limit_to=count)
+
+    def offset(self, count: int) -> "MemoryQuery":
+        return self._clone(offset_by=count)
+
+    def start_after(self, cursor) -> "MemoryQuery":
+        if isinstance(cursor, MemorySnapshot):
+            cursor = (cursor.reference.path, cursor._data or {})
+        elif isinstance(cursor, dict):
+            cursor = (None, cursor)
+        return self._clone(cursor=cursor)
+
+    def select(self, field_paths) -> "MemoryQuery":
+        return self._clone(fields=tuple(field_paths))
+
+    def _row_key(self, path: str, data: dict) -> tuple:
+        key = []
+        for field, desc in self._orders:
+            k = _sort_key(_get_field(data, field))
+            key.append(_Reverse(k) if desc else k)
+        key.append(path)
+        return tuple(key)
+
+    def _run(self) -> List[Tuple[str, dict]]:
+        store = self._store
+        if self._group is not None:
+            sources = [(p, docs) for p, docs in store._collections.items()
+                       if p.rsplit("/", 1)[-1] == self._group]
+        else:
+            docs = store._collections.get(self._collection_path)
+            sources = [(self._collection_path, docs)] if docs else []
+
+        rows = []
+        for coll_path, docs in sources:
+            for doc_id, data in docs.items():
+                if all(_matches(_get_field(data, f), op, v) for f, op, v in self._filters):
+                    rows.append((f"{coll_path}/{doc_id}", data))
+
+        rows.sort(key=lambda r: self._row_key(*r))
+        if self._cursor is not None:
+            cursor_path, cursor_data = self._cursor
+            after = self._row_key(cursor_path or "", cursor_data)
+            if cursor_path is None:
+                after = after[:-1]
+                rows = [r for r in rows if self._row_key(*r)[:-1] > after]
+            else:
+                rows = [r for r in rows if self._row_key(*r) > after]
+        if self._offset:
+            rows = rows[self._offset:]
+        if self._limit is not None:
+            rows = rows[:self._limit]
+        return rows
+
+    def _snapshots(self) -> List[MemorySnapshot]:
+        with self._store._lock:
+            snaps = []
+            for path, data in self._run():
+                if self._fields is not None:
+                    data = {f: data[f] for f in self._fields if f in data}
+                snaps.append(MemorySnapshot(self._store.document(path), _copy(data)))
+        return snaps
+
+    @property
+    def _label(self) -> str:
+        return self._collection_path or f"**/{self._group}"
+
+    def stream(self, transaction=None) -> Iterator[MemorySnapshot]:
+        started = time.perf_counter()
+        snaps = self._snapshots()
+        if transaction is None:
+            _round_trip()
+        _record("read", self._label, max(len(snaps), 1), started, "query")
+        return iter(snaps)
+
+    def get(self, transaction=None) -> List[MemorySnapshot]:
+        return list(self.stream(transaction=transaction))
+
+    def on_snapshot(self, callback):
+        return self._store._watch(self, callback)
+
+
+class _Reverse:
+    __slots__ = ("key",)
+
+    def __init__(self, key):
+        self.key = key
+
+    def __lt__(self, other):
+        return other.key < self.key
+
+    def __gt__(self, other):
+        return other.key > self.key
+
+    def __eq__(self, other):
+        return self.key == other.key
+
+
+class MemoryCollection(MemoryQuery):
+    def __init__(self, store: "MemoryStorage", path: str):
+        super().__init__(store, path)
+        self.path = path
+
+    @property
+    def id(self) -> str:
+        return self.path.rsplit("/", 1)[-1]
+
+    def document(self, document_id: Optional[str] = None) -> "MemoryDocument":
+        return MemoryDocument(self._store, f"{self.path}/{document_id or _auto_id()}")
+
+    def add(self, data: dict, document_id: Optional[str] = None):
+        ref = self.document(document_id)
+        ref.create(data)
+        return ref._store._now(), ref
+
+    def list_documents(self, page_size: Optional[int] = None) -> List["MemoryDocument"]:
+        # Like Firestore, includes "missing" documents that only have subcollections.
+        prefix = self.path + "/"
+        with self._store._lock:
+            ids = dict.fromkeys(self._store._collections.get(self.path, {}))
+            for path in self._store._collections:
+                if path.startswith(prefix):
+                    ids.setdefault(path[len(prefix):].split("/", 1)[0])
+        return [self.document(i) for i in ids]
+
+
+class MemoryDocument:
+    __slots__ = ("_store", "path")
+
+    def __init__(self, store: "MemoryStorage", path: str):
+        self._store = store
+        self.path = path
+
+    def __eq__(self, other) -> bool:
+        return isinstance(other, MemoryDocument) and self.path == other.path
+
+    def __hash__(self) -> int:
+        return hash(self.path)
+
+    def __repr__(self) -> str:
+        return f"MemoryDocument({self.path!r})"
+
+    @property
+    def id(self) -> str:
+        return self.path.rsplit("/", 1)[-1]
+
+    @property
+    def parent(self) -> MemoryCollection:
+        return MemoryCollection(self._store, self.path.rsplit("/", 1)[0])
+
+    def collection(self, name: str) -> MemoryCollection:
+        return MemoryCollection(self._store, f"{self.path}/{name}")
+
+    def get(self, field_paths=None, transaction=None) -> MemorySnapshot:
+        started = time.perf_counter()
+        with self._store._lock:
+            data = self._store._read(self.path)
+            if data is not None and field_paths is not None:
+                data = {f: data[f] for f in field_paths if f in data}
+            snap = MemorySnapshot(self, _copy(data))
+        if transaction is None:  # transactional reads run under the store lock
+            _round_trip()
+        _record("read", self.path, 1, started, "tx_get" if transaction is not None else "get")
+        return snap
+
+    def set(self, data: dict, merge: bool = False):
+        started = time.perf_counter()
+        self._store._apply([("set", self.path, data, merge)])
+        _round_trip()
+        _record("write", self.path, 1, started, "set")
+
+    def create(self, data: dict):
+        started = time.perf_counter()
+        self._store._apply([("create", self.path, data, False)])
+        _round_trip()
+        _record("write", self.path, 1, started, "create")
+
+    def update(self, data: dict):
+        started = time.perf_counter()
+        self._store._apply([("update", self.path, data, False)])
+        _round_trip()
+        _record("write", self.path, 1, started, "update")
+
+    def delete(self):
+        started = time.perf_counter()
+        self._store._apply([("delete", self.path, None, False)])
+        _round_trip()
+        _record("delete", self.path, 1, started, "delete")
+
+    def on_snapshot(self, callback):
+        return self._store._watch(self, callback)
+
+
+class MemoryBatch:
+    _call = "batch"
+
+    def __init__(self, store: "MemoryStorage"):
+        self._store = store
+        self._ops: List[tuple] = []
+
+    def __len__(self) -> int:
+        return len(self._ops)
+
+    def set(self, ref: MemoryDocument, data: dict, merge: bool = False):
+        self._ops.append(("set", ref.path, data, merge))
+
+    def create(self, ref: MemoryDocument, data: dict):
+        self._ops.append(("create", ref.path, data, False))
+
+    def update(self, ref: MemoryDocument, data: dict):
+        self._ops.append(("update", ref.path, data, False))
+
+    def delete(self, ref: MemoryDocument):
+        self._ops.append(("delete", ref.path, None, False))
+
+    def commit(self):
+        if len(self._ops) > 500:
+            raise ValueError("A batch can contain at most 500 writes.")
+        started = time.perf_counter()
+        if self._call == "batch":
+            _round_trip()
+        self._store._apply(self._ops)  # all-or-nothing, like Firestore
+        deletes = sum(1 for op in self._ops if op[0] == "delete")
+        if len(self._ops) - deletes:
+            _record("write", self._call, len(self._ops) - deletes, started, self._call)
+        if deletes:
+            _record("delete", self._call, deletes, started, self._call)
+        self._ops = []
+
+
+class MemoryTransaction(MemoryBatch):
+    _call = "transaction"
+
+    def _run(self, fn, *args, **kwargs):
+        # A single store-wide lock gives serializable transactions without retries.
+        _round_trip()
+        with self._store._lock:
+            self._ops = []
+            result = fn(self, *args, **kwargs)
+            MemoryBatch.commit(self)
+        return result
+
+    def commit(self):
+        raise RuntimeError("Transactions are committed by @transactional")
+
+
+class ChangeType(Enum):
+    """Same members as google.cloud.firestore_v1.watch.ChangeType."""
+    ADDED = 1
+    REMOVED = 2
+    MODIFIED = 3
+
+
+class DocumentChange:
+    """What a listener's `changes` argument holds: the change type and the document after it."""
+    __slots__ = ("type", "document")
+
+    def __init__(self, type: ChangeType, document: MemorySnapshot):
+        self.type = type
+        self.document = document
+
+
+class _Watch:
+    def __init__(self, store: "MemoryStorage", target, callback):
+        self._store = store
+        self.target = target
+        self.callback = callback
+        self._closed = False  # same flag google's Watch exposes
+
+    def unsubscribe(self):
+        self._closed = True
+        self._store._unwatch(self)
+
+    def _fire(self, changed: Optional[List[DocumentChange]] = None):
+        # Firestore delivers snapshots on its own thread; run in a fresh context so
+        # listener reads are not charged to whichever request made the write.
+        contextvars.Context().run(self._deliver, changed)
+
+    def _deliver(self, changed: Optional[List[DocumentChange]]):
+        started = time.perf_counter()
+        if isinstance(self.target, MemoryQuery):
+            snaps, label = self.target._snapshots(), self.target._label
+        else:
+            with self._store._lock:
+                snaps = [MemorySnapshot(self.target, _copy(self._store._read(self.target.path)))]
+            label = self.target.path
+        # Billed like Firestore: the full result once, then only changed documents
+        _record("read", label, max(len(snaps), 1) if changed is None else len(changed), started, "listen")
+        if changed is None:  # the first snapshot lists every document as added
+            changed = [DocumentChange(ChangeType.ADDED, s) for s in snaps if s.exists]
+        self.callback(snaps, changed, self._store._now())
+
+
+class MemoryStorage:
+    """Thread-safe, Firestore-compatible in-memory client."""
+    backend = "memory"
+
+    def __init__(self):
+        self._collections: Dict[str, Dict[str, dict]] = {}
+        self._lock = threading.RLock()
+        self._watches: List[_Watch] = []
+
+    # ---------- public API (mirrors google.cloud.firestore.Client) ----------
+    def collection(self, name: str) -> MemoryCollection:
+        return MemoryCollection(self, name)
+
+    def document(self, path: str) -> MemoryDocument:
+        return MemoryDocument(self, path)
+
+    def collection_group(self, name: str) -> MemoryQuery:
+        return MemoryQuery(self, None, group=name)
+
+    def batch(self) -> MemoryBatch:
+        return MemoryBatch(self)
+
+    def transaction(self) -> MemoryTransaction:
+        return MemoryTransaction(self)
+
+    def get_all(self, refs, field_paths=None, transaction=None) -> Iterator[MemorySnapshot]:
+        refs = list(refs)
+        if not refs:
+            return iter(())
+        started = time.perf_counter()
+        with self._lock:
+            snaps = []
+            for ref in refs:
+                data = self._read(ref.path)
+                if data is not None and field_paths is not None:
+                    data = {f: data[f] for f in field_paths if f in data}
+                snaps.append(MemorySnapshot(ref, _copy(data)))
+        _round_trip()
+        _record("read", "get_all", len(refs), started, "get_all")
+        return iter(snaps)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._collections.clear()
+
+    # ---------- internals ----------
+    @staticmethod
+    def _now() -> datetime:
+        return datetime.now(timezone.utc)
+
+    def _read(self, path: str) -> Optional[dict]:
+        coll, _, doc_id = path.rpartition("/")
+        return self._collections.get(coll, {}).get(doc_id)
+
+    def _apply(self, ops: List[tuple]) -> None:
+        now = self._now()
+        with self._lock:
+            # validate first so a failing op leaves nothing half-written
+            staged: Dict[str, Optional[dict]] = {}
+            for kind, path, data, merge in ops:
+                current = staged[path] if path in staged else self._read(path)
+                if kind == "create":
+                    if current is not None:
+                        raise AlreadyExists(f"Document already exists: {path}")
+                    staged[path] = _resolve(_MISSING, data, now)
+                elif kind == "set":
+                    if merge and current is not None:
+                        merged = _copy(current)
+                        _merge(merged, data, now)
+                        staged[path] = merged
+                    else:
+                        staged[path] = _resolve(_MISSING, data, now)
+                elif kind == "update":
+                    if current is None:
+                        raise NotFound(f"No document to update: {path}")
+                    updated = _copy(current)
+                    for field_path, value in data.items():
+                        _set_field(updated, field_path, value, now)
+                    staged[path] = updated
+                elif kind == "delete":
+                    staged[path] = None
+            kinds: Dict[str, ChangeType] = {}
+            for path, data in staged.items():
+                coll, _, doc_id = path.rpartition("/")
+                existed = doc_id in self._collections.get(coll, {})
+                if data is None and not existed:
+                    continue  # deleting a missing document changes nothing
+                kinds[path] = (ChangeType.REMOVED if data is None
+                               else ChangeType.MODIFIED if existed else ChangeType.ADDED)
+                if data is None:
+                    docs = self._collections.get(coll)
+                    if docs is not None:
+                        docs.pop(doc_id, None)
+                else:
+                    self._collections.setdefault(coll, {})[doc_id] = data
+            watches = list(self._watches)
+        for w in watches:
+            hits = [DocumentChange(kinds[p], MemorySnapshot(self.document(p), _copy(staged[p])))
+                    for p in kinds if self._watch_hit(w, p)]
+            if hits:
+                w._fire(hits)
+
+    @staticmethod
+    def _watch_hit(watch: _Watch, path: str) -> bool:
+        target = watch.target
+        if isinstance(target, MemoryDocument):
+            return target.path == path
+        if target._group is not None:
+            return path.rsplit("/", 2)[-2] == target._group
+        return path.rpartition("/")[0] == target._collection_path
+
+    def _watch(self, target, callback) -> _Watch:
+        w = _Watch(self, target, callback)
+        with self._lock:
+            self._watches.append(w)
+        w._fire()  # initial snapshot, like Firestore
+        return w
+
+    def _unwatch(self, watch: _Watch) -> None:
+        with self._lock:
+            if watch in self._watches:
+                self._watches.remove(watch)
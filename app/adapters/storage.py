@@ -0,0 +1,432 @@
+# app/adapters/storage.py
+"""
+Storage backend shared by every service.
+
+Services talk to a Firestore-shaped client returned by `get_db()`:
+  - collection()/document() references with get/set(merge)/update/delete/create
+  - add(), where()/order_by()/limit()/start_after() queries, stream()/get()
+  - batch(), transaction() + @transactional, collection_group(), get_all()
+  - stream_pages(query, n): cursor-paged iteration for unbounded result sets
+
+Two engines implement it:
+  - "firestore": the real client, wrapped so each call is counted/timed
+  - "memory":    app/adapters/memory_storage.py, same semantics, no network
+
+Pick one with settings.STORAGE_BACKEND (or install a client with `set_db`).
+Every engine reports its operations through `_record`, so callers can count
+reads/writes per call with `count_ops()` or subscribe with `add_op_listener`.
+"""
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import Any, Callable, Iterator, List, Optional
+
+from google.cloud.firestore import (  # re-exported so services don't import firestore directly
+    SERVER_TIMESTAMP,
+    DELETE_FIELD,
+    Increment,
+    ArrayUnion,
+    ArrayRemove,
+)
+from google.api_core.exceptions import NotFound, AlreadyExists
+
+from app.config import settings
+
+
+# --- Operation accounting ----------------------------------------------------
+
+@dataclass(frozen=True)
+class StorageOp:
+    kind: str        # "read" | "write" | "delete"
+    path: str        # document or collection/query path
+    count: int       # documents touched (billed units)
+    duration: float  # seconds spent in the call
+    call: str = ""   # get | tx_get | query | get_all | set | create | update | delete | add | batch | transaction
+
+
+class OpCounter:
+    """Reads/writes/deletes seen while a `count_ops()` block is active."""
+    __slots__ = ("reads", "writes", "deletes", "calls", "seconds")
+
+    def __init__(self):
+        self.reads = 0
+        self.writes = 0
+        self.deletes = 0
+        self.calls = 0
+        self.seconds = 0.0
+
+    def add(self, op: StorageOp) -> None:
+        self.calls += 1
+        self.seconds += op.duration
+        if op.kind == "read":
+            self.reads += op.count
+        elif op.kind == "write":
+            self.writes += op.count
+        elif op.kind == "delete":
+            self.deletes += op.count
+
+    def as_dict(self) -> dict:
+        return {
+            "reads": self.reads,
+            "writes": self.writes,
+            "deletes": self.deletes,
+            "calls": self.calls,
+            "seconds": round(self.seconds, 6),
+        }
+
+    def __repr__(self) -> str:
+        return f"OpCounter({self.as_dict()})"
+
+
+_active_counters: ContextVar[tuple] = ContextVar("storage_op_counters", default=())
+_listeners: List[Callable[[StorageOp], None]] = []
+totals = OpCounter()  # process-wide
+
+
+@contextmanager
+def count_ops() -> Iterator[OpCounter]:
+    """Count storage operations issued inside the block (nested blocks all see them)."""
+    counter = OpCounter()
+    token = _active_counters.set(_active_counters.get() + (counter,))
+    try:
+        yield counter
+    finally:
+        _active_counters.reset(token)
+
+
+def add_op_listener(fn: Callable[[StorageOp], None]) -> None:
+    if fn not in _listeners:
+        _listeners.append(fn)
+
+
+def remove_op_listener(fn: Callable[[StorageOp], None]) -> None:
+    if fn in _listeners:
+        _listeners.remove(fn)
+
+
+def _record(kind: str, path: str, count: int, started: float, call: str = "") -> None:
+    op = StorageOp(kind, path, count, time.perf_counter() - started, call)
+    totals.add(op)
+    for counter in _active_counters.get():
+        counter.add(op)
+    for fn in _listeners:
+        try:
+            fn(op)
+        except Exception:
+            pass  # accounting must never break a storage call
+
+
+# --- Transactions ------------------------------------------------------------
+
+def transactional(fn):
+    """
+    Backend-neutral replacement for `firestore.transactional`.
+    Call the wrapped function with `db.transaction()` as its first argument.
+    """
+    def wrapper(tx, *args, **kwargs):
+        return tx._run(fn, *args, **kwargs)
+    wrapper.__name__ = getattr(fn, "__name__", "transactional")
+    wrapper.__doc__ = fn.__doc__
+    return wrapper
+
+
+def stream_pages(query, page_size: int):
+    """
+    Iterate a query `page_size` documents at a time, resuming after the last
+    snapshot of each page. Keeps one page in memory however large the result.
+    """
+    last = None
+    while True:
+        page = (query.start_after(last) if last is not None else query).limit(page_size).get()
+        yield from page
+        if len(page) < page_size:
+            return
+        last = page[-1]
+
+
+# --- Firestore engine ----------------------------------------------------------
+
+def _unwrap(obj):
+    return getattr(obj, "_raw", obj)
+
+
+def _query_path(raw) -> str:
+    parent = getattr(raw, "_parent", None)
+    if parent is not None and hasattr(parent, "_path"):
+        return "/".join(parent._path)
+    return "/".join(getattr(raw, "_path", ()) or ())
+
+
+class FirestoreSnapshot:
+    __slots__ = ("_raw",)
+
+    def __init__(self, raw):
+        self._raw = raw
+
+    @property
+    def exists(self) -> bool:
+        return self._raw.exists
+
+    @property
+    def id(self) -> str:
+        return self._raw.id
+
+    @property
+    def reference(self) -> "FirestoreDocument":
+        return FirestoreDocument(self._raw.reference)
+
+    @property
+    def update_time(self):
+        return self._raw.update_time
+
+    def to_dict(self) -> Optional[dict]:
+        return self._raw.to_dict()
+
+    def get(self, field_path: str):
+        return self._raw.get(field_path)
+
+
+class FirestoreQuery:
+    def __init__(self, raw):
+        self._raw = raw
+
+    def where(self, *args, **kwargs) -> "FirestoreQuery":
+        return FirestoreQuery(self._raw.where(*args, **kwargs))
+
+    def order_by(self, *args, **kwargs) -> "FirestoreQuery":
+        return FirestoreQuery(self._raw.order_by(*args, **kwargs))
+
+    def limit(self, count: int) -> "FirestoreQuery":
+        return FirestoreQuery(self._raw.limit(count))
+
+    def offset(self, count: int) -> "FirestoreQuery":
+        return FirestoreQuery(self._raw.offset(count))
+
+    def start_after(self, cursor) -> "FirestoreQuery":
+        return FirestoreQuery(self._raw.start_after(_unwrap(cursor)))
+
+    def select(self, field_paths) -> "FirestoreQuery":
+        return FirestoreQuery(self._raw.select(field_paths))
+
+    def stream(self, transaction=None) -> Iterator[FirestoreSnapshot]:
+        started = time.perf_counter()
+        n = 0
+        try:
+            for snap in self._raw.stream(transaction=_unwrap(transaction)):
+                n += 1
+                yield FirestoreSnapshot(snap)
+        finally:
+            # Firestore bills one read for an empty result set
+            _record("read", _query_path(self._raw), max(n, 1), started, "query")
+
+    def get(self, transaction=None) -> List[FirestoreSnapshot]:
+        return list(self.stream(transaction=transaction))
+
+    def on_snapshot(self, callback):
+        def _wrapped(snaps, changes, read_time):
+            callback([FirestoreSnapshot(s) for s in snaps], changes, read_time)
+        return self._raw.on_snapshot(_wrapped)
+
+
+class FirestoreCollection(FirestoreQuery):
+    @property
+    def id(self) -> str:
+        return self._raw.id
+
+    def document(self, document_id: Optional[str] = None) -> "FirestoreDocument":
+        return FirestoreDocument(self._raw.document(document_id))
+
+    def add(self, data: dict, document_id: Optional[str] = None):
+        started = time.perf_counter()
+        update_time, ref = self._raw.add(data, document_id=document_id)
+        _record("write", ref.path, 1, started, "add")
+        return update_time, FirestoreDocument(ref)
+
+    def list_documents(self, page_size: Optional[int] = None):
+        return [FirestoreDocument(r) for r in self._raw.list_documents(page_size=page_size)]
+
+
+class FirestoreDocument:
+    __slots__ = ("_raw",)
+
+    def __init__(self, raw):
+        self._raw = raw
+
+    def __eq__(self, other) -> bool:
+        return isinstance(other, FirestoreDocument) and self.path == other.path
+
+    def __hash__(self) -> int:
+        return hash(self.path)
+
+    @property
+    def id(self) -> str:
+        return self._raw.id
+
+    @property
+    def path(self) -> str:
+        return self._raw.path
+
+    @property
+    def parent(self) -> FirestoreCollection:
+        return FirestoreCollection(self._raw.parent)
+
+    def collection(self, name: str) -> FirestoreCollection:
+        return FirestoreCollection(self._raw.collection(name))
+
+    def get(self, field_paths=None, transaction=None) -> FirestoreSnapshot:
+        started = time.perf_counter()
+        snap = self._raw.get(field_paths=field_paths, transaction=_unwrap(transaction))
+        _record("read", self.path, 1, started, "tx_get" if transaction is not None else "get")
+        return FirestoreSnapshot(snap)
+
+    def set(self, data: dict, merge: bool = False):
+        started = time.perf_counter()
+        res = self._raw.set(data, merge=merge)
+        _record("write", self.path, 1, started, "set")
+        return res
+
+    def create(self, data: dict):
+        started = time.perf_counter()
+        res = self._raw.create(data)
+        _record("write", self.path, 1, started, "create")
+        return res
+
+    def update(self, data: dict):
+        started = time.perf_counter()
+        res = self._raw.update(data)
+        _record("write", self.path, 1, started, "update")
+        return res
+
+    def delete(self):
+        started = time.perf_counter()
+        res = self._raw.delete()
+        _record("delete", self.path, 1, started, "delete")
+        return res
+
+    def on_snapshot(self, callback):
+        def _wrapped(snaps, changes, read_time):
+            callback([FirestoreSnapshot(s) for s in snaps], changes, read_time)
+        return self._raw.on_snapshot(_wrapped)
+
+
+class FirestoreBatch:
+    def __init__(self, raw):
+        self._raw = raw
+        self._writes = 0
+        self._deletes = 0
+
+    def __len__(self) -> int:
+        return self._writes + self._deletes
+
+    def set(self, ref, data: dict, merge: bool = False):
+        self._writes += 1
+        self._raw.set(_unwrap(ref), data, merge=merge)
+
+    def create(self, ref, data: dict):
+        self._writes += 1
+        self._raw.create(_unwrap(ref), data)
+
+    def update(self, ref, data: dict):
+        self._writes += 1
+        self._raw.update(_unwrap(ref), data)
+
+    def delete(self, ref):
+        self._deletes += 1
+        self._raw.delete(_unwrap(ref))
+
+    def commit(self):
+        started = time.perf_counter()
+        res = self._raw.commit()
+        if self._writes:
+            _record("write", "batch", self._writes, started, "batch")
+        if self._deletes:
+            _record("delete", "batch", self._deletes, started, "batch")
+        return res
+
+
+class FirestoreTransaction(FirestoreBatch):
+    def _run(self, fn, *args, **kwargs):
+        from google.cloud.firestore import transactional as _fs_transactional
+
+        @_fs_transactional
+        def _inner(_raw_tx):
+            self._writes = self._deletes = 0  # reset on retry
+            return fn(self, *args, **kwargs)
+
+        started = time.perf_counter()
+        result = _inner(self._raw)
+        if self._writes:
+            _record("write", "transaction", self._writes, started, "transaction")
+        if self._deletes:
+            _record("delete", "transaction", self._deletes, started, "transaction")
+        return result
+
+    def commit(self):
+        raise RuntimeError("Transactions are committed by @transactional")
+
+
+class FirestoreStorage:
+    """Counting facade over a `google.cloud.firestore.Client`."""
+    backend = "firestore"
+
+    def __init__(self, client):
+        self._raw = client
+
+    def collection(self, name: str) -> FirestoreCollection:
+        return FirestoreCollection(self._raw.collection(name))
+
+    def document(self, path: str) -> FirestoreDocument:
+        return FirestoreDocument(self._raw.document(path))
+
+    def collection_group(self, name: str) -> FirestoreQuery:
+        return FirestoreQuery(self._raw.collection_group(name))
+
+    def batch(self) -> FirestoreBatch:
+        return FirestoreBatch(self._raw.batch())
+
+    def transaction(self) -> FirestoreTransaction:
+        return FirestoreTransaction(self._raw.transaction())
+
+    def get_all(self, refs, field_paths=None, transaction=None) -> Iterator[FirestoreSnapshot]:
+        refs = [_unwrap(r) for r in refs]
+        if not refs:
+            return
+        started = time.perf_counter()
+        try:
+            for snap in self._raw.get_all(refs, field_paths=field_paths, transaction=_unwrap(transaction)):
+                yield FirestoreSnapshot(snap)
+        finally:
+            _record("read", "get_all", len(refs), started, "get_all")
+
+
+# --- Selection ---------------------------------------------------------------
+
+_db: Any = None
+
+
+def _build_db():
+    backend = (settings.STORAGE_BACKEND or "firestore").lower()
+    if backend == "memory":
+        from app.adapters.memory_storage import MemoryStorage
+        return MemoryStorage()
+    if backend == "firestore":
+        from firebase_admin import firestore
+        from app.adapters.firebase_client import get_firebase_client
+        get_firebase_client()
+        return FirestoreStorage(firestore.client())
+    raise RuntimeError(f"Unknown STORAGE_BACKEND {backend!r} (expected 'firestore' or 'memory').")
+
+
+def get_db():
+    """Process-wide storage client, built lazily from settings."""
+    global _db
+    if _db is None:
+        _db = _build_db()
+    return _db
+
+
+def set_db(client) -> None:
+    """Install a storage client (e.g. a fresh MemoryStorage for benchmarks)."""
+    global _db
+    _db = client
@@ -0,0 +1,189 @@
+# app/adapters/storage_profiler.py
+"""
+Debug profiler for storage access patterns.
+
+Inside `profile_storage(label)` every storage call is recorded (type, path,
+duration). The profile summarizes counts and flags N+1 patterns:
+  - the same document read more than once
+  - several sibling documents read one-by-one from the same collection
+    (should have been one query or a get_all)
+
+Enable per request/job with STORAGE_PROFILE=true (adds an X-Storage-Ops header
+and a log line), or wrap code in `storage_budget(...)` to fail when a call
+exceeds its read/write budget.
+"""
+import logging
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import Dict, Iterator, List, Optional
+
+from app.adapters.storage import StorageOp, add_op_listener
+
+log = logging.getLogger("storage_profiler")
+
+SIBLING_READ_THRESHOLD = 3  # one-by-one reads from one collection before we call it N+1
+
+_active_profiles: ContextVar[tuple] = ContextVar("storage_profiles", default=())
+
+
+def _is_document_path(path: str) -> bool:
+    return path.count("/") % 2 == 1
+
+
+class StorageProfile:
+    def __init__(self, label: str):
+        self.label = label
+        self.ops: List[StorageOp] = []
+
+    def add(self, op: StorageOp) -> None:
+        self.ops.append(op)
+
+    def totals(self) -> Dict[str, int]:
+        out = {"reads": 0, "writes": 0, "deletes": 0, "calls": len(self.ops)}
+        for op in self.ops:
+            out[op.kind + "s"] += op.count
+        return out
+
+    def by_call(self) -> Dict[str, int]:
+        return dict(Counter(op.call or op.kind for op in self.ops))
+
+    def seconds(self) -> float:
+        return sum(op.duration for op in self.ops)
+
+    def findings(self) -> List[str]:
+        single_reads = [op.path for op in self.ops if op.call == "get" and _is_document_path(op.path)]
+        out = []
+        for path, n in Counter(single_reads).items():
+            if n > 1:
+                out.append(f"repeated read x{n}: {path}")
+        siblings = Counter(path.rsplit("/", 1)[0] for path in set(single_reads))
+        for collection, n in siblings.items():
+            if n >= SIBLING_READ_THRESHOLD:
+                out.append(f"N+1: {n} single-document reads in {collection}/*")
+        return out
+
+    def header_value(self) -> str:
+        t = self.totals()
+        return f"reads={t['reads']};writes={t['writes']};deletes={t['deletes']};calls={t['calls']}"
+
+    def log_line(self) -> str:
+        findings = self.findings()
+        line = f"storage[{self.label}] {self.header_value()} ms={self.seconds() * 1000:.2f} {self.by_call()}"
+        if findings:
+            line += " | " + "; ".join(findings)
+        return line
+
+
+def _on_op(op: StorageOp) -> None:
+    for profile in _active_profiles.get():
+        profile.add(op)
+
+
+add_op_listener(_on_op)
+
+
+@contextmanager
+def profile_storage(label: str) -> Iterator[StorageProfile]:
+    profile = StorageProfile(label)
+    token = _active_profiles.set(_active_profiles.get() + (profile,))
+    try:
+        yield profile
+    finally:
+        _active_profiles.reset(token)
+
+
+# --- Budgets -----------------------------------------------------------------
+
+@dataclass(frozen=True)
+class StorageBudget:
+    reads: int
+    writes: int
+    deletes: int = 0
+    allow_n_plus_one: bool = False
+
+
+class StorageBudgetExceeded(AssertionError):
+    pass
+
+
+# Ceilings per route, checked by the profiling middleware and by load tests.
+# Counted from `loadtest --budgets` and /sync traffic; goal queries are billed
+# per goal returned, so the budgets assume a day of at most DAY_GOALS goals and
+# at most MESSAGE_GOALS goals written by one message.
+DAY_GOALS = 25      # loadtest days reach ~22
+MESSAGE_GOALS = 5   # loadtest messages add 1-4
+
+ROUTE_BUDGETS: Dict[str, StorageBudget] = {
+    # reads: phone binding, user, day doc, today's goals
+    # writes: MessageSid claim + reply, goals, day/week/month rollups + streak; delete: signup session
+    "/webhook/sms": StorageBudget(reads=3 + DAY_GOALS, writes=2 + MESSAGE_GOALS + 4, deletes=1),
+    # reads: device map, user, today's goals for the changes + the unsynced ones
+    # writes: each of today's goals at most once (completion or synced flag), rollups + streak
+    "/sync/{device_id}": StorageBudget(reads=2 + 2 * DAY_GOALS, writes=DAY_GOALS + 4),
+    "/create_user": StorageBudget(reads=0, writes=2),
+}
+
+
+def budget_violations(profile: StorageProfile, budget: StorageBudget) -> List[str]:
+    t = profile.totals()
+    out = []
+    for field in ("reads", "writes", "deletes"):
+        limit = getattr(budget, field)
+        if t[field] > limit:
+            out.append(f"{field} {t[field]} > budget {limit}")
+    if not budget.allow_n_plus_one:
+        out.extend(profile.findings())
+    return out
+
+
+@contextmanager
+def storage_budget(reads: int, writes: int, deletes: int = 0, *, allow_n_plus_one: bool = False,
+                   label: str = "budget") -> Iterator[StorageProfile]:
+    """Raise StorageBudgetExceeded if the block uses more storage than allowed."""
+    budget = StorageBudget(reads, writes, deletes, allow_n_plus_one)
+    with profile_storage(label) as profile:
+        yield profile
+    problems = budget_violations(profile, budget)
+    if problems:
+        raise StorageBudgetExceeded(f"{label}: " + "; ".join(problems))
+
+
+# --- Middleware --------------------------------------------------------------
+
+violations: List[str] = []  # recent budget violations, for tools/tests
+
+
+class StorageProfileMiddleware:
+    """Plain ASGI middleware, like admission.AdmissionMiddleware (no BaseHTTPMiddleware overhead)."""
+
+    def __init__(self, app, budgets: Dict[str, StorageBudget]):
+        self.app = app
+        self.budgets = budgets
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        with profile_storage(f"{scope['method']} {scope['path']}") as profile:
+            async def send_with_header(message):
+                if message["type"] == "http.response.start":
+                    header = (b"x-storage-ops", profile.header_value().encode())
+                    message["headers"] = [*message.get("headers", ()), header]
+                await send(message)
+
+            await self.app(scope, receive, send_with_header)
+        template = getattr(scope.get("route"), "path", scope["path"])
+        profile.label = f"{scope['method']} {template}"
+        budget = self.budgets.get(template)
+        problems = budget_violations(profile, budget) if budget else profile.findings()
+        if problems:
+            violations.append(f"{profile.label}: " + "; ".join(problems))
+            del violations[:-100]
+            log.warning(profile.log_line())
+        else:
+            log.info(profile.log_line())
+
+
+def install_profiling_middleware(app, budgets: Optional[Dict[str, StorageBudget]] = None) -> None:
+    app.add_middleware(StorageProfileMiddleware, budgets=ROUTE_BUDGETS if budgets is None else budgets)
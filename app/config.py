@@ -18,6 +18,71 @@ class Settings(BaseSettings):
     TWILIO_FROM_NUMBER: Optional[str] = None
     PORT: Optional[str] = None  # Railway provides PORT
 
+    # Storage engine: "firestore" (default) or "memory" (benchmarks / load tests)
+    STORAGE_BACKEND: str = "firestore"
+    MEMORY_STORAGE_LATENCY_MS: float = 0  # memory backend only: simulated round-trip per call
+    # Debug: record storage calls per request/job, flag N+1 reads, enforce route budgets
+    STORAGE_PROFILE: bool = False
+
+    # Logging (see app/logging_config.py)
+    LOG_LEVEL: str = "INFO"
+    LOG_LEVELS: Optional[str] = None      # "messaging=DEBUG,routes.sms=WARNING"
+    LOG_SAMPLING: Optional[str] = None    # "messaging.actions=0.1"
+    LOG_FORMAT: str = "json"              # "json" | "text"
+
+    # Outbound SMS rendering (see app/services/utilities/sms_render.py)
+    SMS_LEAN_MODE: bool = False           # GSM-7-safe glyphs, no emoji
+    SMS_SEGMENT_BUDGET: int = 2           # compact replies that would bill more segments
+
+    # Listener-fed cache of active users and today's goals (see app/services/hot_cache.py)
+    HOT_CACHE: bool = False
+    HOT_CACHE_MAX_USERS: int = 1000       # users with a live goals listener
+    HOT_CACHE_IDLE_SECONDS: int = 1800    # drop a user's goals listener after this long unused
+
+    # Rendered "Today's Goals" text, patched on goal writes (see app/services/goal_view.py)
+    GOAL_VIEW_CACHE: bool = True          # validated against days/{date}.version, so safe across instances
+
+    # Inbound SMS worker pool; messages from one user run in order (see app/services/dispatcher.py)
+    DISPATCH_WORKERS: int = 8
+    ACTION_WORKERS: int = 8               # independent actions in one message run in parallel; 0 = one by one
+
+    # Outbound sender pool for broadcasts (see app/services/sender_pool.py)
+    TWILIO_SENDER_NUMBERS: Optional[str] = None         # "+13125550100,+13125550102"; unset = TWILIO_NUMBER only
+    TWILIO_MESSAGING_SERVICE_SID: Optional[str] = None  # send through a Messaging Service instead of from_
+    SENDER_RATE_PER_SECOND: float = 1.0                 # per pool number (long code ~1/s); 0 = unpaced; no pool = unpaced
+
+    # Per-route concurrency caps and wait queues (see app/services/admission.py)
+    ADMISSION_CONTROL: bool = True
+    ADMISSION_LIMITS: Optional[str] = "sms=64:256,sync=32:64,create_user=4:8,export=2:4,import=1:2"  # name=limit:queue
+    ADMISSION_QUEUE_TIMEOUT_MS: int = 2000
+
+    # Inbound SMS token buckets (see app/services/rate_limit.py)
+    RATE_LIMIT_ENABLED: bool = True
+    RATE_LIMITS: Optional[str] = "phone=10:0.2,sid=200:50"  # name=burst:per_second
+    RATE_LIMIT_SHARED: bool = False       # also check hot keys against storage (multi-worker)
+    RATE_LIMIT_REPLY: str = "You're sending messages too quickly. Please wait a minute and try again."
+
+    # Auth/signup sessions (see app/services/auth_session.py)
+    AUTH_SESSION_WRITE_THROUGH: bool = True   # also persist to auth_sessions/* so a YES can reach any instance
+    AUTH_SESSION_SWEEP_SECONDS: int = 60
+
+    # Hourly carry-over of unfinished goals into each user's new day (see app/services/rollover.py)
+    ROLLOVER_ENABLED: bool = True
+    ROLLOVER_LOOKBACK_HOURS: int = 48     # how far back the goals query reaches (covers all timezones)
+    ROLLOVER_MAX_GOALS: int = 50          # goals carried per user per day
+
+    # Sender lookup: phone_bindings/{e164}, else a users.phones query (see app/services/binding_check.py)
+    PHONE_LOOKUP_FALLBACK: bool = True    # turn off once the nightly binding check keeps bindings complete
+    BINDING_CHECK_ENABLED: bool = True
+
+    # Daily archival of old messages/user_responses to local gzip JSONL, then delete (see app/services/retention.py)
+    RETENTION_ENABLED: bool = False       # opt-in: deletes from storage
+    RETENTION_DAYS: int = 365
+    RETENTION_ARCHIVE_DIR: str = "archive"
+
+    # Bearer token for admin endpoints (GET /export/{user_id}, POST /import_users); unset disables them
+    ADMIN_TOKEN: Optional[str] = None
+
     # Required vars (keep required if you want startup to fail when missing)
     TWILIO_NUMBER: str = Field(..., description="Twilio phone number")
     MY_PHONE_NUMBER: str = Field(..., description="My phone number")
@@ -0,0 +1,139 @@
+# app/logging_config.py
+"""
+Structured, non-blocking logging.
+
+Request-path code only enqueues LogRecords; a QueueListener thread formats and
+writes them. Messages stay lazy (`log.debug("x=%s", x)` does no work when DEBUG
+is off, and formatting happens on the listener thread). Every record carries
+the current correlation ID (MessageSid, device ID or job name).
+
+Settings:
+  LOG_LEVEL      root level (default INFO)
+  LOG_LEVELS     per-logger levels, e.g. "messaging=DEBUG,routes.sms=WARNING"
+  LOG_SAMPLING   keep only a fraction of sub-WARNING records per logger,
+                 e.g. "messaging.actions=0.1"
+  LOG_FORMAT     "json" (default) or "text"
+"""
+import json
+import logging
+import logging.handlers
+import queue
+import random
+import sys
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from typing import Dict, Optional
+
+from app.config import settings
+
+correlation_id: ContextVar[Optional[str]] = ContextVar("correlation_id", default=None)
+
+_STD_ATTRS = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime", "correlation_id"}
+_listener: Optional[logging.handlers.QueueListener] = None
+
+
+@contextmanager
+def bind_correlation_id(value: Optional[str]):
+    token = correlation_id.set(value)
+    try:
+        yield
+    finally:
+        correlation_id.reset(token)
+
+
+def _parse_pairs(raw: Optional[str]) -> Dict[str, str]:
+    out = {}
+    for part in (raw or "").split(","):
+        if "=" in part:
+            name, value = part.split("=", 1)
+            out[name.strip()] = value.strip()
+    return out
+
+
+class CorrelationFilter(logging.Filter):
+    """Stamp the caller's correlation ID before the record leaves its context."""
+    def filter(self, record: logging.LogRecord) -> bool:
+        if not hasattr(record, "correlation_id"):
+            record.correlation_id = correlation_id.get()
+        return True
+
+
+class SamplingFilter(logging.Filter):
+    """Keep a fraction of records below WARNING for one logger subtree."""
+    def __init__(self, name: str, rate: float):
+        super().__init__(name)
+        self.rate = rate
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if not super().filter(record) or record.levelno >= logging.WARNING:
+            return True
+        return random.random() < self.rate
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        doc = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+            "correlation_id": getattr(record, "correlation_id", None),
+        }
+        for key, value in vars(record).items():
+            if key not in _STD_ATTRS:
+                doc[key] = value
+        if record.exc_info:
+            doc["exc"] = self.formatException(record.exc_info)
+        return json.dumps(doc, default=str, ensure_ascii=False)
+
+
+class NonBlockingQueueHandler(logging.handlers.QueueHandler):
+    """Never blocks the caller: drops (and counts) records when the queue is full."""
+    dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Leave msg/args untouched so formatting happens on the listener thread.
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            NonBlockingQueueHandler.dropped += 1
+
+
+def setup_logging() -> None:
+    """Route all logging through a background writer thread. Safe to call twice."""
+    global _listener
+    if _listener is not None:
+        return
+
+    sink = logging.StreamHandler(sys.stderr)
+    if (settings.LOG_FORMAT or "json").lower() == "text":
+        sink.setFormatter(logging.Formatter(
+            "%(asctime)s %(levelname)s %(name)s [%(correlation_id)s] %(message)s"))
+    else:
+        sink.setFormatter(JsonFormatter())
+
+    handler = NonBlockingQueueHandler(queue.Queue(maxsize=10_000))
+    handler.addFilter(CorrelationFilter())
+    for name, rate in _parse_pairs(settings.LOG_SAMPLING).items():
+        handler.addFilter(SamplingFilter(name, float(rate)))
+
+    root = logging.getLogger()
+    root.handlers[:] = [handler]
+    root.setLevel((settings.LOG_LEVEL or "INFO").upper())
+    for name, level in _parse_pairs(settings.LOG_LEVELS).items():
+        logging.getLogger(name).setLevel(level.upper())
+
+    _listener = logging.handlers.QueueListener(handler.queue, sink, respect_handler_level=True)
+    _listener.start()
+
+
+def shutdown_logging() -> None:
+    """Flush queued records and stop the writer thread."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
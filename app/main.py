@@ -6,6 +6,15 @@ import os
 # from app.services.utilities.serial_service import SerialServiceAsync
 # from app.services.utilities.serial_noop import NoopSerialService
 from app.services.cron_service import start_scheduler, stop_scheduler
+from app.services import hot_cache, dispatcher, auth_session, messaging_service
+from app.adapters.storage_profiler import install_profiling_middleware
+from app.services.admission import install_admission_control
+from app.config import settings
+from app.logging_config import setup_logging, shutdown_logging
+import logging
+
+setup_logging()
+log = logging.getLogger("main")
 from contextlib import asynccontextmanager
 
 # MODE = (os.getenv("USE_SERIAL", "auto") or "auto").lower()  # "auto" | "true" | "false"
@@ -37,16 +46,25 @@ async def lifespan(app: FastAPI):
         # print(f"[BTN] {'👇 PRESSED' if pressed else '🫳 RELEASED'}")
     # app.state.svc.on_button(log_button_sync)
 
+    # Live view of active users / today's goals (no-op unless HOT_CACHE)
+    hot_cache.start()
+    auth_session.start_sweeper()
+
     # Start the cron scheduler for morning and evening notifications
     start_scheduler()
-    print("📅 Scheduler started for daily notifications")
+    log.info("📅 Scheduler started for daily notifications")
 
     try:
         yield
     finally:
         # Cleanup on shutdown
         stop_scheduler()
-        print("📅 Scheduler stopped")
+        log.info("📅 Scheduler stopped")
+        auth_session.stop_sweeper()
+        hot_cache.stop()
+        dispatcher.shutdown()
+        messaging_service.shutdown_actions()  # after the dispatcher: its workers submit here
+        shutdown_logging()
         # await app.state.svc.close()
 
 app = FastAPI(lifespan=lifespan)
@@ -59,6 +77,13 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+if settings.STORAGE_PROFILE:
+    install_profiling_middleware(app)
+
+# Added last so it runs first: shed before doing any other work
+if settings.ADMISSION_CONTROL:
+    install_admission_control(app)
+
 app.include_router(routes.router)
 
 if __name__== "__main__":
@@ -1,4 +1,5 @@
 from pydantic.dataclasses import dataclass, Field
+from dataclasses import dataclass as slotted, field
 from typing import Optional
 from typing import List
 from datetime import datetime, timezone
@@ -58,6 +59,98 @@ class UserDoc:
     created_at: datetime = Field(default_factory=utcnow)
     updated_at: datetime = Field(default_factory=utcnow)
 
+# --- Hot-path representations -------------------------------------------------
+# Pydantic models above validate at the HTTP boundary. Inside the services we
+# pass these slotted records instead: construction is a plain __init__, and
+# from_doc/to_doc do the only type coercion storage documents need.
+
+@slotted(slots=True)
+class GoalRecord:
+    goal_text: str
+    points: int = 0
+    complete: bool = False
+    synced_to_device: bool = False
+    created_at: Optional[datetime] = None
+    updated_at: Optional[datetime] = None
+    updated_by: Optional[str] = None
+    id: Optional[str] = None  # document id, not stored in the document
+
+    @classmethod
+    def from_doc(cls, data: dict, doc_id: Optional[str] = None) -> "GoalRecord":
+        return cls(
+            str(data.get("goal_text") or ""),
+            int(data.get("points") or 0),
+            bool(data.get("complete", False)),
+            bool(data.get("synced_to_device", False)),
+            data.get("created_at"),
+            data.get("updated_at"),
+            data.get("updated_by"),
+            doc_id,
+        )
+
+    def to_doc(self) -> dict:
+        return {
+            "goal_text": self.goal_text,
+            "points": self.points,
+            "complete": self.complete,
+            "synced_to_device": self.synced_to_device,
+            "created_at": self.created_at,
+            "updated_at": self.updated_at,
+            "updated_by": self.updated_by,
+        }
+
+    def to_model(self) -> Goal:
+        return Goal(**self.to_doc())
+
+
+@slotted(slots=True)
+class UserRecord:
+    user_id: str
+    display_name: Optional[str] = None
+    timezone: str = "America/Chicago"
+    phones: List[str] = field(default_factory=list)
+    devices: List[str] = field(default_factory=list)
+    activated: bool = False
+    created_at: Optional[datetime] = None
+    updated_at: Optional[datetime] = None
+    streak: int = 0                           # see app/services/rollups.py
+    best_streak: int = 0
+    last_complete_day: Optional[str] = None
+    rollover: bool = True                     # carry unfinished goals into the next day
+    rollover_day: Optional[str] = None        # last day goals were carried into
+    sender: Optional[str] = None              # pool number the user last texted (see app/services/sender_pool.py)
+
+    @classmethod
+    def from_doc(cls, data: dict, doc_id: Optional[str] = None) -> "UserRecord":
+        return cls(
+            str(data.get("user_id") or doc_id or ""),
+            data.get("display_name"),
+            data.get("timezone") or "America/Chicago",
+            list(data.get("phones") or ()),
+            list(data.get("devices") or ()),
+            bool(data.get("activated", False)),
+            data.get("created_at"),
+            data.get("updated_at"),
+            int(data.get("streak") or 0),
+            int(data.get("best_streak") or 0),
+            data.get("last_complete_day"),
+            bool(data.get("rollover", True)),
+            data.get("rollover_day"),
+            data.get("sender"),
+        )
+
+    @classmethod
+    def from_model(cls, user: "UserDoc") -> "UserRecord":
+        return cls(user.user_id, user.display_name, user.timezone, list(user.phones), list(user.devices),
+                   user.activated, user.created_at, user.updated_at)
+
+    def to_model(self) -> "UserDoc":
+        return UserDoc(
+            user_id=self.user_id, display_name=self.display_name, timezone=self.timezone,
+            phones=list(self.phones), devices=list(self.devices), activated=self.activated,
+            created_at=self.created_at or utcnow(), updated_at=self.updated_at or utcnow(),
+        )
+
 # Inbound Twilio message
 @dataclass
 class UserMessage:
@@ -66,15 +159,20 @@ class UserMessage:
     timestamp: datetime = Field(default_factory=utcnow)
     uid: Optional[str] = None
 
-@dataclass
+# Parser output; internal only, so no validation
+@slotted(slots=True)
 class MessageActions:
     help: bool = False
     stop: bool = False
     signup: bool = False
     list_goals: bool = False
+    week: bool = False
+    month: bool = False
+    streak: bool = False
+    carry_over: Optional[bool] = None   # "carry on" / "carry off"
     unsubscribe: bool = False
-    mark_done: List[str] = Field(default_factory=list)
-    new_goals: List[str] = Field(default_factory=list)
+    mark_done: List[str] = field(default_factory=list)
+    new_goals: List[dict] = field(default_factory=list)
     device_id: Optional[str] = None
 
 @dataclass
@@ -97,4 +195,14 @@ class DeviceGoalChange:
 @dataclass
 class DeviceSyncPayload:
     changes: List[DeviceGoalChange] = Field(default_factory=list)
-    last_sync_token: Optional[int] = None
\ No newline at end of file
+    last_sync_token: Optional[int] = None
+
+# Hub-fronted devices, synced in one call (POST /sync_batch)
+@dataclass
+class DeviceSyncItem:
+    device_id: str
+    payload: DeviceSyncPayload = Field(default_factory=DeviceSyncPayload)
+
+@dataclass
+class DeviceBatchSyncPayload:
+    devices: List[DeviceSyncItem] = Field(default_factory=list)
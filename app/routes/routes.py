@@ -1,18 +1,26 @@
-from app.models.models import UserDoc, DeviceSyncPayload
+from app.models.models import UserDoc, DeviceSyncPayload, DeviceBatchSyncPayload
 from twilio.twiml.messaging_response import MessagingResponse
 from fastapi import APIRouter, Request, Response, HTTPException
+from fastapi.responses import StreamingResponse
+from fastapi.concurrency import run_in_threadpool
 from app.services.messaging_service import (
     handle_incoming_message, 
     # build_twilml_for_result,
 )
-from app.services.auth_phone import get_or_create_user_for_phone, bind_phone_to_user
+from app.services.auth_phone import bind_phone_to_user
 from app.utilities import normalize_to_e164
 import os
 from twilio.request_validator import RequestValidator
 import logging
 from app.config import settings
-from typing import List
+from typing import List, Optional
 from app.services.firebase_service import sync_user_goals
+from app.services import metrics, rate_limit, export, bulk_import, device_sync
+from app.services.dispatcher import sms_dispatcher, key_for_sender
+from app.logging_config import bind_correlation_id
+import time
+import hmac
+import uuid
 
 
 router = APIRouter()
@@ -50,6 +58,7 @@ async def validate_twilio_request(request: Request):
 
 @router.post("/webhook/sms")
 async def receive_sms(request: Request):
+    started = time.perf_counter()
     try:
         
         # asyncio.create_task(request.app.state.svc.blink_led(2))
@@ -59,22 +68,39 @@ async def receive_sms(request: Request):
         to_number = form.get("To", "")
         message_sid = form.get("MessageSid")
 
-        try:
-            e164 = normalize_to_e164(raw_from)
-        except Exception:
-            resp = MessagingResponse()
-            resp.message("We could not read your phone number. Please try again.")
-            log.warning("Bad From: %r sid=%r", raw_from, message_sid)
-            return Response(content=str(resp), media_type="application/xml", status_code=200)
-
-        result = handle_incoming_message(
-            message=body,
-            phone_number=e164,
-            to_number=to_number,
-            sid=message_sid,
-        )
-        print(f'🚀 Result: {result.message}')
-        return Response(content=str(result), media_type="application/xml", status_code=200)
+        with bind_correlation_id(message_sid):
+            try:
+                e164 = normalize_to_e164(raw_from)
+            except Exception:
+                resp = MessagingResponse()
+                resp.message("We could not read your phone number. Please try again.")
+                log.warning("Bad From: %r sid=%r", raw_from, message_sid)
+                return Response(content=str(resp), media_type="application/xml", status_code=200)
+
+            if settings.RATE_LIMIT_SHARED:  # may run a storage transaction
+                verdict = await run_in_threadpool(rate_limit.check_inbound, e164, message_sid)
+            else:
+                verdict = rate_limit.check_inbound(e164, message_sid)
+            if verdict != rate_limit.ALLOW:
+                resp = MessagingResponse()
+                if verdict == rate_limit.REPLY:
+                    resp.message(settings.RATE_LIMIT_REPLY)
+                return Response(content=str(resp), media_type="application/xml", status_code=200)
+
+            # In order per user, in parallel across users, off the event loop
+            result = await sms_dispatcher().run(
+                key_for_sender(e164),
+                handle_incoming_message,
+                message=body,
+                phone_number=e164,
+                e164=e164,
+                to_number=to_number,
+                sid=message_sid,
+            )
+            with metrics.WEBHOOK_STAGE_SECONDS.time(stage="render_twiml"):
+                content = str(result)
+            log.debug("🚀 Result: %s", content)
+        return Response(content=content, media_type="application/xml", status_code=200)
 
     except HTTPException as he:
         resp = MessagingResponse()
@@ -85,6 +111,8 @@ async def receive_sms(request: Request):
         resp = MessagingResponse()
         resp.message("😵‍💫 Something went wrong...")
         return Response(content=str(resp), media_type="application/xml", status_code=200)
+    finally:
+        metrics.WEBHOOK_SECONDS.observe(time.perf_counter() - started, route="/webhook/sms")
 
 @router.post("/testpath")
 async def test_receive_sms(request: Request, body: str = ""):
@@ -94,7 +122,7 @@ async def test_receive_sms(request: Request, body: str = ""):
         raw_from = "+18478587030"
         body = body.strip()
         to_number = "Tester"
-        message_sid = "SMxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxx"
+        message_sid = "SMtest" + uuid.uuid4().hex  # fresh per call, or idempotency replays the first reply
 
         try:
             e164 = normalize_to_e164(raw_from)
@@ -104,13 +132,17 @@ async def test_receive_sms(request: Request, body: str = ""):
             log.warning("Bad From: %r sid=%r", raw_from, message_sid)
             return Response(content=str(resp), media_type="application/xml", status_code=200)
 
-        result = handle_incoming_message(
+        # Same path as the webhook: in order per user, off the event loop
+        result = await sms_dispatcher().run(
+            key_for_sender(e164),
+            handle_incoming_message,
             message=body,
             phone_number=e164,
+            e164=e164,
             to_number=to_number,
             sid=message_sid,
         )
-        print(f'🚀 Result: {result}')
+        log.debug("🚀 Result: %s", result)
         # twiml = build_twilml_for_result(result)
         return Response(content=str(result), media_type="application/xml", status_code=200)
         # return str(result)
@@ -132,11 +164,58 @@ def create_user(user: UserDoc):
 
 @router.post("/sync/{device_id}")
 def sync_user_goals_route(device_id: str, payload: DeviceSyncPayload):
-    print(f"Received request to sync with device {device_id}")
-    goals = sync_user_goals(device_id=device_id, changes=payload.changes)
+    with bind_correlation_id(device_id):
+        log.debug("Received request to sync with device %s", device_id)
+        goals = sync_user_goals(device_id=device_id, changes=payload.changes)
     return {"goals": goals}
 
+@router.post("/sync_batch")
+def sync_devices_route(payload: DeviceBatchSyncPayload):
+    if len(payload.devices) > device_sync.MAX_DEVICES:
+        raise HTTPException(status_code=413, detail=f"At most {device_sync.MAX_DEVICES} devices per request")
+    results = device_sync.sync_devices([(d.device_id, d.payload.changes) for d in payload.devices])
+    return {"results": results}
+
+def _require_admin(request: Request) -> None:
+    token = settings.ADMIN_TOKEN
+    supplied = request.headers.get("authorization", "").removeprefix("Bearer ").strip()
+    if not token or not hmac.compare_digest(supplied, token):
+        raise HTTPException(status_code=403, detail="Not authorized")
+
+@router.post("/import_users")
+async def import_users_route(request: Request, format: Optional[str] = None, job_id: Optional[str] = None,
+                             activate: bool = False):
+    _require_admin(request)
+    body = await request.body()
+    fmt = format or ("ndjson" if "ndjson" in request.headers.get("content-type", "") else "csv")
+    try:
+        rows = bulk_import.parse_rows(body, fmt)
+    except (ValueError, UnicodeDecodeError) as e:
+        raise HTTPException(status_code=400, detail=f"Could not parse {fmt}: {e}")
+    job_id = job_id or bulk_import.job_id_for(body)
+    result = await run_in_threadpool(bulk_import.import_users, rows, job_id, activated=activate)
+    return result.as_dict()
+
+@router.get("/export/{user_id}")
+def export_user_history(user_id: str, request: Request, format: str = "ndjson"):
+    _require_admin(request)
+    if format not in ("ndjson", "gzip"):
+        raise HTTPException(status_code=400, detail="format must be ndjson or gzip")
+    phones = export.user_phones(user_id)
+    if phones is None:
+        raise HTTPException(status_code=404, detail="User not found")
+    log.info("📦 Exporting history for user %s (%s)", user_id, format)
+    if format == "gzip":
+        return StreamingResponse(export.export_gzip(user_id, phones), media_type="application/gzip",
+                                 headers={"Content-Disposition": f'attachment; filename="{user_id}.ndjson.gz"'})
+    return StreamingResponse(export.export_ndjson(user_id, phones), media_type="application/x-ndjson",
+                             headers={"Content-Disposition": f'attachment; filename="{user_id}.ndjson"'})
+
+@router.get("/metrics")
+def metrics_route():
+    return Response(content=metrics.render_latest(), media_type=metrics.CONTENT_TYPE)
+
 @router.post("/ping")
 def ping():
-    print("Ping")
+    log.debug("Ping")
     return("Ping")
\ No newline at end of file
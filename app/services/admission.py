@@ -0,0 +1,189 @@
+# app/services/admission.py
+"""
+Admission control for the webhook and device routes.
+
+Each route class gets a concurrency limit and a bounded wait queue. A request
+that finds the queue full, or waits longer than ADMISSION_QUEUE_TIMEOUT_MS,
+is shed straight away:
+  - /webhook/sms  -> 200 with a short pre-rendered TwiML "busy" reply
+  - everything else -> 503 with Retry-After
+
+ADMISSION_LIMITS is "name=limit:queue,...", e.g. "sms=64:256,sync=32:64".
+Active/waiting/limit per route and Starlette's worker-thread usage are
+exported on /metrics, so utilization is visible before anything is shed.
+"""
+import asyncio
+import logging
+import time
+from collections import deque
+from typing import Deque, Dict, Optional, Tuple
+
+from fastapi import Response
+from twilio.twiml.messaging_response import MessagingResponse
+
+from app.config import settings
+from app.services.metrics import (
+    ADMISSION_ACTIVE, ADMISSION_WAITING, ADMISSION_LIMIT, ADMISSION_SHED, ADMISSION_WAIT_SECONDS,
+    THREADPOOL_IN_USE, THREADPOOL_SIZE,
+)
+
+log = logging.getLogger("admission")
+
+# Route class by path: exact matches first, then prefixes.
+ROUTE_CLASSES_EXACT = {"/webhook/sms": "sms", "/create_user": "create_user", "/import_users": "import",
+                       "/sync_batch": "sync"}
+ROUTE_CLASSES_PREFIX = (("/sync/", "sync"), ("/export/", "export"))
+
+_busy_twiml: Optional[str] = None
+
+
+def route_class(path: str) -> Optional[str]:
+    name = ROUTE_CLASSES_EXACT.get(path)
+    if name is None:
+        for prefix, cls in ROUTE_CLASSES_PREFIX:
+            if path.startswith(prefix):
+                return cls
+    return name
+
+
+def parse_limits(raw: Optional[str]) -> Dict[str, Tuple[int, int]]:
+    out = {}
+    for part in (raw or "").split(","):
+        if "=" not in part:
+            continue
+        name, spec = part.split("=", 1)
+        limit, _, queue = spec.partition(":")
+        out[name.strip()] = (int(limit), int(queue or 0))
+    return out
+
+
+class Limiter:
+    """Concurrency cap with a bounded FIFO wait queue; lives on the event loop."""
+
+    def __init__(self, name: str, limit: int, queue: int):
+        self.name = name
+        self.limit = max(1, limit)
+        self.queue = max(0, queue)
+        self.active = 0
+        self.shed_since_log = 0
+        self.last_log = 0.0
+        self._waiters: Deque[asyncio.Future] = deque()
+        ADMISSION_LIMIT.set(self.limit, route=name)
+
+    def _gauges(self) -> None:
+        ADMISSION_ACTIVE.set(self.active, route=self.name)
+        ADMISSION_WAITING.set(len(self._waiters), route=self.name)
+
+    async def acquire(self, timeout: float) -> Optional[str]:
+        """None when admitted (call release() later), else the reason it was shed."""
+        if self.active < self.limit and not self._waiters:
+            self.active += 1
+            self._gauges()
+            return None
+        if len(self._waiters) >= self.queue:
+            return "queue_full"
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        self._gauges()
+        started = time.perf_counter()
+        try:
+            await asyncio.wait((waiter,), timeout=timeout)
+        except BaseException:
+            # Caller went away while queued; give back a slot we were handed.
+            self._abandon(waiter)
+            raise
+        ADMISSION_WAIT_SECONDS.observe(time.perf_counter() - started, route=self.name)
+        if waiter.done():
+            return None  # release() handed us its slot
+        self._abandon(waiter)
+        return "timeout"
+
+    def _abandon(self, waiter: asyncio.Future) -> None:
+        if waiter.done() and not waiter.cancelled():
+            self.release()
+            return
+        waiter.cancel()
+        try:
+            self._waiters.remove(waiter)
+        except ValueError:
+            pass
+        self._gauges()
+
+    def note_shed(self, reason: str) -> None:
+        ADMISSION_SHED.inc(route=self.name, reason=reason)
+        self.shed_since_log += 1
+        now = time.monotonic()
+        if now - self.last_log >= 1.0:  # one line per second, not one per shed request
+            log.warning("🚦 Shed %d %s request(s), last for %s: active=%d waiting=%d",
+                        self.shed_since_log, self.name, reason, self.active, len(self._waiters))
+            self.shed_since_log = 0
+            self.last_log = now
+
+    def release(self) -> None:
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)  # slot passes straight to the next in line
+                self._gauges()
+                return
+        self.active -= 1
+        self._gauges()
+
+
+def _busy_sms() -> Response:
+    global _busy_twiml
+    if _busy_twiml is None:
+        resp = MessagingResponse()
+        resp.message("We're busy right now. Please resend your message in a minute.")
+        _busy_twiml = str(resp)
+    return Response(content=_busy_twiml, media_type="application/xml", status_code=200)
+
+
+def _unavailable() -> Response:
+    return Response(content='{"detail":"Server busy, retry shortly"}', media_type="application/json",
+                    status_code=503, headers={"Retry-After": "1"})
+
+
+def _export_threadpool() -> None:
+    try:
+        from anyio import to_thread
+        limiter = to_thread.current_default_thread_limiter()
+    except Exception:
+        return
+    THREADPOOL_IN_USE.set(limiter.borrowed_tokens, pool="starlette")
+    THREADPOOL_SIZE.set(limiter.total_tokens, pool="starlette")
+
+
+class AdmissionMiddleware:
+    """Plain ASGI middleware (BaseHTTPMiddleware costs ~0.5ms per request)."""
+
+    def __init__(self, app, limiters: Dict[str, Limiter], timeout: float):
+        self.app = app
+        self.limiters = limiters
+        self.timeout = timeout
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        _export_threadpool()
+        name = route_class(scope["path"])
+        limiter = self.limiters.get(name) if name else None
+        if limiter is None:
+            return await self.app(scope, receive, send)
+        reason = await limiter.acquire(self.timeout)
+        if reason is not None:
+            limiter.note_shed(reason)
+            response = _busy_sms() if name == "sms" else _unavailable()
+            return await response(scope, receive, send)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            limiter.release()
+
+
+def install_admission_control(app, limits: Optional[Dict[str, Tuple[int, int]]] = None) -> Dict[str, Limiter]:
+    limits = parse_limits(settings.ADMISSION_LIMITS) if limits is None else limits
+    limiters = {name: Limiter(name, limit, queue) for name, (limit, queue) in limits.items()}
+    app.add_middleware(AdmissionMiddleware, limiters=limiters, timeout=settings.ADMISSION_QUEUE_TIMEOUT_MS / 1000)
+    return limiters
@@ -1,12 +1,15 @@
 # app/services/auth_phone.py
 from typing import Optional
+import logging
 
-from firebase_admin import auth, firestore
+from firebase_admin import auth
 from twilio.rest import Client
 
 from app.config import settings
-from app.adapters.firebase_client import get_firebase_client
-from app.utilities import utcnow, normalize_to_e164
+from app.adapters.storage import get_db, transactional, SERVER_TIMESTAMP
+from app.utilities import normalize_to_e164
+from app.services import hot_cache
+from app.services.metrics import twilio_call
 
 
 
@@ -23,57 +26,28 @@ def _get_verify_sid() -> str:
         raise RuntimeError("Missing TWILIO_VERIFY_SID in config.")
     return settings.TWILIO_VERIFY_SID
 
-# Ensure Firebase Admin is initialized before getting a Firestore client
-get_firebase_client()
-database = firestore.client()
+# Storage backend (initializes Firebase Admin when it is Firestore)
+database = get_db()
+log = logging.getLogger("auth_phone")
 
 twilio_client = _get_twilio_client()
 verify_sid = _get_verify_sid()
 
 
 def start_phone_verification(phone_number: str) -> None:
-    twilio_client.verify.v2.services(verify_sid).verifications.create(
-        to=phone_number, channel="sms"
-    )
+    with twilio_call("verify"):
+        twilio_client.verify.v2.services(verify_sid).verifications.create(
+            to=phone_number, channel="sms"
+        )
 
 def check_phone_verification(phone_number: str, code: str) -> bool:
-    res = twilio_client.verify.v2.services(verify_sid).verification_checks.create(
-        to=phone_number, code=code
-    )
+    with twilio_call("verify_check"):
+        res = twilio_client.verify.v2.services(verify_sid).verification_checks.create(
+            to=phone_number, code=code
+        )
     return res.status == "approved"
 
-def get_or_create_user_for_phone(phone_e164: str, display_name: Optional[str] = None) -> str:
-    try:
-        u = auth.get_user_by_phone_number(phone_e164)
-        uid = u.uid
-    except auth.UserNotFoundError:
-        u = auth.create_user(phone_number=phone_e164, display_name=display_name or None)
-        uid = u.uid
-    # Ensure a Firestore profile exists
-    user_ref = database.collection("users").document(uid)
-    snap = user_ref.get()
-    now = utcnow()
-    if not snap.exists:
-        user_ref.set({
-            "user_id": uid,
-            "display_name": display_name,
-            "email": None,
-            "phones": [phone_e164],
-            "timezone": "America/Chicago",
-            "activated": True,
-            "created_at": now,
-            "updated_at": now,
-        })
-    else:
-        # keep phones list in sync
-        data = snap.to_dict() or {}
-        phones = set(data.get("phones") or [])
-        if phone_e164 not in phones:
-            phones.add(phone_e164)
-            user_ref.set({"phones": list(phones), "updated_at": now}, merge=True)
-    return uid
-
-@firestore.transactional
+@transactional
 def tx_fn(tx, phone_ref, user_ref, phone_e164: str, user_id: str) -> None:
     phone_doc = phone_ref.get(transaction=tx)   # ✅ DocumentSnapshot
     user_doc = user_ref.get(transaction=tx)     # ✅ DocumentSnapshot
@@ -88,21 +62,78 @@ def tx_fn(tx, phone_ref, user_ref, phone_e164: str, user_id: str) -> None:
     tx.set(phone_ref, {
         "user_id": user_id,
         "verified": True,
-        "bound_at": firestore.SERVER_TIMESTAMP,
+        "bound_at": SERVER_TIMESTAMP,
         "released_at": None,
-        "last_seen": firestore.SERVER_TIMESTAMP,
+        "last_seen": SERVER_TIMESTAMP,
         "labels": ["primary"]
     }, merge=True)
 
     phones = set((user_doc.to_dict() or {}).get("phones") or [])
     if phone_e164 not in phones:
         phones.add(phone_e164)
-        tx.set(user_ref, {"phones": list(phones), "updated_at": firestore.SERVER_TIMESTAMP}, merge=True)
+        tx.set(user_ref, {"phones": list(phones), "updated_at": SERVER_TIMESTAMP}, merge=True)
+
+
+@transactional
+def signup_tx(tx, phone_ref, user_ref, phone_e164: str, user_id: str, display_name: Optional[str]) -> None:
+    """Profile + binding for a confirmed signup, all-or-nothing."""
+    phone_doc = phone_ref.get(transaction=tx)
+    user_doc = user_ref.get(transaction=tx)
+
+    if phone_doc.exists:
+        data = phone_doc.to_dict() or {}
+        existing_uid = data.get("user_id")
+        if existing_uid and existing_uid != user_id and not data.get("released_at"):
+            raise ValueError("Phone number already bound to another user")
+
+    if user_doc.exists:
+        phones = set((user_doc.to_dict() or {}).get("phones") or [])
+        phones.add(phone_e164)
+        tx.set(user_ref, {"phones": list(phones), "activated": True, "updated_at": SERVER_TIMESTAMP}, merge=True)
+    else:
+        tx.set(user_ref, {
+            "user_id": user_id,
+            "display_name": display_name,
+            "email": None,
+            "phones": [phone_e164],
+            "timezone": "America/Chicago",
+            "activated": True,
+            "created_at": SERVER_TIMESTAMP,
+            "updated_at": SERVER_TIMESTAMP,
+        })
+
+    tx.set(phone_ref, {
+        "user_id": user_id,
+        "verified": True,
+        "bound_at": SERVER_TIMESTAMP,
+        "released_at": None,
+        "last_seen": SERVER_TIMESTAMP,
+        "labels": ["primary"]
+    }, merge=True)
+
+
+def confirm_signup(phone_e164: str, display_name: Optional[str] = None) -> str:
+    """
+    Create the account for a number that replied YES: the Auth user (reused if
+    one already has this number), then profile and binding in one transaction.
+    """
+    try:
+        uid = auth.get_user_by_phone_number(phone_e164).uid
+    except auth.UserNotFoundError:
+        uid = auth.create_user(phone_number=phone_e164, display_name=display_name or None).uid
+    log.info("🆕 Signing up %s as %s", phone_e164, uid)
+    hot_cache.invalidate_user(uid)
+    signup_tx(database.transaction(),
+              database.collection("phone_bindings").document(phone_e164),
+              database.collection("users").document(uid),
+              phone_e164, uid, display_name)
+    return uid
 
 
 def bind_phone_to_user(phone_e164: str, user_id: str) -> None:
     phone_ref = database.collection("phone_bindings").document(phone_e164)
     user_ref = database.collection("users").document(user_id)
-    print(f'📞 Binding {phone_e164} to user {user_id}')
+    log.info("📞 Binding %s to user %s", phone_e164, user_id)
     tx = database.transaction()
+    hot_cache.invalidate_user(user_id)
     response = tx_fn(tx, phone_ref, user_ref, phone_e164, user_id)   # ✅ pass tx as first arg
\ No newline at end of file
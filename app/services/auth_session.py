@@ -1,25 +1,170 @@
 # auth_session.py
+"""
+Short-lived per-phone auth state (signup / verification phase, attempts).
+
+Sessions live in an in-process TTL map, so checks are memory lookups. With
+AUTH_SESSION_WRITE_THROUGH (the default) they are also written to
+`auth_sessions/{e164}` and read from there on a miss, so the YES to a signup
+prompt still counts after a restart or on another instance; `expires_at` is
+a real timestamp there so a Firestore TTL policy on that field deletes stale
+documents. An asyncio
+sweeper (start_sweeper) evicts expired entries from memory.
+"""
+import asyncio
+import logging
+import threading
 from datetime import datetime, timezone, timedelta
-from firebase_admin import firestore
-from app.adapters.firebase_client import get_firebase_client
+from typing import Dict, Optional
+
+from app.adapters.storage import get_db, Increment
+from app.config import settings
 
-get_firebase_client()
-database = firestore.client()
+database = get_db()
+log = logging.getLogger("auth_session")
 
-def now_utc(): 
+def now_utc():
     return datetime.now(timezone.utc)
 
+def _as_datetime(value) -> Optional[datetime]:
+    if isinstance(value, str):  # documents written before expires_at became a timestamp
+        return datetime.fromisoformat(value)
+    return value
+
+
+class SessionStore:
+    """TTL map keyed by E.164, optionally written through to storage."""
+
+    def __init__(self, write_through: bool = False):
+        self.write_through = write_through
+        self._sessions: Dict[str, dict] = {}
+        self._lock = threading.Lock()
+
+    def _ref(self, e164: str):
+        return database.collection("auth_sessions").document(e164)
+
+    def get(self, e164: str, local_only: bool = False) -> Optional[dict]:
+        with self._lock:
+            session = self._sessions.get(e164)
+            if session is not None and session["expires_at"] <= now_utc():
+                del self._sessions[e164]
+                session = None
+            if session is not None:
+                return dict(session)
+        if not self.write_through or local_only:
+            return None
+        doc = self._ref(e164).get()  # another instance may have started it
+        if not doc.exists:
+            return None
+        session = doc.to_dict() or {}
+        session["expires_at"] = _as_datetime(session.get("expires_at"))
+        if not session["expires_at"] or session["expires_at"] <= now_utc():
+            return None
+        with self._lock:
+            self._sessions[e164] = session
+        return dict(session)
+
+    def set(self, e164: str, phase: str, expires_in_minutes: int, attempts: int) -> dict:
+        now = now_utc()
+        session = {
+            "phase": phase,
+            "attempts": attempts,
+            "expires_at": now + timedelta(minutes=expires_in_minutes),
+            "updated_at": now,
+        }
+        with self._lock:
+            self._sessions[e164] = session
+        if self.write_through:
+            self._ref(e164).set(session, merge=True)
+        return dict(session)
+
+    def increment_attempts(self, e164: str) -> int:
+        """Atomically bump attempts; returns the new count (0 if there is no live session)."""
+        with self._lock:
+            session = self._sessions.get(e164)
+            if session is None or session["expires_at"] <= now_utc():
+                return 0
+            session["attempts"] += 1
+            session["updated_at"] = now_utc()
+            attempts = session["attempts"]
+        if self.write_through:
+            self._ref(e164).update({"attempts": Increment(1), "updated_at": now_utc()})
+        return attempts
+
+    def delete(self, e164: str) -> None:
+        with self._lock:
+            self._sessions.pop(e164, None)
+        if self.write_through:
+            self._ref(e164).delete()
+
+    def sweep(self) -> int:
+        """Drop expired sessions from memory; returns how many."""
+        now = now_utc()
+        with self._lock:
+            expired = [k for k, s in self._sessions.items() if s["expires_at"] <= now]
+            for k in expired:
+                del self._sessions[k]
+        return len(expired)
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+
+store = SessionStore(write_through=settings.AUTH_SESSION_WRITE_THROUGH)
+
+_sweeper: Optional[asyncio.Task] = None
+
+async def _sweep_forever(interval: float) -> None:
+    while True:
+        await asyncio.sleep(interval)
+        n = store.sweep()
+        if n:
+            log.debug("🧹 Swept %d expired auth sessions", n)
+
+def start_sweeper(interval: Optional[float] = None) -> None:
+    """Start the expiry sweeper on the running event loop (call from lifespan)."""
+    global _sweeper
+    if _sweeper is None:
+        _sweeper = asyncio.get_running_loop().create_task(
+            _sweep_forever(interval or settings.AUTH_SESSION_SWEEP_SECONDS))
+
+def stop_sweeper() -> None:
+    global _sweeper
+    if _sweeper is not None:
+        _sweeper.cancel()
+        _sweeper = None
+
+
 def get_auth_session(e164: str) -> dict | None:
-    doc = database.collection("auth_sessions").document(e164).get()
-    return doc.to_dict() if doc.exists else None
+    return store.get(e164)
 
 def set_auth_session(e164: str, phase: str, expires_in_minutes: int = 10, attempts: int = 0):
-    database.collection("auth_sessions").document(e164).set({
-        "phase": phase,                   # "awaiting_code"
-        "attempts": attempts,
-        "expires_at": (now_utc() + timedelta(minutes=expires_in_minutes)).isoformat(),
-        "updated_at": now_utc().isoformat(),
-    }, merge=True)
+    return store.set(e164, phase, expires_in_minutes, attempts)   # phase e.g. "awaiting_code"
+
+def increment_auth_attempts(e164: str) -> int:
+    return store.increment_attempts(e164)
 
 def clear_auth_session(e164: str):
-    database.collection("auth_sessions").document(e164).delete()
+    store.delete(e164)
+
+def session_active(session: dict | None, phase: str | None = None) -> bool:
+    """True if the session exists, hasn't expired and (optionally) is in `phase`."""
+    if not session or (phase and session.get("phase") != phase):
+        return False
+    expires_at = _as_datetime(session.get("expires_at"))
+    return bool(expires_at) and expires_at > now_utc()
+
+# --- Signup: unknown number -> "awaiting_signup" -> YES creates the account ---
+
+SIGNUP_PHASE = "awaiting_signup"
+SIGNUP_TTL_MINUTES = 60 * 24
+
+def start_signup(e164: str) -> bool:
+    """
+    Mark a pending signup; False if one was already pending (nothing written).
+    Checks memory only: the webhook has just looked the session up, which
+    loads a stored one, and re-marking a pending signup only extends it.
+    """
+    if session_active(store.get(e164, local_only=True), SIGNUP_PHASE):
+        return False
+    set_auth_session(e164, SIGNUP_PHASE, expires_in_minutes=SIGNUP_TTL_MINUTES)
+    return True
@@ -0,0 +1,143 @@
+# app/services/binding_check.py
+"""
+Keep `phone_bindings` consistent with `users.phones`.
+
+Every inbound message resolves its sender with one read of
+phone_bindings/{e164}; only a missing binding falls back to the
+`users where phones array_contains` query. This check makes that fallback rare:
+
+  pass 1  page through users (phones only) and read their bindings with get_all
+          - missing binding      -> backfilled as unverified (the user still
+                                    confirms with YES, as on the fallback path)
+          - bound to another user -> reported as a conflict
+  pass 2  page through phone_bindings and read their users with get_all
+          - user gone, or phone no longer on the user -> reported as orphaned
+
+Backfills go out in batches of at most 500. Nothing is ever deleted or
+rebound automatically; conflicts and orphans are for a human to look at.
+"""
+import logging
+import time
+from dataclasses import dataclass, field
+from typing import Dict, List
+
+from app.adapters.storage import get_db, stream_pages, SERVER_TIMESTAMP
+from app.services.metrics import BINDING_ISSUES
+
+log = logging.getLogger("binding_check")
+db = get_db()
+
+PAGE_SIZE = 300
+BATCH_LIMIT = 500
+SAMPLE_LIMIT = 100  # issues listed per kind in the report
+
+
+@dataclass
+class BindingReport:
+    users: int = 0
+    phones: int = 0
+    bindings: int = 0
+    backfilled: int = 0
+    missing: List[dict] = field(default_factory=list)
+    conflicts: List[dict] = field(default_factory=list)
+    orphans: List[dict] = field(default_factory=list)
+    counts: Dict[str, int] = field(default_factory=lambda: {"missing": 0, "conflict": 0, "orphan": 0})
+    seconds: float = 0.0
+
+    def note(self, kind: str, samples: List[dict], item: dict) -> None:
+        self.counts[kind] += 1
+        if len(samples) < SAMPLE_LIMIT:
+            samples.append(item)
+
+    def as_dict(self) -> dict:
+        return {"users": self.users, "phones": self.phones, "bindings": self.bindings,
+                "backfilled": self.backfilled, "counts": self.counts, "seconds": round(self.seconds, 3),
+                "missing": self.missing, "conflicts": self.conflicts, "orphans": self.orphans}
+
+
+def _pending_binding(user_id: str) -> dict:
+    return {"user_id": user_id, "verified": False, "bound_at": SERVER_TIMESTAMP,
+            "released_at": None, "last_seen": None, "labels": ["backfill"]}
+
+
+def _check_users(report: BindingReport, fix: bool) -> None:
+    query = db.collection("users").select(["phones"])
+    batch, pending = db.batch(), 0
+    page: List = []
+
+    def check_page():
+        nonlocal batch, pending
+        wanted = {(phone, snap.id) for snap in page for phone in ((snap.to_dict() or {}).get("phones") or [])}
+        refs = [db.collection("phone_bindings").document(phone) for phone, _ in wanted]
+        bindings = {s.id: (s.to_dict() or {}) for s in db.get_all(refs) if s.exists}
+        report.phones += len(wanted)
+        for phone, user_id in sorted(wanted):
+            data = bindings.get(phone)
+            owner = (data or {}).get("user_id")
+            if data is None or (not owner and not data.get("released_at")):
+                report.note("missing", report.missing, {"phone": phone, "user_id": user_id})
+                if fix:
+                    batch.set(db.collection("phone_bindings").document(phone), _pending_binding(user_id), merge=True)
+                    pending += 1
+                    report.backfilled += 1
+                    if pending >= BATCH_LIMIT:
+                        batch.commit()
+                        batch, pending = db.batch(), 0
+            elif owner != user_id and not data.get("released_at"):
+                report.note("conflict", report.conflicts, {"phone": phone, "user_id": user_id, "bound_to": owner})
+
+    for snap in stream_pages(query, PAGE_SIZE):
+        report.users += 1
+        page.append(snap)
+        if len(page) >= PAGE_SIZE:
+            check_page()
+            page = []
+    if page:
+        check_page()
+    if pending:
+        batch.commit()
+
+
+def _check_bindings(report: BindingReport) -> None:
+    page: List = []
+
+    def check_page():
+        owners = {(snap.to_dict() or {}).get("user_id") for snap in page} - {None}
+        refs = [db.collection("users").document(uid) for uid in owners]
+        phones = {s.id: set((s.to_dict() or {}).get("phones") or [])
+                  for s in db.get_all(refs, field_paths=["phones"]) if s.exists}
+        for snap in page:
+            data = snap.to_dict() or {}
+            owner = data.get("user_id")
+            if not owner or data.get("released_at"):
+                continue
+            if owner not in phones:
+                report.note("orphan", report.orphans, {"phone": snap.id, "user_id": owner, "reason": "user missing"})
+            elif snap.id not in phones[owner]:
+                report.note("orphan", report.orphans, {"phone": snap.id, "user_id": owner, "reason": "phone not on user"})
+
+    for snap in stream_pages(db.collection("phone_bindings"), PAGE_SIZE):
+        report.bindings += 1
+        page.append(snap)
+        if len(page) >= PAGE_SIZE:
+            check_page()
+            page = []
+    if page:
+        check_page()
+
+
+def check_bindings(fix: bool = True) -> BindingReport:
+    """Compare users.phones with phone_bindings; backfill missing bindings unless fix=False."""
+    started = time.perf_counter()
+    report = BindingReport()
+    _check_users(report, fix)
+    _check_bindings(report)
+    report.seconds = time.perf_counter() - started
+    for kind, n in report.counts.items():
+        BINDING_ISSUES.set(n, issue=kind)
+    level = logging.WARNING if report.counts["conflict"] or report.counts["orphan"] else logging.INFO
+    log.log(level, "🔗 Binding check: %d users, %d phones, %d bindings; %d missing (%d backfilled), "
+            "%d conflicts, %d orphans in %.1fs", report.users, report.phones, report.bindings,
+            report.counts["missing"], report.backfilled, report.counts["conflict"], report.counts["orphan"],
+            report.seconds)
+    return report
@@ -0,0 +1,219 @@
+# app/services/bulk_import.py
+"""
+Bulk user import from CSV or NDJSON (partner onboarding).
+
+Columns / keys: phone (required), display_name, timezone, email, uid.
+
+Rows are processed in chunks of AUTH_IMPORT_LIMIT:
+  1. phones normalized in bulk; bad phone/timezone, duplicates within the
+     file and phones already bound to another user become row errors
+  2. one `auth.import_users` call for the chunk's accounts
+  3. users/{uid} + phone_bindings/{e164} in batches of 500 writes; users
+     that already exist keep activated/created_at (one get_all per batch)
+  4. progress saved to `imports/{job_id}`
+
+UIDs default to a hash of the phone, so re-running a job (same file => same
+job ID) skips finished chunks, and a chunk that died midway is simply
+written again with the same IDs.
+"""
+import csv
+import hashlib
+import io
+import json
+import logging
+import time
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import List
+from zoneinfo import ZoneInfo
+
+from firebase_admin import auth
+
+from app.adapters.storage import get_db, ArrayUnion, SERVER_TIMESTAMP
+from app.services import hot_cache
+from app.utilities import normalize_many
+
+log = logging.getLogger("bulk_import")
+db = get_db()
+
+AUTH_IMPORT_LIMIT = 1000   # max accounts per auth.import_users call
+BATCH_LIMIT = 500          # Firestore writes per batch (2 per user)
+DEFAULT_TIMEZONE = "America/Chicago"
+
+
+@dataclass
+class ImportResult:
+    job_id: str
+    total: int = 0
+    created: int = 0
+    skipped: int = 0          # rows in chunks finished by an earlier run
+    errors: List[dict] = field(default_factory=list)
+    seconds: float = 0.0
+
+    def as_dict(self) -> dict:
+        return {"job_id": self.job_id, "total": self.total, "created": self.created,
+                "skipped": self.skipped, "failed": len(self.errors), "seconds": round(self.seconds, 3),
+                "errors": self.errors}
+
+
+def parse_rows(data: bytes, fmt: str) -> List[dict]:
+    """CSV (with a header row) or NDJSON into row dicts."""
+    text = data.decode("utf-8-sig")
+    if fmt == "csv":
+        return [dict(r) for r in csv.DictReader(io.StringIO(text))]
+    if fmt == "ndjson":
+        return [json.loads(line) for line in text.splitlines() if line.strip()]
+    raise ValueError(f"Unsupported import format: {fmt}")
+
+
+def job_id_for(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()[:20]
+
+
+def uid_for_phone(e164: str) -> str:
+    return "imp" + hashlib.sha256(e164.encode()).hexdigest()[:25]
+
+
+def _valid_timezone(name: str) -> bool:
+    try:
+        ZoneInfo(name)
+        return True
+    except Exception:
+        return False
+
+
+def _text(row: dict, key: str) -> str:
+    value = row.get(key)
+    return str(value).strip() if value is not None else ""
+
+
+def _validate(rows: List[dict], start: int, seen: set) -> tuple:
+    """(accepted rows with e164/uid filled in, row errors) for one chunk."""
+    phones = normalize_many({_text(r, "phone") for r in rows})
+    accepted, errors = [], []
+    for i, row in enumerate(rows, start):
+        raw = _text(row, "phone")
+        e164 = phones.get(raw)
+        tz = _text(row, "timezone") or DEFAULT_TIMEZONE
+        if not e164:
+            errors.append({"row": i, "phone": raw, "error": "invalid phone"})
+        elif e164 in seen:
+            errors.append({"row": i, "phone": raw, "error": "duplicate phone in file"})
+        elif not _valid_timezone(tz):
+            errors.append({"row": i, "phone": raw, "error": f"unknown timezone {tz}"})
+        else:
+            seen.add(e164)
+            accepted.append({
+                "row": i, "phone": raw, "e164": e164, "timezone": tz,
+                "uid": _text(row, "uid") or uid_for_phone(e164),
+                "display_name": _text(row, "display_name") or None,
+                "email": _text(row, "email") or None,
+            })
+    return accepted, errors
+
+
+def _drop_bound_elsewhere(rows: List[dict], errors: List[dict]) -> List[dict]:
+    """Phones already bound to a different user can't be imported."""
+    refs = [db.collection("phone_bindings").document(r["e164"]) for r in rows]
+    bound = {snap.id: (snap.to_dict() or {}).get("user_id") for snap in db.get_all(refs) if snap.exists}
+    keep = []
+    for r in rows:
+        owner = bound.get(r["e164"])
+        if owner and owner != r["uid"]:
+            errors.append({"row": r["row"], "phone": r["phone"], "error": "phone already bound to another user"})
+        else:
+            keep.append(r)
+    return keep
+
+
+def _import_auth(rows: List[dict], errors: List[dict]) -> List[dict]:
+    records = [auth.ImportUserRecord(uid=r["uid"], phone_number=r["e164"],
+                                     display_name=r["display_name"], email=r["email"]) for r in rows]
+    result = auth.import_users(records)
+    failed = {err.index: err.reason for err in result.errors}
+    for idx, reason in failed.items():
+        r = rows[idx]
+        errors.append({"row": r["row"], "phone": r["phone"], "error": f"auth: {reason}"})
+    return [r for idx, r in enumerate(rows) if idx not in failed]
+
+
+def _write_profiles(rows: List[dict], activated: bool) -> None:
+    """
+    New users get a full profile; users who already exist (a re-run, or a
+    partner file listing someone who signed up) keep their activated flag,
+    created_at and other phones, and only get name/timezone refreshed.
+    """
+    now = datetime.now(timezone.utc)
+    per_batch = BATCH_LIMIT // 2
+    for i in range(0, len(rows), per_batch):
+        chunk = rows[i:i + per_batch]
+        refs = [db.collection("users").document(r["uid"]) for r in chunk]
+        existing = {snap.id for snap in db.get_all(refs, field_paths=["user_id"]) if snap.exists}
+        batch = db.batch()
+        for r, ref in zip(chunk, refs):
+            if r["uid"] in existing:
+                hot_cache.invalidate_user(r["uid"])
+                profile = {"phones": ArrayUnion([r["e164"]]), "timezone": r["timezone"], "updated_at": now}
+                if r["display_name"]:
+                    profile["display_name"] = r["display_name"]
+            else:
+                profile = {
+                    "user_id": r["uid"],
+                    "display_name": r["display_name"],
+                    "phones": [r["e164"]],
+                    "timezone": r["timezone"],
+                    "activated": activated,
+                    "created_at": now,
+                    "updated_at": now,
+                }
+            batch.set(ref, profile, merge=True)
+            batch.set(db.collection("phone_bindings").document(r["e164"]), {
+                "user_id": r["uid"],
+                "verified": True,
+                "bound_at": now,
+                "released_at": None,
+                "last_seen": now,
+                "labels": ["primary"],
+            }, merge=True)
+        batch.commit()
+
+
+def import_users(rows: List[dict], job_id: str, *, activated: bool = False) -> ImportResult:
+    """Import rows in Auth-sized chunks, resuming `imports/{job_id}` if it was started before."""
+    started = time.perf_counter()
+    result = ImportResult(job_id, total=len(rows))
+    job_ref = db.collection("imports").document(job_id)
+    snap = job_ref.get()
+    progress = (snap.to_dict() or {}) if snap.exists else {}
+    resume_at = int(progress.get("next_row") or 0)
+    if resume_at:
+        log.info("📥 Resuming import %s at row %d of %d", job_id, resume_at, len(rows))
+    else:
+        job_ref.set({"total": len(rows), "next_row": 0, "created": 0, "failed": 0,
+                     "status": "running", "started_at": SERVER_TIMESTAMP})
+
+    seen: set = set()
+    for start in range(0, len(rows), AUTH_IMPORT_LIMIT):
+        chunk = rows[start:start + AUTH_IMPORT_LIMIT]
+        accepted, errors = _validate(chunk, start, seen)
+        if start + len(chunk) <= resume_at:
+            result.skipped += len(chunk)  # still validated above so duplicates across chunks are caught
+            continue
+        if accepted:
+            accepted = _drop_bound_elsewhere(accepted, errors)
+        if accepted:
+            accepted = _import_auth(accepted, errors)
+        if accepted:
+            _write_profiles(accepted, activated)
+        result.created += len(accepted)
+        result.errors.extend(errors)
+        job_ref.update({"next_row": start + len(chunk),
+                        "created": int(progress.get("created") or 0) + result.created,
+                        "failed": int(progress.get("failed") or 0) + len(result.errors),
+                        "updated_at": SERVER_TIMESTAMP})
+
+    job_ref.update({"status": "done", "finished_at": SERVER_TIMESTAMP})
+    result.seconds = time.perf_counter() - started
+    log.info("📥 Import %s: %d created, %d failed, %d skipped in %.1fs",
+             job_id, result.created, len(result.errors), result.skipped, result.seconds)
+    return result
@@ -1,25 +1,39 @@
 # app/services/cron_service.py
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
 from apscheduler.triggers.cron import CronTrigger
+import time
 from datetime import datetime
 from zoneinfo import ZoneInfo
 from typing import Optional
 import logging
 
-from firebase_admin import firestore
 from twilio.rest import Client
 
-from app.adapters.firebase_client import get_firebase_client
+from app.adapters.storage import get_db
+from app.adapters.storage_profiler import profile_storage
+from app.logging_config import bind_correlation_id
 from app.config import settings
-from app.models.models import UserDoc
+from app.models.models import UserRecord
+from app.services import hot_cache, sender_pool
 from app.services.firebase_service import get_today_goals_for_user, dicts_to_goals
+from app.services.rollover import run_rollover
+from app.services.retention import run_retention
+from app.services.binding_check import check_bindings
+from app.services.utilities.sms_render import render_sms, glyphs
+from app.services.metrics import (
+    twilio_call,
+    BROADCAST_RECIPIENTS,
+    BROADCAST_FAILURES,
+    BROADCAST_DURATION,
+    BROADCAST_LAST_RUN,
+    ROLLOVER_GOALS,
+)
 
 log = logging.getLogger("cron_service")
 CDT_ZONE = ZoneInfo("America/Chicago")
 
-# Initialize Firebase
-get_firebase_client()
-db = firestore.client()
+# Initialize storage
+db = get_db()
 
 # Initialize Twilio client
 def _get_twilio_client() -> Client:
@@ -33,17 +47,27 @@ twilio_client = _get_twilio_client()
 scheduler: Optional[AsyncIOScheduler] = None
 
 
-def send_sms(to_number: str, message: str):
-    """Send SMS via Twilio"""
+def send_sms(to_number: str, message: str, sender: Optional[str] = None) -> bool:
+    """Send SMS via Twilio (from the user's pool number by default). Returns False (and logs) on failure."""
     try:
-        twilio_client.messages.create(
-            to=to_number,
-            from_=settings.TWILIO_NUMBER,
-            body=message
-        )
-        log.info(f"Sent SMS to {to_number}")
+        with twilio_call("messages"):
+            twilio_client.messages.create(
+                to=to_number,
+                body=render_sms(message, kind="broadcast"),
+                **sender_pool.send_kwargs(sender or sender_pool.sender_for(to_number)),
+            )
+        log.debug("Sent SMS to %s", to_number)
+        return True
     except Exception as e:
-        log.error(f"Failed to send SMS to {to_number}: {e}")
+        log.error("Failed to send SMS to %s: %s", to_number, e)
+        return False
+
+
+def _record_broadcast(job: str, recipients: int, failures: int, started: float) -> None:
+    BROADCAST_RECIPIENTS.set(recipients, job=job)
+    BROADCAST_FAILURES.set(failures, job=job)
+    BROADCAST_DURATION.set(time.perf_counter() - started, job=job)
+    BROADCAST_LAST_RUN.set(time.time(), job=job)
 
 
 def build_morning_message() -> str:
@@ -60,16 +84,17 @@ You can include points with your goals to set priorities:
 Send multiple goals on separate lines."""
 
 
-def build_evening_message(user: UserDoc) -> str:
+def build_evening_message(user: UserRecord) -> str:
     """Build the evening check-in message with current goal status"""
     try:
-        today_goals = get_today_goals_for_user(user)
+        today_goals = get_today_goals_for_user(user, subscribe=False)
 
         if not today_goals:
             pass
         goals_list = []
+        gl = glyphs()
         for goal in today_goals:
-            status = "✓" if goal.complete else "▢"
+            status = gl["done"] if goal.complete else gl["todo"]
             goals_list.append(f"{status} {goal.goal_text} ({goal.points} pt)")
 
         goals_text = "\n".join(goals_list)
@@ -98,24 +123,16 @@ How did your day go? Text me any updates!"""
 
 def get_active_users():
     """Get all users who have notifications enabled (activated = True)"""
+    cached = hot_cache.active_users()
+    if cached is not None:
+        return cached
     try:
         users_ref = db.collection("users").where("activated", "==", True)
         docs = users_ref.stream()
 
         users = []
         for doc in docs:
-            data = doc.to_dict() or {}
-            user = UserDoc(
-                user_id=data.get("user_id", doc.id),
-                display_name=data.get("display_name"),
-                email=data.get("email"),
-                timezone=data.get("timezone", "America/Chicago"),
-                phones=data.get("phones", []),
-                activated=data.get("activated", False),
-                created_at=data.get("created_at"),
-                updated_at=data.get("updated_at"),
-            )
-            users.append(user)
+            users.append(UserRecord.from_doc(doc.to_dict() or {}, doc.id))
 
         return users
     except Exception as e:
@@ -123,43 +140,89 @@ def get_active_users():
         return []
 
 
+def _recipients(users, message_for):
+    """(primary phone, sticky sender, message) for each user with a phone."""
+    for user in users:
+        if not user.phones:
+            log.warning("User %s has no phone numbers", user.user_id)
+            continue
+        yield user.phones[0], user.sender, message_for(user)
+
+
+def _profiled(job):
+    """Tag the job's log records with its name; log a storage profile when STORAGE_PROFILE is on."""
+    def wrapper():
+        with bind_correlation_id(job.__name__):
+            if not settings.STORAGE_PROFILE:
+                return job()
+            with profile_storage(job.__name__) as profile:
+                result = job()
+            log.info(profile.log_line())
+            return result
+    wrapper.__name__ = job.__name__
+    return wrapper
+
+
+@_profiled
 def morning_job():
     """Send morning prompts to all active users"""
     log.info("Running morning job")
-
+    started = time.perf_counter()
     users = get_active_users()
     message = build_morning_message()
 
-    for user in users:
-        if not user.phones:
-            log.warning(f"User {user.user_id} has no phone numbers")
-            continue
-
-        # Send to primary phone (first in list)
-        primary_phone = user.phones[0]
-        send_sms(primary_phone, message)
+    # One paced lane per sender number; primary phone (first in list) only
+    failures = sender_pool.broadcast(_recipients(users, lambda user: message), send_sms)
 
+    _record_broadcast("morning", len(users), failures, started)
     log.info(f"Morning job completed - sent to {len(users)} users")
 
 
+@_profiled
 def evening_job():
     """Send evening check-in to all active users"""
     log.info("Running evening job")
-
+    started = time.perf_counter()
     users = get_active_users()
 
-    for user in users:
-        if not user.phones:
-            log.warning(f"User {user.user_id} has no phone numbers")
-            continue
+    # Each message is built in its sender's lane, so the goal reads overlap too
+    failures = sender_pool.broadcast(
+        _recipients(users, lambda user: lambda: build_evening_message(user)), send_sms)
 
-        message = build_evening_message(user)
+    _record_broadcast("evening", len(users), failures, started)
+    log.info(f"Evening job completed - sent to {len(users)} users")
 
-        # Send to primary phone (first in list)
-        primary_phone = user.phones[0]
-        send_sms(primary_phone, message)
 
-    log.info(f"Evening job completed - sent to {len(users)} users")
+@_profiled
+def rollover_job():
+    """Carry unfinished goals into the new day for users past local midnight"""
+    if not settings.ROLLOVER_ENABLED:
+        return
+    started = time.perf_counter()
+    users, goals, failed = run_rollover()
+    ROLLOVER_GOALS.inc(goals)
+    _record_broadcast("rollover", users, failed, started)
+    log.info(f"Rollover job completed - carried {goals} goals for {users} users")
+
+
+@_profiled
+def retention_job():
+    """Archive and delete inbound-message records past the retention window"""
+    if not settings.RETENTION_ENABLED:
+        return
+    started = time.perf_counter()
+    results = run_retention()
+    _record_broadcast("retention", sum(s.deleted for s in results), 0, started)
+
+
+@_profiled
+def binding_check_job():
+    """Backfill missing phone bindings and report conflicting/orphaned ones"""
+    if not settings.BINDING_CHECK_ENABLED:
+        return
+    started = time.perf_counter()
+    report = check_bindings()
+    _record_broadcast("binding_check", report.backfilled, report.counts["conflict"] + report.counts["orphan"], started)
 
 
 def start_scheduler():
@@ -181,8 +244,20 @@ def start_scheduler():
     evening_trigger = CronTrigger(hour=18, minute=0, timezone=CDT_ZONE)
     scheduler.add_job(evening_job, evening_trigger, id="evening_prompt")
 
+    # Goal rollover hourly, since users cross midnight in their own timezones
+    rollover_trigger = CronTrigger(minute=5, timezone=CDT_ZONE)
+    scheduler.add_job(rollover_job, rollover_trigger, id="goal_rollover", max_instances=1, coalesce=True)
+
+    # Retention/archival once a night
+    retention_trigger = CronTrigger(hour=3, minute=30, timezone=CDT_ZONE)
+    scheduler.add_job(retention_job, retention_trigger, id="retention", max_instances=1, coalesce=True)
+
+    # Phone binding consistency check once a night
+    binding_trigger = CronTrigger(hour=4, minute=0, timezone=CDT_ZONE)
+    scheduler.add_job(binding_check_job, binding_trigger, id="binding_check", max_instances=1, coalesce=True)
+
     scheduler.start()
-    log.info("Scheduler started with morning (9:00 AM) and evening (6:00 PM) jobs")
+    log.info("Scheduler started with morning (9:00 AM), evening (6:00 PM), hourly rollover and nightly retention/binding-check jobs")
 
 
 def stop_scheduler():
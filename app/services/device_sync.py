@@ -0,0 +1,156 @@
+# app/services/device_sync.py
+"""
+Batch sync for hubs that front many devices (POST /sync_batch).
+
+Each device gets what POST /sync/{device_id} would give it, but for the whole
+batch:
+  1. device_map/{id} for every device in one get_all
+  2. users not in the hot cache in one get_all
+  3. today's goals read once per user (devices of one user share the read and
+     all get the goals not yet synced)
+  4. device changes (with their rollups, as in apply_device_changes) and
+     synced flags for every user written in combined batches of at most 500
+so a hub's cost grows with the users behind it, not with its devices.
+
+Changes naming a goal that isn't in today's list are skipped and reported
+back (a single bad ID would otherwise fail the whole combined batch).
+"""
+import logging
+from collections import defaultdict
+from typing import Dict, List, Tuple
+
+from app.adapters.storage import get_db
+from app.models.models import UserRecord, DeviceGoalChange
+from app.services import hot_cache
+from app.services.firebase_service import (
+    get_today_date_key, get_today_goal_snapshots, stage_device_changes, device_changes_applied,
+)
+
+log = logging.getLogger("device_sync")
+db = get_db()
+
+BATCH_LIMIT = 500
+MAX_DEVICES = 500  # per request
+
+
+def _resolve_devices(device_ids: List[str]) -> Dict[str, str]:
+    refs = [db.collection("device_map").document(d) for d in device_ids]
+    return {s.id: (s.to_dict() or {}).get("user_id") for s in db.get_all(refs) if s.exists}
+
+
+def _load_users(user_ids: List[str]) -> Dict[str, UserRecord]:
+    users, missing = {}, []
+    for uid in user_ids:
+        cached = hot_cache.get_user(uid)
+        if cached is not None:
+            users[uid] = cached
+        else:
+            missing.append(uid)
+    if missing:
+        refs = [db.collection("users").document(uid) for uid in missing]
+        for snap in db.get_all(refs):
+            if snap.exists:
+                users[snap.id] = UserRecord.from_doc(snap.to_dict() or {}, snap.id)
+    return users
+
+
+class _Ops(list):
+    """Batch-shaped recorder, so one user's writes can be packed with others' in _commit."""
+
+    def update(self, ref, data) -> None:
+        self.append(("update", ref, data, {}))
+
+    def set(self, ref, data, **kwargs) -> None:
+        self.append(("set", ref, data, kwargs))
+
+
+def _commit(writes: Dict[str, _Ops]) -> set:
+    """Write every user's updates in combined batches; returns the users whose batch failed."""
+    failed: set = set()
+    batch, pending, in_batch = db.batch(), 0, set()
+
+    def flush():
+        try:
+            batch.commit()
+        except Exception as e:
+            log.error("❌ Device sync batch for %d users failed: %s", len(in_batch), e)
+            failed.update(in_batch)
+
+    for uid, ops in writes.items():
+        if pending and pending + len(ops) > BATCH_LIMIT:
+            flush()
+            batch, pending, in_batch = db.batch(), 0, set()
+        hot_cache.invalidate_goals(uid, [ref.id for _, ref, _, _ in ops if ref.parent.id == "goals"])
+        for op, ref, data, kwargs in ops:
+            if pending >= BATCH_LIMIT:  # one user with more than a batch's worth
+                flush()
+                batch, pending, in_batch = db.batch(), 0, set()
+            getattr(batch, op)(ref, data, **kwargs)
+            pending += 1
+            in_batch.add(uid)
+    if pending:
+        flush()
+    return failed
+
+
+def sync_devices(requests: List[Tuple[str, List[DeviceGoalChange]]]) -> List[dict]:
+    """Per-device results in request order: {"device_id", "goals"[, "unknown_goals"]} or {"device_id", "error"}."""
+    device_ids = list(dict.fromkeys(device_id for device_id, _ in requests))
+    owners = _resolve_devices(device_ids)
+    users = _load_users(sorted({uid for uid in owners.values() if uid}))
+
+    errors: Dict[str, str] = {}
+    by_user: Dict[str, List[Tuple[str, List[DeviceGoalChange]]]] = defaultdict(list)
+    for device_id, changes in requests:
+        if device_id not in owners:
+            errors[device_id] = f"Device {device_id} not found"
+        elif not owners[device_id]:
+            errors[device_id] = f"Device {device_id} not currently paired to a user."
+        elif owners[device_id] not in users:
+            errors[device_id] = f"User '{owners[device_id]}' not found or not valid."
+        else:
+            by_user[owners[device_id]].append((device_id, changes))
+
+    goals: Dict[str, List[dict]] = {}
+    unknown: Dict[str, List[str]] = defaultdict(list)
+    writes: Dict[str, _Ops] = {}
+    applied: Dict[str, tuple] = {}
+    for uid, device_changes in by_user.items():
+        user = users[uid]
+        snaps = {s.id: s for s in get_today_goal_snapshots(user, subscribe=False)}
+        for device_id, changes in device_changes:
+            unknown[device_id].extend(change.id for change in changes if change.id not in snaps)
+        ops, date_key = _Ops(), get_today_date_key(user)
+        completed, reopened, streak = stage_device_changes(
+            ops, user, date_key, snaps, [change for _, changes in device_changes for change in changes])
+        if completed or reopened:
+            applied[uid] = (date_key, completed, reopened, streak)
+            if streak:
+                hot_cache.invalidate_user(uid)  # streak fields live on the user doc
+        unsynced = [data | {"id": goal_id} for goal_id, data in
+                    ((goal_id, s.to_dict() or {}) for goal_id, s in snaps.items())
+                    if not data.get("synced_to_device", False)]
+        for g in unsynced:
+            ops.update(snaps[g["id"]].reference, {"synced_to_device": True})
+        goals[uid] = unsynced
+        if ops:
+            writes[uid] = ops
+
+    failed = _commit(writes)
+    for uid, (date_key, completed, reopened, streak) in applied.items():
+        if uid not in failed:
+            device_changes_applied(users[uid], date_key, completed, reopened, streak)
+    results = []
+    for device_id, _ in requests:
+        uid = owners.get(device_id)
+        if device_id in errors:
+            results.append({"device_id": device_id, "error": errors[device_id]})
+        elif uid in failed:
+            results.append({"device_id": device_id, "error": "Sync failed; retry."})
+        else:
+            result = {"device_id": device_id, "goals": goals[uid]}
+            if unknown.get(device_id):
+                result["unknown_goals"] = unknown[device_id]
+            results.append(result)
+    log.debug("🔄 Synced %d devices for %d users (%d errors)", len(requests), len(by_user), len(errors))
+    return results
@@ -0,0 +1,149 @@
+# app/services/dispatcher.py
+"""
+Per-user ordered dispatch for inbound messages.
+
+Each key (a user ID, or the sender's phone until we know the user) has a
+mailbox. Messages for one key run one at a time in arrival order; different
+keys run in parallel on a shared worker pool. A busy key gives its worker back
+after MAX_BURST messages so one chatty user can't starve the rest.
+
+    reply = await sms_dispatcher().run(key_for_sender(e164), handle, ...)
+
+The blocking handler runs on the pool, never on the event loop, inside a copy
+of the caller's context (so the correlation ID follows it).
+"""
+import asyncio
+import contextvars
+import logging
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Deque, Dict, Optional
+
+from app.config import settings
+from app.services.metrics import DISPATCH_QUEUED, DISPATCH_MAILBOXES, DISPATCH_WAIT_SECONDS, DISPATCH_MAILBOX_DEPTH
+
+log = logging.getLogger("dispatcher")
+
+MAX_BURST = 8            # messages one mailbox may run before yielding its worker
+SENDER_CACHE_SIZE = 8192  # phone -> user ID mappings remembered for keying
+
+
+class KeyedDispatcher:
+    def __init__(self, workers: int, name: str = "dispatch"):
+        self.name = name
+        self._pool = ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix=name)
+        self._lock = threading.Lock()
+        self._mailboxes: Dict[str, Deque[tuple]] = {}  # key present while scheduled or running
+        self._queued = 0
+
+    def busy(self, key: str) -> bool:
+        with self._lock:
+            return key in self._mailboxes
+
+    def depth(self, key: str) -> int:
+        with self._lock:
+            box = self._mailboxes.get(key)
+            return len(box) if box is not None else 0
+
+    def submit(self, key: str, fn: Callable, *args, **kwargs) -> Future:
+        future: Future = Future()
+        item = (future, contextvars.copy_context(), fn, args, kwargs, time.perf_counter())
+        with self._lock:
+            box = self._mailboxes.get(key)
+            idle = box is None
+            if idle:
+                box = self._mailboxes[key] = deque()
+            DISPATCH_MAILBOX_DEPTH.observe(len(box), dispatcher=self.name)
+            box.append(item)
+            self._queued += 1
+            self._gauges()
+        if idle:
+            self._pool.submit(self._drain, key)
+        return future
+
+    async def run(self, key: str, fn: Callable, *args, **kwargs):
+        return await asyncio.wrap_future(self.submit(key, fn, *args, **kwargs))
+
+    def _gauges(self) -> None:
+        DISPATCH_QUEUED.set(self._queued, dispatcher=self.name)
+        DISPATCH_MAILBOXES.set(len(self._mailboxes), dispatcher=self.name)
+
+    def _drain(self, key: str) -> None:
+        for _ in range(MAX_BURST):
+            with self._lock:
+                box = self._mailboxes[key]
+                if not box:
+                    del self._mailboxes[key]
+                    self._gauges()
+                    return
+                future, ctx, fn, args, kwargs, enqueued = box.popleft()
+                self._queued -= 1
+                self._gauges()
+            DISPATCH_WAIT_SECONDS.observe(time.perf_counter() - enqueued, dispatcher=self.name)
+            if not future.set_running_or_notify_cancel():
+                continue
+            try:
+                future.set_result(ctx.run(fn, *args, **kwargs))
+            except BaseException as e:
+                future.set_exception(e)
+        # Burst used up: go to the back of the pool queue so other keys get a turn.
+        with self._lock:
+            if not self._mailboxes[key]:
+                del self._mailboxes[key]
+                self._gauges()
+                return
+        self._pool.submit(self._drain, key)
+
+    def shutdown(self, wait: bool = True) -> None:
+        self._pool.shutdown(wait=wait)
+
+
+# --- SMS ---------------------------------------------------------------------
+
+_sms: Optional[KeyedDispatcher] = None
+_sms_lock = threading.Lock()
+_senders: "OrderedDict[str, str]" = OrderedDict()  # e164 -> user_id, most recent last
+
+
+def sms_dispatcher() -> KeyedDispatcher:
+    global _sms
+    if _sms is None:
+        with _sms_lock:
+            if _sms is None:
+                _sms = KeyedDispatcher(settings.DISPATCH_WORKERS, "sms")
+    return _sms
+
+
+def remember_sender(e164: str, user_id: Optional[str]) -> None:
+    """Record which user a phone resolved to, so its next message is keyed by user."""
+    if not user_id:
+        return
+    with _sms_lock:
+        _senders[e164] = user_id
+        _senders.move_to_end(e164)
+        while len(_senders) > SENDER_CACHE_SIZE:
+            _senders.popitem(last=False)
+
+
+def key_for_sender(e164: str) -> str:
+    """
+    Mailbox key for an inbound message: the sender's user ID once known,
+    otherwise the phone. While a phone-keyed mailbox is still busy (e.g. a
+    signup in flight) later messages stay on it, so order holds across the switch.
+    """
+    phone_key = f"phone:{e164}"
+    if _sms is not None and _sms.busy(phone_key):
+        return phone_key
+    with _sms_lock:
+        user_id = _senders.get(e164)
+    return f"user:{user_id}" if user_id else phone_key
+
+
+def shutdown() -> None:
+    global _sms
+    with _sms_lock:
+        dispatcher, _sms = _sms, None
+    if dispatcher is not None:
+        dispatcher.shutdown()
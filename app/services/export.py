@@ -0,0 +1,99 @@
+# app/services/export.py
+"""
+Streaming export of one user's history as NDJSON (optionally gzipped).
+
+Sources, each paged with query cursors:
+  messages          user_id == uid, plus pre-signup messages from the user's phones
+                    (each carries its parse result)
+  user_responses    user_id == uid (parse results written before they moved onto messages)
+  users/{uid}/days/*/goals, one day at a time
+
+The streams are merged by timestamp with heapq.merge, so only one page per
+source is held in memory however long the history is. One line per record:
+
+    {"type": "message", "at": "2025-01-02T03:04:05+00:00", "id": "SM...", ...}
+
+Firestore needs composite indexes on messages (user_id, received_at),
+messages (from, user_id, received_at) and user_responses (user_id, created_at).
+"""
+import heapq
+import json
+import zlib
+from typing import Iterator, Optional, Tuple
+
+from app.adapters.storage import get_db, stream_pages
+from app.utilities import utc_iso
+
+db = get_db()
+
+PAGE_SIZE = 200
+GZIP_FLUSH_BYTES = 64 * 1024
+
+
+def _records(kind: str, snaps, time_field: str) -> Iterator[Tuple[str, dict]]:
+    for snap in snaps:
+        data = snap.to_dict() or {}
+        at = utc_iso(data.get(time_field))
+        yield at, {"type": kind, "at": at, "id": snap.id, **data}
+
+
+def _messages(user_id: str, phones) -> Iterator[Tuple[str, dict]]:
+    streams = [_records("message", stream_pages(
+        db.collection("messages").where("user_id", "==", user_id).order_by("received_at"), PAGE_SIZE),
+        "received_at")]
+    for phone in phones:
+        # Sent before the phone was linked to this account (user_id was None then).
+        query = (db.collection("messages").where("from", "==", phone).where("user_id", "==", None)
+                 .order_by("received_at"))
+        streams.append(_records("message", stream_pages(query, PAGE_SIZE), "received_at"))
+    return heapq.merge(*streams, key=lambda r: r[0])
+
+
+def _responses(user_id: str) -> Iterator[Tuple[str, dict]]:
+    query = db.collection("user_responses").where("user_id", "==", user_id).order_by("created_at")
+    return _records("parsed_response", stream_pages(query, PAGE_SIZE), "created_at")
+
+
+def _goals(user_id: str) -> Iterator[Tuple[str, dict]]:
+    days = db.collection("users").document(user_id).collection("days")
+    for day_ref in sorted(days.list_documents(), key=lambda r: r.id):  # ISO dates sort chronologically
+        goals = day_ref.collection("goals").order_by("created_at")
+        for at, record in _records("goal", stream_pages(goals, PAGE_SIZE), "created_at"):
+            record["day"] = day_ref.id
+            yield at, record
+
+
+def export_records(user_id: str, phones=()) -> Iterator[dict]:
+    """Every record for the user, oldest first."""
+    merged = heapq.merge(_messages(user_id, phones), _responses(user_id), _goals(user_id),
+                         key=lambda r: r[0])
+    for _, record in merged:
+        yield record
+
+
+def export_ndjson(user_id: str, phones=()) -> Iterator[bytes]:
+    for record in export_records(user_id, phones):
+        yield (json.dumps(record, default=utc_iso, ensure_ascii=False) + "\n").encode("utf-8")
+
+
+def export_gzip(user_id: str, phones=()) -> Iterator[bytes]:
+    """NDJSON through a streaming gzip compressor, emitted in ~64 KiB chunks."""
+    compressor = zlib.compressobj(wbits=31)  # 16 + MAX_WBITS: gzip container
+    pending = 0
+    for line in export_ndjson(user_id, phones):
+        chunk = compressor.compress(line)
+        pending += len(line)
+        if pending >= GZIP_FLUSH_BYTES:
+            chunk += compressor.flush(zlib.Z_SYNC_FLUSH)
+            pending = 0
+        if chunk:
+            yield chunk
+    yield compressor.flush()
+
+
+def user_phones(user_id: str) -> Optional[list]:
+    """The user's phones, or None if the user doesn't exist."""
+    snap = db.collection("users").document(user_id).get(field_paths=["phones"])
+    if not snap.exists:
+        return None
+    return list((snap.to_dict() or {}).get("phones") or [])
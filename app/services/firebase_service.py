@@ -1,42 +1,38 @@
 # firebase_service.py (key fixes)
-from firebase_admin import firestore, auth
-from app.models.models import UserDoc, Goal, DeviceGoalChange
+from firebase_admin import auth
+from app.models.models import UserDoc, UserRecord, GoalRecord, DeviceGoalChange
 from datetime import datetime, timezone
-import phonenumbers
-from dataclasses import asdict
 from zoneinfo import ZoneInfo
-from typing import Optional, List, Dict
+from typing import Optional, List, Dict, Tuple
+import logging
 
-from app.adapters.firebase_client import get_firebase_client
-get_firebase_client()
-db = firestore.client()
+from app.adapters.storage import get_db, SERVER_TIMESTAMP
+from app.utilities import normalize_to_e164, utcnow
+from app.services import hot_cache, rollups, goal_view
+db = get_db()
+log = logging.getLogger("firebase_service")
 
-def get_today_date_key(user: UserDoc) -> str:
+def get_today_date_key(user: UserRecord, now: Optional[datetime] = None) -> str:
     tz = ZoneInfo(user.timezone or "America/Chicago")
-    return datetime.now(tz).date().isoformat()
+    return (now.astimezone(tz) if now else datetime.now(tz)).date().isoformat()
 
-def normalize_to_e164(phone_number: str, default_region: str = "US") -> str:
-    num = phonenumbers.parse(phone_number, default_region)
-    if not phonenumbers.is_valid_number(num):
-        raise ValueError("Invalid phone number")
-    return phonenumbers.format_number(num, phonenumbers.PhoneNumberFormat.E164)
-
-def get_user_data(user_id: str) -> Optional[UserDoc]:
+def get_user_data(user_id: str) -> Optional[UserRecord]:
     if user_id is None:
         return "No User ID Provided!"
+    cached = hot_cache.get_user(user_id)
+    if cached is not None:
+        return cached
     user_ref = db.collection("users").document(user_id)
     user_doc = user_ref.get()
     if not user_doc.exists:
         raise ValueError("User not found")
-    user_data = user_doc.to_dict() or {}
-    user = UserDoc(**user_data)
-    return user
+    return UserRecord.from_doc(user_doc.to_dict() or {}, user_doc.id)
 
 
 def add_new_user(user: UserDoc, *, raw_password: str | None = None, phone_number: str | None = None):
     e164 = normalize_to_e164(phone_number) if phone_number else None
     rec = auth.create_user(
-        email=user.email,
+        email=getattr(user, "email", None),  # UserDoc no longer has email
         password=raw_password or None,
         display_name=user.display_name,
         phone_number=e164,
@@ -46,7 +42,7 @@ def add_new_user(user: UserDoc, *, raw_password: str | None = None, phone_number
 
     user_doc = {
         "user_id": uid,
-        "email": user.email,
+        "email": getattr(user, "email", None),
         "display_name": user.display_name,
         "phones": [e164] if e164 else [],
         "timezone": user.timezone,
@@ -74,43 +70,50 @@ def add_new_user(user: UserDoc, *, raw_password: str | None = None, phone_number
 
     return {"uid": uid}
 
-def dicts_to_goals(items) -> list[Goal]:
-    goals = []
-    for g in items or []:
-        goals.append(
-            Goal(
-                goal_text=g.get("goal_text", ""),
-                points=int(g.get("points", 0)),
-                complete=bool(g.get("complete", False)),
-            )
-        )
-    return goals
+def dicts_to_goals(items) -> list[GoalRecord]:
+    return [GoalRecord.from_doc(g) for g in items or []]
 
-def create_goals_entry(goals: list[dict], user: UserDoc) -> None:
-    goals = dicts_to_goals(goals)
-    tz = ZoneInfo(user.timezone or "America/Chicago")
-    date_key = datetime.now(tz).date().isoformat()
-    user_day_ref = db.collection("users").document(user.user_id).collection("days").document(date_key)
-    for goal in goals:
-        print(f'💾 Creating goal for user {user.user_id}: {goal}')
-        user_day_ref.collection("goals").add(asdict(goal))
+def create_goals_entry(goals: list[dict], user: UserRecord) -> Optional[str]:
+    """Add goals to today; returns the updated goal list text if a cached view could be patched."""
+    date_key = get_today_date_key(user)
+    goals_ref = db.collection("users").document(user.user_id).collection("days").document(date_key).collection("goals")
+    now = utcnow()
+    batch = db.batch()
+    total_points = 0
+    created = []
+    for g in goals:
+        goal_ref = goals_ref.document()
+        goal = GoalRecord(str(g.get("goal_text") or ""), int(g.get("points") or 0), created_at=now, id=goal_ref.id)
+        log.debug("💾 Creating goal for user %s: %s", user.user_id, goal)
+        batch.set(goal_ref, goal.to_doc())
+        total_points += goal.points
+        created.append(goal)
+    rollups.record_goals_added(batch, user.user_id, date_key, len(goals), total_points)
+    hot_cache.invalidate_goals(user.user_id, [g.id for g in created])
+    batch.commit()
+    return goal_view.goals_added(user.user_id, date_key, created)
 
-def get_today_goals_for_user(user: UserDoc) -> list[Goal]:
-    tz = ZoneInfo(user.timezone or "America/Chicago")
-    date_key = datetime.now(tz).date().isoformat()
-    user_day_ref = db.collection("users").document(user.user_id).collection("days").document(date_key)
-    goals_snap = user_day_ref.collection("goals").get()
-    goal_dicts = [doc.to_dict() for doc in goals_snap]
-    return dicts_to_goals(goal_dicts)
+def get_today_goals_for_user(user: UserRecord, *, subscribe: bool = True) -> list[GoalRecord]:
+    goals_snap = get_today_goal_snapshots(user, subscribe=subscribe)
+    return [GoalRecord.from_doc(doc.to_dict() or {}, doc.id) for doc in goals_snap]
 
-def get_today_goal_refs(user: UserDoc) -> list[firestore.DocumentReference]:
-    tz = ZoneInfo(user.timezone or "America/Chicago")
-    date_key = datetime.now(tz).date().isoformat()
+def get_today_goal_snapshots(user: UserRecord, *, subscribe: bool = True) -> list:
+    """
+    Today's goal documents in one query (snapshots carry .reference and data).
+    Served from the hot cache when it has a live view; subscribe=False never
+    opens a new listener.
+    """
+    date_key = get_today_date_key(user)
+    cached = hot_cache.goal_snapshots(user.user_id, date_key, subscribe=subscribe)
+    if cached is not None:
+        return cached
     user_day_ref = db.collection("users").document(user.user_id).collection("days").document(date_key)
-    goals_snap = user_day_ref.collection("goals").get()
-    return [doc.reference for doc in goals_snap]
+    return user_day_ref.collection("goals").get()
+
+def get_today_goal_refs(user: UserRecord) -> list:
+    return [doc.reference for doc in get_today_goal_snapshots(user)]
 
-def pair_user_device(user: UserDoc, device_id: str) -> None:
+def pair_user_device(user: UserRecord, device_id: str) -> None:
     ts = datetime.now(timezone.utc)
 
     # 1. Write device under the user
@@ -134,7 +137,7 @@ def pair_user_device(user: UserDoc, device_id: str) -> None:
           "updated_at": ts,
       })
     
-def get_user_from_device(device_id: str) -> UserDoc:
+def get_user_from_device(device_id: str) -> UserRecord:
     doc = db.collection("device_map").document(device_id).get()
     if not doc.exists:
         raise ValueError(f"Device {device_id} not found")
@@ -146,8 +149,12 @@ def get_user_from_device(device_id: str) -> UserDoc:
         raise ValueError(f"User '{user_id}' not found or not valid.")
     return user
 
-def get_unsynced_goals_for_user(user: UserDoc):
+def get_unsynced_goals_for_user(user: UserRecord):
     date_key = get_today_date_key(user)
+    cached = hot_cache.goal_snapshots(user.user_id, date_key)
+    if cached is not None:
+        docs = [d for d in cached if not (d.to_dict() or {}).get("synced_to_device", False)]
+        return [d.to_dict() | {"id": d.id} for d in docs]
     goals_ref = (
         db.collection("users")
           .document(user.user_id)
@@ -158,10 +165,11 @@ def get_unsynced_goals_for_user(user: UserDoc):
     docs = goals_ref.where("synced_to_device", "==", False).stream()
     return [d.to_dict() | {"id": d.id} for d in docs]
 
-def mark_goals_synced(user: UserDoc, goals: list[dict]) -> None:
+def mark_goals_synced(user: UserRecord, goals: list[dict]) -> None:
     date_key = get_today_date_key(user)
     if not goals:
         return
+    hot_cache.invalidate_goals(user.user_id, [g["id"] for g in goals])
     batch = db.batch()
     for g in goals:
         goal_id = g["id"]
@@ -176,25 +184,64 @@ def mark_goals_synced(user: UserDoc, goals: list[dict]) -> None:
         batch.update(goal_ref, {"synced_to_device": True})
     batch.commit()
 
-def apply_device_changes(user: UserDoc, changes: List[DeviceGoalChange]) -> None:
+def stage_device_changes(batch, user: UserRecord, date_key: str, snaps: Dict[str, object],
+                         changes: List[DeviceGoalChange]) -> Tuple[List[str], List[str], Optional[dict]]:
+    """
+    Stage a device's completion changes against today's goal snapshots (by ID),
+    with their rollups. The last change per goal wins; changes that match the
+    stored state, or name an unknown goal, write nothing. Returns (completed
+    IDs, reopened IDs, streak update for rollups.apply_streak after commit).
+    """
+    wanted = {c.id: bool(c.completed) for c in changes if c.id in snaps}
+    completed, reopened = [], []
+    completed_points = reopened_points = 0
+    for goal_id, complete in wanted.items():
+        goal = GoalRecord.from_doc(snaps[goal_id].to_dict() or {}, goal_id)
+        if goal.complete == complete:
+            continue
+        batch.update(snaps[goal_id].reference, {
+            "complete": complete,
+            "completed_at": SERVER_TIMESTAMP if complete else None,
+        })
+        if complete:
+            completed.append(goal_id)
+            completed_points += goal.points
+        else:
+            reopened.append(goal_id)
+            reopened_points += goal.points
+    if reopened:
+        rollups.record_goals_reopened(batch, user.user_id, date_key, len(reopened), reopened_points)
+    streak = None
+    if completed:
+        streak = rollups.record_goals_completed(batch, user, date_key, len(completed), completed_points)
+    return completed, reopened, streak
+
+
+def device_changes_applied(user: UserRecord, date_key: str, completed: List[str], reopened: List[str],
+                           streak: Optional[dict]) -> None:
+    """After stage_device_changes' batch commits: mirror the streak and patch/drop the goal view."""
+    rollups.apply_streak(user, streak)
+    if reopened:
+        goal_view.changed(user.user_id)
+    elif completed:
+        goal_view.goals_completed(user.user_id, date_key, completed)
+
+
+def apply_device_changes(user: UserRecord, changes: List[DeviceGoalChange]) -> None:
     if not changes:
         return
 
     date_key = get_today_date_key(user)
+    snaps = {s.id: s for s in get_today_goal_snapshots(user, subscribe=False)}
     batch = db.batch()
-
-    for change in changes:
-        goal_ref = (
-            db.collection("users")
-              .document(user.user_id)
-              .collection("days")
-              .document(date_key)
-              .collection("goals")
-              .document(change.id)
-        )
-        batch.update(goal_ref, {"completed": change.completed})
-
+    completed, reopened, streak = stage_device_changes(batch, user, date_key, snaps, changes)
+    if not (completed or reopened):
+        return
+    hot_cache.invalidate_goals(user.user_id, completed + reopened)
+    if streak:
+        hot_cache.invalidate_user(user.user_id)  # streak fields live on the user doc
     batch.commit()
+    device_changes_applied(user, date_key, completed, reopened, streak)
 
 def sync_user_goals(device_id: str, changes: List[DeviceGoalChange]) -> List[Dict]:
     """
@@ -206,7 +253,7 @@ def sync_user_goals(device_id: str, changes: List[DeviceGoalChange]) -> List[Dic
       5) return the goals to send to device
     """
     user = get_user_from_device(device_id)
-    print(user.user_id)
+    log.debug("Syncing device %s for user %s", device_id, user.user_id)
     apply_device_changes(user, changes)
     unsynced_goals = get_unsynced_goals_for_user(user)
     mark_goals_synced(user, unsynced_goals)
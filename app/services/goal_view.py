@@ -0,0 +1,170 @@
+# app/services/goal_view.py
+"""
+Rendered "Today's Goals" text per user, patched in place as goals change.
+
+A view keeps one line per goal (ordered by goal ID, like the day query), the
+point totals and the rendered text for (user, date key, day version). The day
+version is the `version` counter on users/{uid}/days/{date}, incremented in
+the same batch as every goal write (rollups._bump / touch_day), whichever
+instance makes it. "list" reads that one field and serves the view only if
+it matches, so it never needs the goals query while nothing changed:
+
+  - goals_added / goals_completed: the writer knows exactly what it changed
+    (and that it added 1 to the version); the view gets those lines
+    inserted/flipped and stays current without re-rendering. If another
+    writer got in too, the stored version is ahead and the next "list"
+    rebuilds.
+  - changed: anything else (device sync, rollover); the view is dropped.
+"""
+import threading
+from bisect import bisect_left
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional
+
+from app.adapters.storage import get_db
+from app.config import settings
+from app.models.models import GoalRecord
+from app.services.metrics import GOAL_VIEW_EVENTS
+from app.services.utilities.sms_render import segments_as_sent, glyphs
+
+db = get_db()
+
+MAX_VIEWS = 4096
+
+completed_all_goals_msg = "None! 🎊 Congrats, you've completed all your goals for today!\n 🙂‍↕️ Celebrate with a little treat, or text me a new goal to add more."
+
+
+def _line(goal_text: str, points: int, complete: bool) -> str:
+    gl = glyphs()
+    return f"{gl['done'] if complete else gl['todo']} {goal_text} ({points} pt)"
+
+
+def render(lines: List[str], total_points: int, completed_points: int) -> str:
+    if total_points == completed_points:
+        return completed_all_goals_msg
+    pct_complete = round(100*completed_points/total_points)
+    gl = glyphs()
+    goals_list = "\n".join(lines)
+    progress_info = "Progress: " + f"{pct_complete}% ({completed_points}/{total_points} pts)"
+    normalized_earned = round(completed_points * 10 / total_points)
+    progress_bar = "Progress: " + gl["bar_on"] * normalized_earned + gl["bar_off"] * (10 - normalized_earned)
+    full = f"🎯Today's Goals\n{goals_list}\n\n{progress_bar}\n{progress_info}\n"
+    if segments_as_sent(full) <= settings.SMS_SEGMENT_BUDGET:
+        return full
+    # Over budget: the bar repeats progress_info, so it goes first
+    return f"🎯Today's Goals\n{goals_list}\n{progress_info}\n"
+
+
+def render_goals(goals: Iterable[GoalRecord]) -> str:
+    goals = list(goals)
+    return render([_line(g.goal_text, g.points, g.complete) for g in goals],
+                  sum(g.points for g in goals), sum(g.points for g in goals if g.complete))
+
+
+class _View:
+    __slots__ = ("date_key", "version", "ids", "goals", "lines", "total", "done", "text")
+
+    def __init__(self, date_key: str, version: int, goals: List[GoalRecord]):
+        self.date_key = date_key
+        self.version = version
+        goals = sorted(goals, key=lambda g: g.id)
+        self.ids = [g.id for g in goals]
+        self.goals = {g.id: [g.goal_text, g.points, g.complete] for g in goals}  # copies: callers' records may be shared
+        self.lines = [_line(g.goal_text, g.points, g.complete) for g in goals]
+        self.total = sum(g.points for g in goals)
+        self.done = sum(g.points for g in goals if g.complete)
+        self.text = render(self.lines, self.total, self.done)
+
+
+_lock = threading.Lock()
+_views: "OrderedDict[str, _View]" = OrderedDict()
+
+
+def day_version(user_id: str, date_key: str) -> int:
+    """The stored version of the user's day (one field read; 0 before the first goal write)."""
+    snap = (db.collection("users").document(user_id).collection("days").document(date_key)
+            .get(field_paths=["version"]))
+    return int(((snap.to_dict() or {}).get("version") or 0) if snap.exists else 0)
+
+
+def get(user_id: str, date_key: str, version: int) -> Optional[str]:
+    """The rendered list if the view was built from this day version, else None."""
+    if not settings.GOAL_VIEW_CACHE:
+        return None
+    with _lock:
+        view = _views.get(user_id)
+        hit = view is not None and view.date_key == date_key and view.version == version
+        if hit:
+            _views.move_to_end(user_id)
+    GOAL_VIEW_EVENTS.inc(event="hit" if hit else "miss")
+    return view.text if hit else None
+
+
+def put(user_id: str, date_key: str, version: int, goals: List[GoalRecord]) -> str:
+    """Render `goals`, read at day `version` (read the version first), and keep the view."""
+    if not settings.GOAL_VIEW_CACHE or not goals or any(g.id is None for g in goals):
+        return render_goals(goals)
+    view = _View(date_key, version, goals)
+    with _lock:
+        _views[user_id] = view
+        _views.move_to_end(user_id)
+        while len(_views) > MAX_VIEWS:
+            _views.popitem(last=False)
+    return view.text
+
+
+def changed(user_id: str) -> None:
+    """A goal write this module can't apply incrementally; call after it commits."""
+    with _lock:
+        _views.pop(user_id, None)
+    GOAL_VIEW_EVENTS.inc(event="dropped")
+
+
+def _patchable(user_id: str, date_key: str) -> Optional[_View]:
+    view = _views.get(user_id)
+    if view is None or view.date_key != date_key:
+        _views.pop(user_id, None)
+        return None
+    return view
+
+
+def goals_added(user_id: str, date_key: str, goals: List[GoalRecord]) -> Optional[str]:
+    """New goals were committed (one version bump); returns the patched text, or None if there was no view."""
+    with _lock:
+        view = _patchable(user_id, date_key)
+        if view is None or any(g.id is None for g in goals):
+            _views.pop(user_id, None)
+            return None
+        for g in goals:
+            if g.id in view.goals:
+                continue  # a rebuild raced this write and already has it
+            i = bisect_left(view.ids, g.id)
+            view.ids.insert(i, g.id)
+            view.lines.insert(i, _line(g.goal_text, g.points, g.complete))
+            view.goals[g.id] = [g.goal_text, g.points, g.complete]
+            view.total += g.points
+            view.done += g.points if g.complete else 0
+        view.version += 1
+        view.text = render(view.lines, view.total, view.done)
+    GOAL_VIEW_EVENTS.inc(event="patched")
+    return view.text
+
+
+def goals_completed(user_id: str, date_key: str, goal_ids: List[str]) -> Optional[str]:
+    """Goals were marked complete (one version bump); returns the patched text, or None if there was no view."""
+    with _lock:
+        view = _patchable(user_id, date_key)
+        if view is None or any(gid not in view.goals for gid in goal_ids):
+            _views.pop(user_id, None)
+            return None
+        for gid in goal_ids:
+            goal = view.goals[gid]
+            if goal[2]:
+                continue
+            goal[2] = True
+            view.lines[bisect_left(view.ids, gid)] = _line(goal[0], goal[1], True)
+            view.done += goal[1]
+        view.version += 1
+        view.text = render(view.lines, view.total, view.done)
+    GOAL_VIEW_EVENTS.inc(event="patched")
+    return view.text
@@ -0,0 +1,290 @@
+# app/services/hot_cache.py
+"""
+In-process cache fed by storage snapshot listeners (HOT_CACHE=true).
+
+Two live views:
+  - active users: one listener on `users where activated == True`, so cron jobs
+    and per-message user lookups don't re-query
+  - today's goals for recently touched users: one listener per user-day,
+    bounded by HOT_CACHE_MAX_USERS and dropped after HOT_CACHE_IDLE_SECONDS
+
+Every lookup returns None when the cache can't answer (disabled, listener not
+yet synced or disconnected, entry missing or dirty) and the caller reads
+storage directly. Code that writes users or goals calls invalidate_* *before*
+the write; the entry is served again once a listener snapshot shows that
+document changed (or after DIRTY_SECONDS, in case the write failed and no
+snapshot comes). Listeners are opened and closed outside _lock: both can block
+on the network, and a listener's callback takes _lock itself.
+"""
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional
+
+from app.adapters.storage import get_db
+from app.config import settings
+from app.models.models import UserRecord
+from app.services.metrics import HOT_CACHE_LOOKUPS, HOT_CACHE_ENTRIES
+
+log = logging.getLogger("hot_cache")
+
+DIRTY_SECONDS = 5.0    # longest we wait for a listener to confirm our own write
+RETRY_SECONDS = 30.0   # between attempts to re-open a dropped listener
+
+_lock = threading.RLock()
+
+
+def enabled() -> bool:
+    return bool(settings.HOT_CACHE)
+
+
+def _alive(watch) -> bool:
+    return watch is not None and not getattr(watch, "_closed", False)
+
+
+def _lookup(view: str, result: str) -> None:
+    HOT_CACHE_LOOKUPS.inc(view=view, result=result)
+
+
+def _changed_ids(changes) -> set:
+    return {c.document.id for c in changes or ()}
+
+
+# --- Active users ------------------------------------------------------------
+
+class _ActiveUsers:
+    def __init__(self):
+        self.watch = None
+        self.synced = False
+        self.users: Dict[str, UserRecord] = {}
+        self.dirty: Dict[str, float] = {}
+        self.last_attempt = 0.0
+
+    def start(self) -> None:
+        self.last_attempt = time.monotonic()
+        try:
+            query = get_db().collection("users").where("activated", "==", True)
+            self.watch = query.on_snapshot(self._on_snapshot)
+            log.info("👂 Active-user listener started")
+        except Exception as e:
+            self.watch = None
+            log.warning("⚠️ Active-user listener failed to start: %s", e)
+
+    def stop(self) -> None:
+        watch, self.watch = self.watch, None
+        if watch is not None:
+            watch.unsubscribe()
+        with _lock:
+            self.synced = False
+            self.users.clear()
+            self.dirty.clear()
+
+    def _on_snapshot(self, snaps, changes, read_time) -> None:
+        try:
+            users = {s.id: UserRecord.from_doc(s.to_dict() or {}, s.id) for s in snaps}
+        except Exception:
+            log.exception("❌ Bad active-user snapshot")
+            return
+        seen, now = _changed_ids(changes), time.monotonic()
+        with _lock:
+            self.users = users
+            if self.synced:  # a first snapshot lists every document, written or not
+                self.dirty = {uid: at for uid, at in self.dirty.items()
+                              if uid not in seen and now - at < DIRTY_SECONDS}
+            self.synced = True
+        HOT_CACHE_ENTRIES.set(len(users), view="active_users")
+
+    def live(self) -> bool:
+        if self.synced and _alive(self.watch):
+            return True
+        if self.watch is not None and not _alive(self.watch):
+            log.warning("⚠️ Active-user listener disconnected; falling back to direct reads")
+            self.watch = None
+            with _lock:
+                self.synced = False
+        if self.watch is None and enabled() and time.monotonic() - self.last_attempt > RETRY_SECONDS:
+            self.start()
+        return False
+
+
+_active = _ActiveUsers()
+
+
+def active_users() -> Optional[List[UserRecord]]:
+    """Every activated user, or None if the listener isn't live."""
+    if not enabled() or not _active.live():
+        _lookup("active_users", "fallback")
+        return None
+    with _lock:
+        users = list(_active.users.values())
+    _lookup("active_users", "hit")
+    return users
+
+
+def get_user(user_id: str) -> Optional[UserRecord]:
+    """A cached activated user; None means read storage."""
+    if not enabled() or not _active.live():
+        return None
+    with _lock:
+        dirty_at = _active.dirty.get(user_id)
+        if dirty_at is not None and time.monotonic() - dirty_at < DIRTY_SECONDS:
+            user = None
+        else:
+            user = _active.users.get(user_id)
+    _lookup("users", "hit" if user else "miss")
+    return user
+
+
+def invalidate_user(user_id: str) -> None:
+    """Call before writing users/{user_id}."""
+    with _lock:
+        _active.dirty[user_id] = time.monotonic()
+
+
+# --- Today's goals per user --------------------------------------------------
+
+class _GoalView:
+    __slots__ = ("date_key", "watch", "snaps", "synced", "dirty_at", "pending", "last_used")
+
+    def __init__(self, date_key: str):
+        self.date_key = date_key
+        self.watch = None
+        self.snaps: list = []
+        self.synced = False
+        self.dirty_at: Optional[float] = None
+        self.pending: Optional[set] = set()  # goal IDs being written; None = unknown, wait DIRTY_SECONDS
+        self.last_used = time.monotonic()
+
+    def fresh(self) -> bool:
+        if not (self.synced and _alive(self.watch)):
+            return False
+        return self.dirty_at is None or time.monotonic() - self.dirty_at >= DIRTY_SECONDS
+
+
+_goals: "OrderedDict[str, _GoalView]" = OrderedDict()  # user_id -> view, least recently used first
+
+
+def _close(views: List[_GoalView]) -> None:
+    """Unsubscribe views already removed from _goals; call without holding _lock."""
+    for view in views:
+        if view.watch is not None:
+            try:
+                view.watch.unsubscribe()
+            except Exception:
+                pass
+
+
+def _evict(now: float) -> List[_GoalView]:
+    """Remove idle views and any over HOT_CACHE_MAX_USERS; returns them for _close."""
+    idle = float(settings.HOT_CACHE_IDLE_SECONDS)
+    evicted = []
+    while _goals:
+        user_id, view = next(iter(_goals.items()))
+        if len(_goals) <= settings.HOT_CACHE_MAX_USERS and now - view.last_used < idle:
+            break
+        evicted.append(_goals.pop(user_id))
+    return evicted
+
+
+def _listen(user_id: str, view: _GoalView) -> None:
+    """Open the listener for a view registered in _goals; call without holding _lock."""
+
+    def _on_snapshot(snaps, changes, read_time):
+        seen = _changed_ids(changes)
+        with _lock:
+            view.snaps = list(snaps)
+            if view.synced and view.pending:  # a first snapshot lists every goal, written or not
+                view.pending -= seen
+                if not view.pending:
+                    view.dirty_at = None
+            view.synced = True
+
+    goals_ref = get_db().collection("users").document(user_id).collection("days").document(view.date_key).collection("goals")
+    try:
+        watch = goals_ref.on_snapshot(_on_snapshot)
+    except Exception as e:
+        log.warning("⚠️ Goal listener for %s failed to start: %s", user_id, e)
+        return
+    with _lock:
+        current = _goals.get(user_id) is view
+        if current:
+            view.watch = watch
+    if not current:  # evicted or replaced while we were opening it
+        view.watch = watch
+        _close([view])
+
+
+def goal_snapshots(user_id: str, date_key: str, *, subscribe: bool = True) -> Optional[list]:
+    """
+    Today's goal snapshots for a user, or None if the cache can't answer.
+    subscribe=False only peeks (cron jobs touching every user shouldn't open
+    a listener each).
+    """
+    if not enabled():
+        return None
+    now = time.monotonic()
+    closing: List[_GoalView] = []
+    opened = None
+    with _lock:
+        view = _goals.get(user_id)
+        if view is not None and (view.date_key != date_key or (view.synced and not _alive(view.watch))):
+            closing.append(_goals.pop(user_id))  # day rolled over or listener dropped; re-open below
+            view = None
+        if view is None and subscribe:
+            view = opened = _goals[user_id] = _GoalView(date_key)
+            closing += _evict(now)
+            HOT_CACHE_ENTRIES.set(len(_goals), view="goals")
+        elif view is not None:
+            _goals.move_to_end(user_id)
+            view.last_used = now
+        snaps = list(view.snaps) if view is not None and view.fresh() else None
+    _close(closing)
+    if opened is not None:
+        _listen(user_id, opened)
+    _lookup("goals", "miss" if snaps is None else "hit")
+    return snaps
+
+
+def invalidate_goals(user_id: str, goal_ids: Iterable[str] = ()) -> None:
+    """
+    Call before writing a user's goals for today. With the goal IDs being
+    written the view is served again as soon as the listener sees all of them
+    change; without, it waits out DIRTY_SECONDS.
+    """
+    ids = set(goal_ids)
+    now = time.monotonic()
+    with _lock:
+        view = _goals.get(user_id)
+        if view is None:
+            return
+        if view.dirty_at is None or now - view.dirty_at >= DIRTY_SECONDS:
+            view.pending = set()  # the last mark expired; start over
+        view.pending = view.pending | ids if ids and view.pending is not None else None
+        view.dirty_at = now
+
+
+# --- Lifecycle ----------------------------------------------------------------
+
+def start() -> None:
+    if enabled() and _active.watch is None:
+        _active.start()
+
+
+def stop() -> None:
+    _active.stop()
+    with _lock:
+        views = list(_goals.values())
+        _goals.clear()
+    _close(views)
+    HOT_CACHE_ENTRIES.set(0, view="goals")
+    HOT_CACHE_ENTRIES.set(0, view="active_users")
+
+
+def stats() -> dict:
+    with _lock:
+        return {
+            "active_users_live": _active.synced and _alive(_active.watch),
+            "active_users": len(_active.users),
+            "goal_views": len(_goals),
+        }
@@ -0,0 +1,98 @@
+# app/services/idempotency.py
+"""
+Replay protection for Twilio webhook retries, keyed by MessageSid.
+
+Twilio retries a webhook that answered slowly, using the same MessageSid.
+The first delivery claims the SID (an in-process LRU, backed by creating
+`messages/{sid}`, which fails if the document already exists) and stores its
+TwiML reply. A retry skips parsing and actions and gets the stored reply back.
+
+A retry that arrives while the first delivery is still running in this
+process waits up to PENDING_WAIT_SECONDS for the reply. A retry seen only
+through storage (another worker, or evicted from the LRU) polls the message
+document for the reply for as long. The claim is not final until a reply is
+saved: a delivery that fails after claiming marks the document `failed`, and
+a claim with no reply after CLAIM_STALE_SECONDS (its worker died) counts as
+failed too. A retry takes such a claim over and processes the message again
+(see messaging_service.reclaim).
+"""
+import threading
+from collections import OrderedDict
+from typing import Optional, Union
+
+from app.services.metrics import DUPLICATE_MESSAGES
+
+SID_CACHE_SIZE = 10_000
+PENDING_WAIT_SECONDS = 10.0
+STORAGE_POLL_SECONDS = 0.25   # between reads of a claim another worker holds
+CLAIM_STALE_SECONDS = 60.0    # a claim with no reply this old was abandoned (Twilio gives up after 15 s)
+EMPTY_TWIML = '<?xml version="1.0" encoding="UTF-8"?><Response />'
+
+_lock = threading.Lock()
+_recent: "OrderedDict[str, Union[str, threading.Event]]" = OrderedDict()  # sid -> reply XML, or Event while running
+
+
+def _remember(sid: str, value) -> None:
+    _recent[sid] = value
+    _recent.move_to_end(sid)
+    while len(_recent) > SID_CACHE_SIZE:
+        _recent.popitem(last=False)
+
+
+def seen(sid: Optional[str]) -> bool:
+    """Whether this process already claimed sid (a retry; nothing is claimed here)."""
+    if not sid:
+        return False
+    with _lock:
+        return sid in _recent
+
+
+def claim(sid: Optional[str]) -> Optional[str]:
+    """
+    None if this delivery should be processed (and is now marked running);
+    otherwise the reply to send back for a duplicate.
+    """
+    if not sid:
+        return None
+    with _lock:
+        entry = _recent.get(sid)
+        if entry is None:
+            _remember(sid, threading.Event())
+            return None
+    DUPLICATE_MESSAGES.inc(source="memory")
+    if isinstance(entry, threading.Event):
+        entry.wait(PENDING_WAIT_SECONDS)
+        with _lock:
+            entry = _recent.get(sid)
+        if not isinstance(entry, str):
+            return EMPTY_TWIML
+    return entry
+
+
+def duplicate_from_storage(sid: str, stored_reply: Optional[str]) -> str:
+    """The SID was already claimed in storage; remember and return what to replay."""
+    DUPLICATE_MESSAGES.inc(source="storage")
+    reply = stored_reply or EMPTY_TWIML
+    finish(sid, reply)
+    return reply
+
+
+def finish(sid: Optional[str], reply: str) -> None:
+    """Record the reply for sid and release any retries waiting on it."""
+    if not sid:
+        return
+    with _lock:
+        entry = _recent.get(sid)
+        _remember(sid, reply)
+    if isinstance(entry, threading.Event):
+        entry.set()
+
+
+def abandon(sid: Optional[str]) -> None:
+    """Processing failed before a reply existed; let a retry try again."""
+    if not sid:
+        return
+    with _lock:
+        entry = _recent.pop(sid, None)
+    if isinstance(entry, threading.Event):
+        entry.set()
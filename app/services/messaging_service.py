@@ -1,21 +1,35 @@
 # messaging_service.py
 from typing import Optional, List, Dict, Any
 from enum import Enum
-from firebase_admin import firestore
+from concurrent.futures import ThreadPoolExecutor
+import contextvars
+import logging
+import threading
+import time
+from datetime import timedelta
 from twilio.twiml.messaging_response import MessagingResponse
-from app.adapters.firebase_client import get_firebase_client
+from app.adapters.storage import get_db, SERVER_TIMESTAMP, AlreadyExists, Increment, transactional
+from app.config import settings
 from app.utilities import utcnow, normalize_to_e164
-from app.services.auth_phone import get_or_create_user_for_phone, bind_phone_to_user
+from app.services.auth_phone import confirm_signup, bind_phone_to_user
+from app.services.auth_session import start_signup, clear_auth_session, get_auth_session, session_active, SIGNUP_PHASE
 from app.services.utilities.parser import parse_message
+from app.services.utilities.sms_render import render_sms, glyphs
 from dataclasses import asdict
-from app.services.firebase_service import create_goals_entry, get_today_goals_for_user, get_today_goal_refs, pair_user_device, get_user_data
-from app.models.models import UserDoc, Goal, Device
+from app.services import rollups, goal_view
+from app.services.goal_view import completed_all_goals_msg
+from app.services.firebase_service import get_today_date_key, create_goals_entry, get_today_goals_for_user, get_today_goal_snapshots, pair_user_device, get_user_data, dicts_to_goals
+from app.models.models import UserRecord, MessageActions
+from app.services import hot_cache
+from app.services.dispatcher import remember_sender
+from app.services import idempotency, sender_pool
+from app.services.metrics import WEBHOOK_STAGE_SECONDS, ACTION_SECONDS, ACTION_ERRORS, PHONE_LOOKUP_FALLBACK
 
 not_found_msg = "👋 Hello! Please sign up first by texting 'signup'."
-completed_all_goals_msg = "None! 🎊 Congrats, you've completed all your goals for today!\n 🙂‍↕️ Celebrate with a little treat, or text me a new goal to add more."
 
-get_firebase_client()
-db = firestore.client()
+db = get_db()
+log = logging.getLogger("messaging")
+action_log = logging.getLogger("messaging.actions")  # high volume; sample via LOG_SAMPLING
 
 
 # TODO:
@@ -24,7 +38,7 @@ db = firestore.client()
 
 def register_device(phone_number, user_id, **kwargs) -> None:
     user = get_user_data(user_id)
-    if not isinstance(user, UserDoc):
+    if not isinstance(user, UserRecord):
         return not_found_msg
     device_id = kwargs.get("device_id")
     if not device_id:
@@ -33,7 +47,7 @@ def register_device(phone_number, user_id, **kwargs) -> None:
         pair_user_device(user, device_id)
         return f"✅ Device {device_id} successfully paired to your account."
     except Exception as e:
-        print(f'⚠️ Error pairing device {device_id} to user {user.user_id}: {e}')
+        log.warning("⚠️ Error pairing device %s to user %s: %s", device_id, user.user_id, e)
         return f"⚠️ Error pairing device {device_id}. Please try again."
 
 def strip_text(text: Optional[str]) -> Optional[str]:
@@ -45,63 +59,83 @@ def strip_text(text: Optional[str]) -> Optional[str]:
 def build_response(reply_messages):
     concat = "\n".join(str(m) for m in reply_messages)
     resp = MessagingResponse()
-    resp.message(str(concat))
+    resp.message(render_sms(concat, kind="reply"))
     return resp
 
+# Actions receive the E.164 number handle_incoming_message already normalized.
+# Nothing is created until the number replies YES to the prompt (the awaiting_signup
+# session); a YES with no pending prompt just gets the prompt. Repeat texts only re-read the session.
 def prompt_signup(phone_number, user_id, **kwargs):
-    print(f'❔ Prompting signup for {phone_number}, user_id={user_id}')
-    e164 = normalize_to_e164(phone_number)
-    user_id = get_or_create_user_for_phone(e164)
-    if user_id:
-        return "Welcome! Reply YES to link this phone to a new account."
-    else:
-        return "Error creating user account. Please try again later."
+    first = start_signup(phone_number)
+    log.info("❔ Prompting signup for %s (first prompt: %s)", phone_number, first)
+    return "Welcome! Reply YES to link this phone to a new account."
 
 def signup(phone_number, user_id, **kwargs):
-    print(f'📝 Signing up {phone_number}, user_id={user_id}')
-    e164 = normalize_to_e164(phone_number)
-    if user_id:
-        bind_phone_to_user(e164, user_id)
-        return '''You are all set! You can now text me goals and updates any time.\n
+    log.info("📝 Signing up %s, user_id=%s", phone_number, user_id)
+    try:
+        if user_id:
+            bind_phone_to_user(phone_number, user_id)  # profile exists, binding missing
+        else:
+            confirm_signup(phone_number)
+    except Exception:
+        ACTION_ERRORS.inc(action="SIGNUP")
+        log.exception("❌ Signup failed for %s", phone_number)
+        return "Error creating user account. Please try again later."
+    clear_auth_session(phone_number)
+    return '''You are all set! You can now text me goals and updates any time.\n
 Available commands:\n
 🎯 Send the name of a goal to set a new goal\n
 ✅ "Done: <goal>" to set your goal as done\n
 📋 "List" for a list of today's goals\n
+📅 "Week" or "Month" for your progress so far\n
+🔥 "Streak" for your current streak\n
+🔁 "Carry off" / "Carry on" to stop or resume carrying unfinished goals to the next day\n
 🛑 "Stop" or "Unsubscribe" to stop service\n'''
-    prompt_signup(phone_number, user_id)
-    # return Response(content=str(resp), media_type="application/xml")
         
 def stop_service(phone_number, user_id, **kwargs):
     user = get_user_data(user_id)
-    if not isinstance(user, UserDoc):
+    if not isinstance(user, UserRecord):
         return not_found_msg
     user_ref = db.collection("users").document(user_id)
+    hot_cache.invalidate_user(user_id)
     user_ref.update({
         "activated": False,
     })
     return "You have been unsubscribed from daily prompts. Text 'signup' to rejoin anytime."
+def set_carry_over(phone_number, user_id, **kwargs):
+    user = get_user_data(user_id)
+    if not isinstance(user, UserRecord):
+        return not_found_msg
+    enabled = bool(kwargs.get("carry_over"))
+    hot_cache.invalidate_user(user_id)
+    db.collection("users").document(user_id).update({"rollover": enabled})
+    if enabled:
+        return "🔁 Unfinished goals will carry over to the next day."
+    return "Unfinished goals will no longer carry over. Text 'carry on' to turn it back on."
 def help_request(phone_number, user_id, **kwargs):
     return "Didn't get that... need help? Send 'commands' for tips."
 def send_help(phone_number, user_id, **kwargs):
     return '''🎯 Send the name of a goal to set a new goal\n
 ✅ "Done: `goal name`" to set your goal as done\n
 📋 "List" for a list of today's goals\n
+📅 "Week" or "Month" for your progress so far\n
+🔥 "Streak" for your current streak\n
 🛑 "Stop" or "Unsubscribe" to stop service\n'''
 
 # These two can be added together into one message
 def set_goals(phone_number, user_id, **kwargs):
     user = get_user_data(user_id)
-    if not isinstance(user, UserDoc):
+    if not isinstance(user, UserRecord):
         return not_found_msg
     goals = kwargs.get("new_goals", [])
     try:
         # Save to Firestore
-        create_goals_entry(goals=goals, user=user)
+        goals_list = create_goals_entry(goals=goals, user=user)
     except Exception as e:
-        print(f'⚠️ Error creating goals: {e}')
+        log.warning("⚠️ Error creating goals: %s", e)
         return "⚠️ Error saving goals. Please try again."
-    today_goals = get_today_goals_for_user(user)
-    goals_list = build_goals_list(today_goals)
+    if goals_list is None:  # no cached view to patch
+        goals_list = _render_today(user) or completed_all_goals_msg
     return f"✨ Goals set! \n\n {goals_list}"
 
 
@@ -133,7 +167,7 @@ def _fuzzy_score(a: str, b: str) -> float:
 def mark_done(phone_number, user_id, **kwargs):
     # 1) Resolve user
     user = get_user_data(user_id)
-    if not isinstance(user, UserDoc):
+    if not isinstance(user, UserRecord):
         return not_found_msg
 
     # 2) Targets to mark complete (normalize with strip_text)
@@ -144,9 +178,8 @@ def mark_done(phone_number, user_id, **kwargs):
         return "No matching goals found to mark as done."
 
     # 3) Load today's goal docs (collect INCOMPLETE only as candidates)
-    goal_refs = get_today_goal_refs(user)
-    docs = [(ref, ref.get()) for ref in goal_refs]
-    doc_rows = [(ref, snap.to_dict() or {}) for ref, snap in docs if snap.exists]
+    date_key = get_today_date_key(user)
+    doc_rows = [(snap.reference, snap.to_dict() or {}) for snap in get_today_goal_snapshots(user)]
 
     candidates = []
     for ref, data in doc_rows:
@@ -154,7 +187,8 @@ def mark_done(phone_number, user_id, **kwargs):
         norm = strip_text(stored_text)
         already_complete = bool(data.get("complete"))
         if norm and not already_complete:
-            candidates.append({"ref": ref, "stored_text": stored_text, "norm": norm})
+            candidates.append({"ref": ref, "stored_text": stored_text, "norm": norm,
+                               "points": int(data.get("points") or 0)})
 
     if not candidates:
         return "No matching goals found to mark as done."
@@ -163,6 +197,7 @@ def mark_done(phone_number, user_id, **kwargs):
     THRESHOLD = 0.60  # tweakable: lower = more permissive
     picked_refs = set()
     matches = []  # list of (ref, stored_text, input_text, score)
+    matched_points = 0
 
     for q_norm, q_raw in zip(targets_norm, raw_targets):
         best = None
@@ -181,55 +216,99 @@ def mark_done(phone_number, user_id, **kwargs):
         if best and best_score >= THRESHOLD:
             picked_refs.add(best["ref"])
             matches.append((best["ref"], best["stored_text"], q_raw, best_score))
+            matched_points += best["points"]
         # else: nothing close enough — we silently skip this target
 
     if not matches:
         return "No matching goals found to mark as done."
 
     # 5) Commit updates in a single batch
+    hot_cache.invalidate_goals(user_id, [ref.id for ref in picked_refs])
+    hot_cache.invalidate_user(user_id)  # streak fields live on the user doc
     batch = db.batch()
     for ref, _, _, _ in matches:
         batch.update(ref, {
             "complete": True,
-            "completed_at": firestore.SERVER_TIMESTAMP,
+            "completed_at": SERVER_TIMESTAMP,
         })
+    streak = rollups.record_goals_completed(batch, user, date_key, len(matches), matched_points)
     batch.commit()
+    rollups.apply_streak(user, streak)
+    goals_list = goal_view.goals_completed(user_id, date_key, [ref.id for ref in picked_refs])
 
     # 6) Build message (show what we matched to what, when fuzzy)
     labeled = []
+    ql, qr = glyphs()["quote_l"], glyphs()["quote_r"]
     for _, stored_text, q_raw, score in matches:
         # If it wasn't an exact normalized match, show mapping with a subtle confidence hint
         if strip_text(stored_text) != strip_text(q_raw or ""):
-            labeled.append(f"“{stored_text}” (from “{q_raw}”, {round(score*100)}%)")
+            labeled.append(f"{ql}{stored_text}{qr} (from {ql}{q_raw}{qr}, {round(score*100)}%)")
         else:
-            labeled.append(f"“{stored_text}”")
+            labeled.append(f"{ql}{stored_text}{qr}")
 
-    today_goals = get_today_goals_for_user(user)
-    goals_list = build_goals_list(today_goals)
+    if goals_list is None:
+        # No cached view: reuse the rows we already loaded instead of re-querying the day
+        goals_list = build_goals_list(dicts_to_goals(
+            data | {"complete": True} if ref in picked_refs else data for ref, data in doc_rows
+        ))
     return f"💫 Way to go! Marked as done: {', '.join(labeled)} \nRemaining goals:\n{goals_list}"
 
 
 def build_goals_list(today_goals):
-    total_points = sum(g.points for g in today_goals)
-    completed_points = sum(g.points for g in today_goals if g.complete)
-    if total_points == completed_points:
-        return completed_all_goals_msg
-    pct_complete = round(100*completed_points/total_points)
-    goals_list = "\n".join([f"{'✓' if g.complete else '▢'} {g.goal_text} ({g.points} pt) " for g in today_goals])
-    progress_info = "Progress: " + f"{pct_complete}% ({completed_points}/{total_points} pts)"
-    normalized_earned = round(completed_points * 10 / total_points)
-    progress_bar = "Progress: " + "■" * normalized_earned + "▢" * (10 - normalized_earned)
-    return f"🎯Today's Goals\n{goals_list}\n\n{progress_bar}\n{progress_info}\n"
+    return goal_view.render_goals(today_goals)
+
+def _render_today(user: UserRecord) -> Optional[str]:
+    """Today's goal list from the view cache if the day hasn't changed, else read, render and cache it; None if no goals."""
+    date_key = get_today_date_key(user)
+    version = goal_view.day_version(user.user_id, date_key) if settings.GOAL_VIEW_CACHE else 0
+    text = goal_view.get(user.user_id, date_key, version)
+    if text is not None:
+        return text
+    today_goals = get_today_goals_for_user(user)
+    if not today_goals:
+        return None
+    return goal_view.put(user.user_id, date_key, version, today_goals)
 
 def list_goals(phone_number, user_id, **kwargs):
     user = get_user_data(user_id)
-    today_goals = get_today_goals_for_user(user)
-    if not today_goals:
+    response_text = _render_today(user)
+    if response_text is None:
         return "You have no goals set for today."
-    response_text = build_goals_list(today_goals)    
     return response_text
 
 
+def _period_summary(label: str, rollup: dict) -> str:
+    if not rollup["goals_total"]:
+        return f"No goals logged {label} yet."
+    pct = rollups.completion_pct(rollup)
+    pct_text = f" ({pct}%)" if pct is not None else ""
+    return (f"📅 {label.capitalize()}: {rollup['goals_completed']}/{rollup['goals_total']} goals done, "
+            f"{rollup['completed_points']}/{rollup['total_points']} pts{pct_text}")
+
+def week_summary(phone_number, user_id, **kwargs):
+    user = get_user_data(user_id)
+    if not isinstance(user, UserRecord):
+        return not_found_msg
+    today = get_today_date_key(user)
+    return _period_summary("this week", rollups.get_rollup(user_id, rollups.week_key(today)))
+
+def month_summary(phone_number, user_id, **kwargs):
+    user = get_user_data(user_id)
+    if not isinstance(user, UserRecord):
+        return not_found_msg
+    today = get_today_date_key(user)
+    return _period_summary("this month", rollups.get_rollup(user_id, rollups.month_key(today)))
+
+def streak_summary(phone_number, user_id, **kwargs):
+    user = get_user_data(user_id)
+    if not isinstance(user, UserRecord):
+        return not_found_msg
+    streak = rollups.current_streak(user, get_today_date_key(user))
+    if not streak:
+        return f"No streak going right now (best: {user.best_streak} days). Finish a goal today to start one!"
+    return f"🔥 {streak}-day streak! (best: {user.best_streak} days)"
+
+
 class Actions(Enum):
     SIGNUP = signup
     PROMPT_SIGNUP = prompt_signup
@@ -239,28 +318,104 @@ class Actions(Enum):
     SET_GOALS = set_goals
     MARK_DONE = mark_done
     LIST_GOALS = list_goals
+    WEEK_SUMMARY = week_summary
+    MONTH_SUMMARY = month_summary
+    STREAK = streak_summary
+    CARRY_OVER = set_carry_over
     PAIR_DEVICE = register_device
 
+# Functions in an Enum body don't become members, so keep the names for metrics
+ACTION_NAMES = {fn: name for name, fn in vars(Actions).items() if name.isupper() and callable(fn)}
+
+# Actions touching the same data run in order within one lane; lanes run concurrently.
+# Everything that reads or writes today's goals (or their rollups) shares a lane, so
+# "list" after "done: x" in one message always sees the update. Unlisted actions
+# (help texts) do no I/O and run inline.
+ACTION_LANES = {
+    Actions.SET_GOALS: "goals",
+    Actions.MARK_DONE: "goals",
+    Actions.LIST_GOALS: "goals",
+    Actions.WEEK_SUMMARY: "goals",
+    Actions.MONTH_SUMMARY: "goals",
+    Actions.STREAK: "goals",
+    Actions.SIGNUP: "account",
+    Actions.PROMPT_SIGNUP: "account",
+    Actions.STOP: "account",
+    Actions.CARRY_OVER: "account",
+    Actions.PAIR_DEVICE: "device",
+}
+
+_action_pool: Optional[ThreadPoolExecutor] = None
+_action_pool_lock = threading.Lock()
+
+
+def _pool() -> ThreadPoolExecutor:
+    global _action_pool
+    if _action_pool is None:
+        with _action_pool_lock:  # first messages arrive on several dispatcher threads at once
+            if _action_pool is None:
+                _action_pool = ThreadPoolExecutor(max_workers=settings.ACTION_WORKERS, thread_name_prefix="actions")
+    return _action_pool
+
+
+def shutdown_actions() -> None:
+    global _action_pool
+    with _action_pool_lock:
+        pool, _action_pool = _action_pool, None
+    if pool is not None:
+        pool.shutdown()
+
+
+def _run_action(fn, phone_number, user_id, kwargs) -> Optional[str]:
+    name = ACTION_NAMES.get(fn, getattr(fn, "__name__", str(fn)))
+    try:
+        with ACTION_SECONDS.time(action=name):
+            reply = fn(phone_number, user_id, **kwargs)
+        action_log.debug("⏩ Action: %s, ⏪ Reply: %r", name, reply)
+        return reply
+    except Exception as e:
+        ACTION_ERRORS.inc(action=name)
+        log.exception("⚠️ ERROR when committing action %s", name)
+        return None
 
-def commit_actions(phone_number, user_id, actions, **kwargs) -> bool:
 
-    reply_messages = []
-    for action in actions:
-        try:
-            fn = action.value if isinstance(action, Actions) else action
-            reply = fn(phone_number, user_id, **kwargs)
-            print(f'⏩ Action: {action}, ⏪ Reply: {reply}')
-        except Exception as e:
-            print('⚠️ ERROR when committing actions:', e)
-            reply = None
-        if reply:
-            reply_messages.append(reply)
-
-    print(f'💬 Reply messages: {reply_messages}')
+def _run_lane(lane, phone_number, user_id, kwargs) -> List[tuple]:
+    return [(i, _run_action(fn, phone_number, user_id, kwargs)) for i, fn in lane]
+
+
+def commit_actions(phone_number, user_id, actions, **kwargs) -> List[str]:
+    """Run the actions (independent lanes in parallel) and return their replies in action order."""
+    fns = [action.value if isinstance(action, Actions) else action for action in actions]
+    lanes: Dict[str, list] = {}
+    inline = []
+    for i, fn in enumerate(fns):
+        lane = ACTION_LANES.get(fn)
+        (lanes.setdefault(lane, []) if lane else inline).append((i, fn))
+
+    groups = list(lanes.values())
+    if len(groups) < 2 or settings.ACTION_WORKERS < 1:
+        results = _run_lane(sorted(inline + [a for g in groups for a in g]), phone_number, user_id, kwargs)
+    else:
+        futures = [_pool().submit(contextvars.copy_context().run, _run_lane, lane, phone_number, user_id, kwargs)
+                   for lane in groups[1:]]
+        results = _run_lane(groups[0] + inline, phone_number, user_id, kwargs)
+        for future in futures:
+            results.extend(future.result())
+
+    reply_messages = [reply for _, reply in sorted(results, key=lambda r: r[0]) if reply]
+    action_log.debug("💬 Reply messages: %r", reply_messages)
     return reply_messages
 
 
 def resolve_user_id_by_phone(e164: str) -> Optional[str]:
+    return resolve_user_and_binding(e164)[0]
+
+def resolve_user_and_binding(e164: str) -> tuple[Optional[str], bool]:
+    """
+    (user_id, binding_exists) from a single binding read.
+    binding_exists is False for an unverified (pending/backfilled) binding,
+    which still needs the user's YES, same as no binding at all.
+    """
     binding_ref = db.document(f"phone_bindings/{e164}")
     binding_doc = binding_ref.get()
 
@@ -268,10 +423,13 @@ def resolve_user_id_by_phone(e164: str) -> Optional[str]:
     if binding_doc.exists:
         data = binding_doc.to_dict() or {}
         uid = data.get("user_id")
-        if uid:
-            return uid
-    
-    # Slower route
+        if uid and not data.get("released_at"):
+            return uid, data.get("verified", True) is not False
+
+    if not settings.PHONE_LOOKUP_FALLBACK:
+        return None, False
+
+    # Slower route: should only find users whose binding the nightly check hasn't backfilled yet
     snap = (
         db.collection("users")
         .where("phones", "array_contains", e164)
@@ -280,9 +438,12 @@ def resolve_user_id_by_phone(e164: str) -> Optional[str]:
     )
 
     if snap:
-        return snap[0].id  # assuming docId == uid
+        PHONE_LOOKUP_FALLBACK.inc(result="found")
+        log.warning("⚠️ No binding for %s; found user %s via users.phones", e164, snap[0].id)
+        return snap[0].id, False  # assuming docId == uid
 
-    return None
+    PHONE_LOOKUP_FALLBACK.inc(result="unknown")
+    return None, False
 
 def save_raw_message(
     message_body: str,
@@ -291,40 +452,39 @@ def save_raw_message(
     user_id: Optional[str],
     to_number: Optional[str] = None,
     sid: Optional[str] = None,
-) -> str:
-
+    parsed: Optional[MessageActions] = None,
+) -> Optional[str]:
+    """
+    Write the audit record, raw body and parse result in one document. With a
+    sid the write is create-if-absent and doubles as the idempotency claim:
+    returns None if the SID was already saved (see reclaim).
+    """
+    now = utcnow().isoformat()
     doc = {
         "body": message_body,
         "from": from_number,
         "to": to_number,
         "user_id": user_id,
-        "received_at": utcnow().isoformat(),
+        "received_at": now,
+        "status": "processing",  # -> replied, or failed (save_reply / release_claim)
+        "claimed_at": now,
         "sid": sid,
         "source": "twilio",
+        "parsed": asdict(parsed) if parsed else {},
+        "parse_status": "parsed" if parsed else "failed",
     }
 
     if sid:
         ref = db.collection("messages").document(sid)
-        if not ref.get().exists:
-            ref.set(doc)
+        try:
+            ref.create(doc)
+        except AlreadyExists:
+            return None
         return ref.id
     else:
         _, ref = db.collection("messages").add(doc)
         return ref.id
 
-def save_user_response(user_id: Optional[str], parsed: Dict[str, Any], *, source_message_sid: Optional[str], from_number: str) -> str:
-    print(f'🔥 {asdict(parsed)}')
-    payload = {
-        "user_id": user_id,
-        "from_number": from_number,
-        "parsed": asdict(parsed),
-        "parse_status": "parsed" if parsed else "failed",
-        "source_message_sid": source_message_sid,
-        "created_at": utcnow().isoformat(),
-    }
-    _, ref = db.collection("user_responses").add(payload)
-    return ref.id
-
 def check_user_phone_binding(e164: str, user_id: str) -> bool:
     binding_ref = db.document(f"phone_bindings/{e164}")
     binding_doc = binding_ref.get()
@@ -335,6 +495,53 @@ def check_user_phone_binding(e164: str, user_id: str) -> bool:
             return True
     return False
 
+def save_reply(sid: Optional[str], reply: str) -> None:
+    """Keep the TwiML we answered with so a Twilio retry can be replayed."""
+    idempotency.finish(sid, reply)
+    if sid:
+        db.collection("messages").document(sid).update(
+            {"reply": reply, "replied_at": utcnow().isoformat(), "status": "replied"})
+
+def release_claim(sid: str) -> None:
+    """Processing failed after the storage claim; mark it so a retry can take it over."""
+    try:
+        db.collection("messages").document(sid).update({"status": "failed", "failed_at": utcnow().isoformat()})
+    except Exception as e:
+        log.warning("⚠️ Could not release claim on %s (a retry takes it over once stale): %s", sid, e)
+
+def _abandoned(claim: dict, stale_before: str) -> bool:
+    if claim.get("reply"):
+        return False
+    return claim.get("status") == "failed" or (claim.get("claimed_at") or claim.get("received_at") or "") < stale_before
+
+@transactional
+def _take_over(tx, ref, stale_before: str) -> bool:
+    snap = ref.get(transaction=tx)
+    if not snap.exists or not _abandoned(snap.to_dict() or {}, stale_before):
+        return False  # replied meanwhile, or another retry took it first
+    tx.update(ref, {"status": "processing", "claimed_at": utcnow().isoformat(), "attempts": Increment(1)})
+    return True
+
+def reclaim(sid: str) -> Optional[str]:
+    """
+    messages/{sid} already exists. Returns the reply to replay (waiting up to
+    PENDING_WAIT_SECONDS for one), or None if the claim was failed or stale and
+    this delivery took it over, so the message should be processed again.
+    """
+    ref = db.collection("messages").document(sid)
+    deadline = time.monotonic() + idempotency.PENDING_WAIT_SECONDS
+    while True:
+        snap = ref.get(field_paths=["reply", "status", "claimed_at", "received_at"])
+        claim = (snap.to_dict() or {}) if snap.exists else {}
+        if claim.get("reply"):
+            return idempotency.duplicate_from_storage(sid, claim["reply"])
+        stale_before = (utcnow() - timedelta(seconds=idempotency.CLAIM_STALE_SECONDS)).isoformat()
+        if snap.exists and _abandoned(claim, stale_before) and _take_over(db.transaction(), ref, stale_before):
+            return None
+        if time.monotonic() >= deadline:
+            return idempotency.duplicate_from_storage(sid, None)
+        time.sleep(idempotency.STORAGE_POLL_SECONDS)
+
 def handle_incoming_message(
     message: str,
     phone_number: str,
@@ -342,60 +549,105 @@ def handle_incoming_message(
     to_number: Optional[str] = None,
     sid: Optional[str] = None,           # Twilio MessageSid if available
     default_region: str = "US",
-) -> Dict[str, Any]:
-    
-    e164 = normalize_to_e164(phone_number, default_region=default_region)  
-    user_id = resolve_user_id_by_phone(e164)
-    phone_binding_exists = check_user_phone_binding(e164, user_id) if user_id else False
-    print(f'🌞 Normalized {phone_number} to {e164}, user_id={user_id}, binding exists={phone_binding_exists}')
-
-    save_raw_message(
-        message_body=message,
-        from_number=e164,
-        user_id=user_id,
-        to_number=to_number,
-        sid=sid,
-    )
-
+    e164: Optional[str] = None,          # already-normalized sender; skips re-parsing
+) -> str:
+    """Process one inbound SMS and return the TwiML reply; Twilio retries of a SID get the first reply."""
+    replay = idempotency.claim(sid)
+    if replay is not None:
+        log.info("🔁 Duplicate delivery of %s; replaying reply", sid)
+        return replay
     try:
-        parsed = parse_message(message)
-        actions_dict = asdict(parsed)
-    except Exception:
-        parsed = {}
+        result = _process_message(message, phone_number, to_number=to_number, sid=sid,
+                                  default_region=default_region, e164=e164)
+    except BaseException:
+        idempotency.abandon(sid)
+        raise
+    if isinstance(result, str):
+        return result  # duplicate caught by the storage claim
+    reply = str(result)
+    save_reply(sid, reply)
+    return reply
+
+def _process_message(message, phone_number, *, to_number, sid, default_region, e164):
+    with WEBHOOK_STAGE_SECONDS.time(stage="normalize"):
+        e164 = e164 or normalize_to_e164(phone_number, default_region=default_region)
+    with WEBHOOK_STAGE_SECONDS.time(stage="resolve_user"):
+        user_id, phone_binding_exists = resolve_user_and_binding(e164)
+    remember_sender(e164, user_id)
+    if phone_binding_exists:
+        sender_pool.remember_inbound(user_id, e164, to_number)  # broadcasts follow the number they text
+    log.debug("🌞 Normalized %s to %s, user_id=%s, binding exists=%s", phone_number, e164, user_id, phone_binding_exists)
+
+    with WEBHOOK_STAGE_SECONDS.time(stage="parse"):
+        try:
+            parsed = parse_message(message)
+            actions_dict = asdict(parsed)
+        except Exception:
+            log.warning("⚠️ Could not parse message from %s", e164, exc_info=True)
+            parsed = None
+            actions_dict = {}
+    log.debug("🔥 %s", actions_dict)
+
+    with WEBHOOK_STAGE_SECONDS.time(stage="save_raw"):
+        saved = save_raw_message(
+            message_body=message,
+            from_number=e164,
+            user_id=user_id,
+            to_number=to_number,
+            sid=sid,
+            parsed=parsed,
+        )
+    if saved is None:
+        replay = reclaim(sid)
+        if replay is not None:
+            log.info("🔁 %s already recorded; replaying stored reply", sid)
+            return replay
+        log.warning("♻️ %s was claimed but never answered; processing it again", sid)
 
-    save_user_response(
-        user_id=user_id,
-        parsed=parsed,
-        source_message_sid=sid,
-        from_number=e164,
-    )
+    try:
+        return _respond(e164, user_id, phone_binding_exists, parsed, actions_dict)
+    except BaseException:
+        if sid:
+            release_claim(sid)
+        raise
 
+def _respond(e164, user_id, phone_binding_exists, parsed, actions_dict):
     next_actions: List[Actions] = []
 
     # actions = route_actions(user_id, parsed)
 
     if user_id is None:
-        next_actions.append(Actions.PROMPT_SIGNUP)  # reply asking to link/verify
+        # YES creates the account, but only in answer to our prompt; anything else (re)sends it
+        prompted = session_active(get_auth_session(e164), SIGNUP_PHASE)
+        next_actions.append(Actions.SIGNUP if parsed and parsed.signup and prompted else Actions.PROMPT_SIGNUP)
     else:
         if phone_binding_exists is False:
-            parsed.signup and next_actions.append(Actions.SIGNUP)  # reply asking to link/verify    
+            parsed is not None and parsed.signup and next_actions.append(Actions.SIGNUP)  # reply asking to link/verify
+        elif parsed is None:
+            next_actions.append(Actions.HELP_REQ)
         else:
             if(parsed.help): next_actions.append(Actions.SEND_HELP)
             if(parsed.stop): next_actions.append(Actions.STOP)
             if(parsed.list_goals): next_actions.append(Actions.LIST_GOALS)
+            if(parsed.week): next_actions.append(Actions.WEEK_SUMMARY)
+            if(parsed.month): next_actions.append(Actions.MONTH_SUMMARY)
+            if(parsed.streak): next_actions.append(Actions.STREAK)
+            if(parsed.carry_over is not None): next_actions.append(Actions.CARRY_OVER)
             if(len(parsed.new_goals) > 0): next_actions.append(Actions.SET_GOALS)
             if(len(parsed.mark_done) > 0): next_actions.append(Actions.MARK_DONE)
             if(parsed.device_id): next_actions.append(Actions.PAIR_DEVICE)
-            if len(next_actions) == 0 or parsed == {}:
+            if len(next_actions) == 0:
                 next_actions.append(Actions.HELP_REQ)
 
-    reply_messages = commit_actions(e164, user_id, next_actions, **actions_dict)
+    with WEBHOOK_STAGE_SECONDS.time(stage="actions"):
+        reply_messages = commit_actions(e164, user_id, next_actions, **actions_dict)
     
-    if len(reply_messages) == 0:
-        resp = MessagingResponse()
-        resp.message("Sorry, didn't quite get that. Send 'help' for tips.")
-        return resp
-    else:
-        compiled_response = build_response(reply_messages)
-        return compiled_response
+    with WEBHOOK_STAGE_SECONDS.time(stage="build_twiml"):
+        if len(reply_messages) == 0:
+            resp = MessagingResponse()
+            resp.message("Sorry, didn't quite get that. Send 'help' for tips.")
+            return resp
+        else:
+            compiled_response = build_response(reply_messages)
+            return compiled_response
 
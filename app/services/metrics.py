@@ -0,0 +1,252 @@
+# app/services/metrics.py
+"""
+Minimal in-process metrics with Prometheus text exposition (served at /metrics).
+
+Counters, gauges and histograms keyed by label values. Everything the app
+records is declared at the bottom of this module so it's easy to find.
+"""
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Dict, Iterable, List, Tuple
+
+from app.adapters.storage import add_op_listener, get_db
+
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_registry: List["_Metric"] = []
+
+
+def _fmt(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help: str, labelnames: Iterable[str] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def _key(self, labels: dict) -> Tuple[str, ...]:
+        return tuple(str(labels.get(n, "")) for n in self.labelnames)
+
+    def _labels(self, key: Tuple[str, ...], extra: str = "") -> str:
+        parts = [f'{n}="{_escape(v)}"' for n, v in zip(self.labelnames, key)]
+        if extra:
+            parts.append(extra)
+        return "{" + ",".join(parts) + "}" if parts else ""
+
+    def _samples(self) -> List[str]:
+        raise NotImplementedError
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        lines.extend(self._samples())
+        return "\n".join(lines)
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name, help, labelnames=()):
+        super().__init__(name, help, labelnames)
+        self._values: Dict[tuple, float] = {}
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0)
+
+    def _samples(self):
+        with self._lock:
+            items = list(self._values.items())
+        return [f"{self.name}{self._labels(k)} {_fmt(v)}" for k, v in items]
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def set(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def dec(self, amount: float = 1, **labels) -> None:
+        self.inc(-amount, **labels)
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, help, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._series: Dict[tuple, list] = {}  # key -> [bucket counts..., +Inf count, sum]
+
+    def observe(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        idx = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [0] * (len(self.buckets) + 1) + [0.0]
+            series[idx] += 1
+            series[-1] += value
+
+    @contextmanager
+    def time(self, **labels):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def count(self, **labels) -> int:
+        series = self._series.get(self._key(labels))
+        return sum(series[:-1]) if series else 0
+
+    def _samples(self):
+        with self._lock:
+            items = [(k, list(v)) for k, v in self._series.items()]
+        out = []
+        for key, series in items:
+            cumulative = 0
+            for bound, n in zip(self.buckets + (float("inf"),), series[:-1]):
+                cumulative += n
+                le = 'le="%s"' % _fmt(bound)
+                out.append(f"{self.name}_bucket{self._labels(key, le)} {cumulative}")
+            out.append(f"{self.name}_sum{self._labels(key)} {_fmt(series[-1])}")
+            out.append(f"{self.name}_count{self._labels(key)} {cumulative}")
+        return out
+
+
+def render_latest() -> str:
+    return "\n".join(m.render() for m in _registry) + "\n"
+
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+# --- App metrics -------------------------------------------------------------
+
+WEBHOOK_SECONDS = Histogram(
+    "webhook_request_seconds", "End-to-end /webhook/sms handling time", ["route"])
+WEBHOOK_STAGE_SECONDS = Histogram(
+    "webhook_stage_seconds", "Time spent in each handle_incoming_message stage", ["stage"])
+ACTION_SECONDS = Histogram(
+    "action_seconds", "Time spent in each Actions handler", ["action"])
+ACTION_ERRORS = Counter(
+    "action_errors_total", "Actions handlers that raised", ["action"])
+
+STORAGE_OPS = Counter(
+    "storage_ops_total", "Storage documents read/written/deleted", ["backend", "kind"])
+STORAGE_OP_SECONDS = Histogram(
+    "storage_op_seconds", "Latency of individual storage calls", ["backend", "kind"])
+
+TWILIO_CALLS = Counter(
+    "twilio_calls_total", "Twilio REST calls", ["api", "outcome"])
+TWILIO_CALL_SECONDS = Histogram(
+    "twilio_call_seconds", "Latency of Twilio REST calls", ["api"])
+
+SMS_SEGMENTS = Histogram(
+    "sms_segments", "Billed segments per outbound SMS body", ["kind", "encoding"],
+    buckets=(1, 2, 3, 4, 5, 6, 8, 10))
+
+ADMISSION_ACTIVE = Gauge(
+    "admission_active", "Requests currently admitted per route class", ["route"])
+ADMISSION_WAITING = Gauge(
+    "admission_waiting", "Requests queued for admission per route class", ["route"])
+ADMISSION_LIMIT = Gauge(
+    "admission_limit", "Concurrency limit per route class", ["route"])
+ADMISSION_SHED = Counter(
+    "admission_shed_total", "Requests rejected by admission control", ["route", "reason"])
+ADMISSION_WAIT_SECONDS = Histogram(
+    "admission_wait_seconds", "Time queued requests waited for a slot", ["route"])
+THREADPOOL_IN_USE = Gauge(
+    "threadpool_in_use", "Worker threads busy running sync handlers", ["pool"])
+THREADPOOL_SIZE = Gauge(
+    "threadpool_size", "Worker thread capacity", ["pool"])
+
+DUPLICATE_MESSAGES = Counter(
+    "duplicate_messages_total", "Repeated MessageSids answered from the first reply", ["source"])
+
+RATE_LIMITED = Counter(
+    "rate_limited_total", "Inbound SMS over a rate limit, by bucket and outcome (reply/drop)", ["bucket", "action"])
+
+DISPATCH_QUEUED = Gauge(
+    "dispatch_queued", "Messages waiting in per-user mailboxes", ["dispatcher"])
+DISPATCH_MAILBOXES = Gauge(
+    "dispatch_active_mailboxes", "Mailboxes with queued or running work", ["dispatcher"])
+DISPATCH_WAIT_SECONDS = Histogram(
+    "dispatch_wait_seconds", "Time a message waited in its mailbox before running", ["dispatcher"])
+DISPATCH_MAILBOX_DEPTH = Histogram(
+    "dispatch_mailbox_depth", "Messages already queued for the same key on arrival", ["dispatcher"],
+    buckets=(0, 1, 2, 3, 5, 8, 13, 21))
+
+HOT_CACHE_LOOKUPS = Counter(
+    "hot_cache_lookups_total", "Hot cache lookups by outcome (hit/miss/fallback)", ["view", "result"])
+HOT_CACHE_ENTRIES = Gauge(
+    "hot_cache_entries", "Users held by each hot cache view", ["view"])
+
+BROADCAST_RECIPIENTS = Gauge(
+    "broadcast_recipients", "Recipients in the last run of a broadcast job", ["job"])
+BROADCAST_FAILURES = Gauge(
+    "broadcast_failures", "Failed sends in the last run of a broadcast job", ["job"])
+BROADCAST_DURATION = Gauge(
+    "broadcast_duration_seconds", "Wall time of the last run of a broadcast job", ["job"])
+BROADCAST_LAST_RUN = Gauge(
+    "broadcast_last_run_timestamp_seconds", "Unix time the broadcast job last finished", ["job"])
+ROLLOVER_GOALS = Counter(
+    "rollover_goals_total", "Incomplete goals carried into a user's new day")
+PHONE_LOOKUP_FALLBACK = Counter(
+    "phone_lookup_fallback_total", "Senders without a binding, by whether users.phones had them", ["result"])
+BINDING_ISSUES = Gauge(
+    "binding_issues", "Problems found by the last binding consistency check", ["issue"])
+RETENTION_DOCS = Counter(
+    "retention_docs_total", "Documents aged out by the retention job", ["collection", "action"])
+RETENTION_DOCS_PER_SECOND = Gauge(
+    "retention_docs_per_second", "Delete throughput of the last retention run", ["collection"])
+GOAL_VIEW_EVENTS = Counter(
+    "goal_view_events_total", "Rendered goal list cache (hit/miss/patched/dropped)", ["event"])
+SENDER_MESSAGES = Counter(
+    "sender_messages_total", "Broadcast sends by pool number and outcome", ["sender", "outcome"])
+
+
+def _on_storage_op(op) -> None:
+    backend = getattr(get_db(), "backend", "unknown")
+    STORAGE_OPS.inc(op.count, backend=backend, kind=op.kind)
+    STORAGE_OP_SECONDS.observe(op.duration, backend=backend, kind=op.kind)
+
+
+add_op_listener(_on_storage_op)
+
+
+@contextmanager
+def twilio_call(api: str):
+    """Time a Twilio REST call and count its outcome."""
+    started = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        TWILIO_CALLS.inc(api=api, outcome="error")
+        raise
+    else:
+        TWILIO_CALLS.inc(api=api, outcome="ok")
+    finally:
+        TWILIO_CALL_SECONDS.observe(time.perf_counter() - started, api=api)
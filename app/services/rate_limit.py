@@ -0,0 +1,173 @@
+# app/services/rate_limit.py
+"""
+Token-bucket rate limiting for inbound SMS.
+
+Buckets are keyed by sender (E.164) and by MessageSid prefix (SM/MM..., i.e.
+a global cap per message type). RATE_LIMITS is "name=burst:per_second,...",
+e.g. "phone=10:0.2,sid=200:50" lets one phone send 10 at once and then one
+every 5s.
+
+Checks run after signature validation, so a spoofed From can't throttle
+someone else's number. An over-limit message is only counted in metrics:
+the first one in a burst gets RATE_LIMIT_REPLY, the rest get an empty TwiML
+response (no outbound SMS). All buckets are checked before any is charged,
+so a message stopped by the SID cap doesn't use up the sender's tokens, and
+Twilio retries of a MessageSid this process has already claimed are free.
+
+With RATE_LIMIT_SHARED, a key that has used over half of its local burst is
+also checked against a bucket in storage (`rate_limits/{name}:{key}`), so
+several workers can't each grant the full rate. Normal senders never touch
+storage.
+"""
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+from app.adapters.storage import get_db, transactional
+from app.config import settings
+from app.services import idempotency
+from app.services.metrics import RATE_LIMITED
+
+log = logging.getLogger("rate_limit")
+
+MAX_KEYS = 50_000  # buckets kept per limiter; evicted ones were idle (i.e. full) anyway
+
+ALLOW, REPLY, DROP = "allow", "reply", "drop"
+
+
+def parse_rates(raw: Optional[str]) -> Dict[str, Tuple[float, float]]:
+    out = {}
+    for part in (raw or "").split(","):
+        if "=" not in part:
+            continue
+        name, spec = part.split("=", 1)
+        burst, _, rate = spec.partition(":")
+        out[name.strip()] = (float(burst), float(rate or 0))
+    return out
+
+
+class _Bucket:
+    __slots__ = ("tokens", "updated", "notified", "unsynced")
+
+    def __init__(self, tokens: float, updated: float):
+        self.tokens = tokens
+        self.updated = updated
+        self.notified = False
+        self.unsynced = 0  # tokens taken locally and not yet charged to the shared bucket
+
+
+@transactional
+def _take_shared(tx, ref, capacity: float, rate: float, now: float, n: int) -> bool:
+    """Charge n tokens to the shared bucket; True if it had them all."""
+    data = ref.get(transaction=tx).to_dict() or {}
+    tokens = min(capacity, float(data.get("tokens", capacity)) + (now - float(data.get("updated", now))) * rate)
+    allowed = tokens >= n
+    tx.set(ref, {"tokens": max(0.0, tokens - n), "updated": now})
+    return allowed
+
+
+class TokenBucketLimiter:
+    def __init__(self, name: str, capacity: float, rate: float, *, shared: bool = False):
+        self.name = name
+        self.capacity = max(1.0, capacity)
+        self.rate = max(0.0, rate)
+        self.shared = shared
+        self._buckets: "OrderedDict[str, _Bucket]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _refilled(self, key: str, now: float) -> _Bucket:
+        """The key's bucket, topped up to `now` (call with the lock held)."""
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = self._buckets[key] = _Bucket(self.capacity, now)
+            if len(self._buckets) > MAX_KEYS:
+                self._buckets.popitem(last=False)
+        else:
+            self._buckets.move_to_end(key)
+            bucket.tokens = min(self.capacity, bucket.tokens + (now - bucket.updated) * self.rate)
+            bucket.updated = now
+        return bucket
+
+    def has_token(self, key: str, now: Optional[float] = None) -> bool:
+        """Whether check() would find a local token, without taking it."""
+        now = time.time() if now is None else now
+        with self._lock:
+            return self._refilled(key, now).tokens >= 1
+
+    def reject(self, key: str) -> str:
+        """REPLY for the first over-limit message of a burst, DROP after that."""
+        with self._lock:
+            bucket = self._refilled(key, time.time())
+            first = not bucket.notified
+            bucket.notified = True
+        return REPLY if first else DROP
+
+    def check(self, key: str, now: Optional[float] = None) -> str:
+        """ALLOW (taking a token), or REPLY for the first over-limit message of a burst, DROP after that."""
+        now = time.time() if now is None else now
+        with self._lock:
+            bucket = self._refilled(key, now)
+            allowed = bucket.tokens >= 1
+            if allowed:
+                bucket.tokens -= 1
+                bucket.unsynced += 1
+            check_shared = allowed and self.shared and bucket.tokens < self.capacity / 2
+            if check_shared:
+                charge, bucket.unsynced = bucket.unsynced, 0
+
+        if check_shared:
+            try:
+                ref = get_db().collection("rate_limits").document(f"{self.name}:{key}")
+                allowed = _take_shared(get_db().transaction(), ref, self.capacity, self.rate, now, charge)
+            except Exception as e:
+                log.warning("⚠️ Shared rate limit check failed for %s: %s", key, e)  # fail open
+
+        if allowed:
+            with self._lock:
+                bucket.notified = False
+            return ALLOW
+        return self.reject(key)
+
+
+_limiters: Optional[Dict[str, TokenBucketLimiter]] = None
+
+
+def limiters() -> Dict[str, TokenBucketLimiter]:
+    global _limiters
+    if _limiters is None:
+        _limiters = {
+            name: TokenBucketLimiter(name, burst, rate, shared=settings.RATE_LIMIT_SHARED)
+            for name, (burst, rate) in parse_rates(settings.RATE_LIMITS).items()
+        }
+    return _limiters
+
+
+def _limited(name: str, key: str, verdict: str) -> str:
+    RATE_LIMITED.inc(bucket=name, action=verdict)
+    if verdict == REPLY:
+        log.warning("🛑 Rate limited %s %s", name, key)
+    return verdict
+
+
+def check_inbound(e164: str, message_sid: Optional[str]) -> str:
+    """
+    Verdict for one inbound message across all configured buckets. Every
+    bucket is checked before any is charged, and a Twilio retry of a SID this
+    process already claimed is let through for free (it only replays a reply).
+    With RATE_LIMIT_SHARED this can block on storage; call it off the event loop.
+    """
+    if not settings.RATE_LIMIT_ENABLED or idempotency.seen(message_sid):
+        return ALLOW
+    keys = {"phone": e164, "sid": (message_sid or "")[:2] or "none"}
+    buckets = [(name, limiter, keys[name]) for name, limiter in limiters().items() if name in keys]
+    now = time.time()
+    for name, limiter, key in buckets:
+        if not limiter.has_token(key, now):
+            return _limited(name, key, limiter.reject(key))
+    for name, limiter, key in buckets:
+        verdict = limiter.check(key, now)
+        if verdict != ALLOW:  # only the shared bucket can still say no here
+            return _limited(name, key, verdict)
+    return ALLOW
@@ -0,0 +1,123 @@
+# app/services/rollover.py
+"""
+Carry unfinished goals into the user's new day.
+
+Runs hourly; each user is handled on the first run after their local
+midnight. One collection-group query pages through recent incomplete goals
+across all users, so users with nothing to carry cost no reads at all.
+
+Per user, in one transaction: the carried goals (same document ID as the
+source goal), the new day's counters (week/month only when the day starts a
+new period, so a goal isn't counted twice in "week"/"month") and a
+`rollover_day` checkpoint on the user doc. The checkpoint is read inside the
+transaction, so when the scheduler in two instances (or a retry) overlaps,
+only one run carries a user's goals; the other can't reset a carried goal
+the user has since completed, or add to the counters again.
+
+Users opt out with `rollover: false` (SMS "carry off").
+
+Firestore needs a collection-group index on goals (complete ASC, created_at ASC).
+"""
+import logging
+from collections import defaultdict
+from datetime import date, datetime, timedelta, timezone
+from typing import Dict, List, Tuple
+
+from app.adapters.storage import get_db, stream_pages, transactional
+from app.config import settings
+from app.models.models import GoalRecord, UserRecord
+from app.services import hot_cache, rollups, goal_view
+from app.services.firebase_service import get_today_date_key
+
+log = logging.getLogger("rollover")
+db = get_db()
+
+PAGE_SIZE = 1000    # goals per collection-group page
+USER_READ_CHUNK = 100
+
+
+def _recent_incomplete_goals(since: datetime):
+    """Incomplete goal snapshots created since `since`, across all users, page by page."""
+    query = (db.collection_group("goals")
+             .where("complete", "==", False)
+             .where("created_at", ">=", since)
+             .order_by("created_at"))
+    return stream_pages(query, PAGE_SIZE)
+
+
+def _group_by_user(snaps) -> Dict[str, List[Tuple[str, str, dict]]]:
+    """user_id -> [(goal_id, day, data)] from goal paths users/{uid}/days/{day}/goals/{id}."""
+    by_user: Dict[str, List[Tuple[str, str, dict]]] = defaultdict(list)
+    for snap in snaps:
+        parts = snap.reference.path.split("/")
+        if len(parts) != 6 or parts[0] != "users" or parts[2] != "days":
+            continue
+        by_user[parts[1]].append((snap.id, parts[3], snap.to_dict() or {}))
+    return by_user
+
+
+def _load_users(user_ids: List[str]) -> Dict[str, UserRecord]:
+    users = {}
+    for i in range(0, len(user_ids), USER_READ_CHUNK):
+        refs = [db.collection("users").document(uid) for uid in user_ids[i:i + USER_READ_CHUNK]]
+        for snap in db.get_all(refs):
+            if snap.exists:
+                users[snap.id] = UserRecord.from_doc(snap.to_dict() or {}, snap.id)
+    return users
+
+
+@transactional
+def _carry(tx, user_ref, today: str, yesterday: str, goals: List[Tuple[str, str, dict]], now: datetime) -> bool:
+    """
+    Copy one user's goals into today and set the checkpoint, unless another run
+    already did (the checkpoint is read inside the transaction). True if carried.
+    """
+    snap = user_ref.get(transaction=tx)
+    if not snap.exists or ((snap.to_dict() or {}).get("rollover_day") or "") >= today:
+        return False
+    day_goals = user_ref.collection("days").document(today).collection("goals")
+    points = 0
+    for goal_id, day, data in goals:
+        goal = GoalRecord(str(data.get("goal_text") or ""), int(data.get("points") or 0), created_at=now)
+        tx.set(day_goals.document(goal_id), {**goal.to_doc(), "carried_from": day})
+        points += goal.points
+    rollups.record_goals_carried(tx, user_ref.id, today, yesterday, len(goals), points)
+    tx.set(user_ref, {"rollover_day": today}, merge=True)
+    return True
+
+
+def run_rollover(now: datetime = None) -> Tuple[int, int, int]:
+    """Carry incomplete goals for every user past local midnight; returns (users, goals, failed users)."""
+    now = now or datetime.now(timezone.utc)
+    since = now - timedelta(hours=settings.ROLLOVER_LOOKBACK_HOURS)
+    by_user = _group_by_user(_recent_incomplete_goals(since))
+    users = _load_users(sorted(by_user))
+
+    carried_users = carried_goals = failed_users = 0
+    for user_id, goals in by_user.items():
+        user = users.get(user_id)
+        if user is None or not user.activated or not user.rollover:
+            continue
+        today = get_today_date_key(user, now)
+        if user.rollover_day and user.rollover_day >= today:
+            continue  # already carried today
+        # Only yesterday's copies: an older copy of a goal that was carried and then
+        # completed yesterday is still incomplete on its own day.
+        yesterday = (date.fromisoformat(today) - timedelta(days=1)).isoformat()
+        todo = [g for g in goals if g[1] == yesterday][:settings.ROLLOVER_MAX_GOALS]
+        if not todo:
+            continue
+        hot_cache.invalidate_goals(user_id, [g[0] for g in todo])
+        hot_cache.invalidate_user(user_id)
+        try:
+            carried = _carry(db.transaction(), db.collection("users").document(user_id), today, yesterday, todo, now)
+        except Exception as e:
+            # Nothing for this user landed (no checkpoint either); the next hourly run retries.
+            log.error("❌ Rollover for user %s failed: %s", user_id, e)
+            failed_users += 1
+            continue
+        if carried:
+            goal_view.changed(user_id)
+            carried_users += 1
+            carried_goals += len(todo)
+    return carried_users, carried_goals, failed_users
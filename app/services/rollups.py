@@ -0,0 +1,125 @@
+# app/services/rollups.py
+"""
+Pre-aggregated goal history so "week", "month" and "streak" are one read.
+
+Counters are kept incrementally, in the same batch as the goal writes:
+  users/{uid}/days/{datekey}          goals_total, goals_completed, total_points, completed_points
+                                      (+ carried: goals rolled over from the day before,
+                                       version: +1 per goal write, see goal_view.py)
+  users/{uid}/rollups/week-YYYY-Www   same counters for the ISO week
+  users/{uid}/rollups/month-YYYY-MM   same counters for the month
+  users/{uid}                         streak, best_streak, last_complete_day
+
+A day counts toward the streak once any goal in it is completed.
+Completion ratios are computed when read, because ratios can't be incremented.
+"""
+from datetime import date, timedelta
+from typing import Optional
+
+from app.adapters.storage import get_db, Increment, SERVER_TIMESTAMP
+from app.models.models import UserRecord
+
+db = get_db()
+
+COUNTERS = ("goals_total", "goals_completed", "total_points", "completed_points")
+
+
+def week_key(date_key: str) -> str:
+    year, week, _ = date.fromisoformat(date_key).isocalendar()
+    return f"week-{year}-W{week:02d}"
+
+
+def month_key(date_key: str) -> str:
+    return f"month-{date_key[:7]}"
+
+
+def _docs(user_id: str, date_key: str):
+    user_ref = db.collection("users").document(user_id)
+    return (
+        user_ref.collection("days").document(date_key),
+        user_ref.collection("rollups").document(week_key(date_key)),
+        user_ref.collection("rollups").document(month_key(date_key)),
+    )
+
+
+def _bump(batch, user_id: str, date_key: str, *, week: bool = True, month: bool = True,
+          day_only: tuple = (), **deltas) -> None:
+    """One merge-set per document; `day_only` counters skip the week/month rollups."""
+    fields = {k: Increment(v) for k, v in deltas.items() if v}
+    if not fields:
+        return
+    day_ref, week_ref, month_ref = _docs(user_id, date_key)
+    batch.set(day_ref, {**fields, "datekey": date_key, "version": Increment(1), "updated_at": SERVER_TIMESTAMP},
+              merge=True)
+    period = {k: v for k, v in fields.items() if k not in day_only}
+    if week and period:
+        batch.set(week_ref, {**period, "period": week_ref.id, "updated_at": SERVER_TIMESTAMP}, merge=True)
+    if month and period:
+        batch.set(month_ref, {**period, "period": month_ref.id, "updated_at": SERVER_TIMESTAMP}, merge=True)
+
+
+def touch_day(batch, user_id: str, date_key: str) -> None:
+    """Bump the day's version for a goal write that changes no counters (see goal_view)."""
+    day_ref, _, _ = _docs(user_id, date_key)
+    batch.set(day_ref, {"datekey": date_key, "version": Increment(1), "updated_at": SERVER_TIMESTAMP}, merge=True)
+
+
+def record_goals_added(batch, user_id: str, date_key: str, count: int, points: int) -> None:
+    _bump(batch, user_id, date_key, goals_total=count, total_points=points)
+
+
+def record_goals_carried(batch, user_id: str, date_key: str, from_key: str, count: int, points: int) -> None:
+    """
+    Goals copied from `from_key` into `date_key`. They count in the new day, but
+    in a week/month only if they weren't already counted there.
+    """
+    _bump(batch, user_id, date_key, week=week_key(date_key) != week_key(from_key),
+          month=month_key(date_key) != month_key(from_key), day_only=("carried",),
+          goals_total=count, total_points=points, carried=count)
+
+
+def record_goals_completed(batch, user: UserRecord, date_key: str, count: int, points: int) -> Optional[dict]:
+    """
+    Add completions to the rollups and advance the user's streak (caller commits).
+    Returns the new streak fields, for apply_streak() once the batch is committed.
+    """
+    _bump(batch, user.user_id, date_key, goals_completed=count, completed_points=points)
+    if not count or user.last_complete_day == date_key:
+        return None
+    yesterday = (date.fromisoformat(date_key) - timedelta(days=1)).isoformat()
+    streak = user.streak + 1 if user.last_complete_day == yesterday else 1
+    update = {"streak": streak, "best_streak": max(streak, user.best_streak), "last_complete_day": date_key}
+    batch.set(db.collection("users").document(user.user_id), update, merge=True)
+    return update
+
+
+def record_goals_reopened(batch, user_id: str, date_key: str, count: int, points: int) -> None:
+    """Take un-completed goals back out of the rollups; the streak keeps the day."""
+    _bump(batch, user_id, date_key, goals_completed=-count, completed_points=-points)
+
+
+def apply_streak(user: UserRecord, update: Optional[dict]) -> None:
+    """Mirror a committed streak update onto the record (it may be the shared hot-cache one)."""
+    if update:
+        user.streak, user.best_streak, user.last_complete_day = (
+            update["streak"], update["best_streak"], update["last_complete_day"])
+
+
+def current_streak(user: UserRecord, today_key: str) -> int:
+    """The stored streak, or 0 if it lapsed (no completion today or yesterday)."""
+    if not user.last_complete_day:
+        return 0
+    yesterday = (date.fromisoformat(today_key) - timedelta(days=1)).isoformat()
+    return user.streak if user.last_complete_day in (today_key, yesterday) else 0
+
+
+def get_rollup(user_id: str, period_key: str) -> dict:
+    snap = db.collection("users").document(user_id).collection("rollups").document(period_key).get()
+    data = (snap.to_dict() or {}) if snap.exists else {}
+    return {k: int(data.get(k) or 0) for k in COUNTERS}
+
+
+def completion_pct(rollup: dict) -> Optional[int]:
+    if not rollup.get("total_points"):
+        return None
+    return round(100 * rollup["completed_points"] / rollup["total_points"])
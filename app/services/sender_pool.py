@@ -0,0 +1,170 @@
+# app/services/sender_pool.py
+"""
+Outbound sender pool: spread broadcasts over several Twilio numbers.
+
+A long code sends about one message per second, so with a single number the
+9:00 broadcast takes at least as many seconds as there are users. With
+TWILIO_SENDER_NUMBERS set:
+
+  - each user gets one number, by rendezvous hashing on their phone (the same
+    in every process and across restarts; adding a number moves only ~1/n of
+    users), or the pool number they last texted (`users.sender`, recorded from
+    the inbound `To`), so replies and broadcasts come from the number they know
+  - a broadcast runs one lane per number, each paced by its own
+    SENDER_RATE_PER_SECOND limiter, so throughput grows with the pool size
+    (without a pool, sends are not paced)
+
+With TWILIO_MESSAGING_SERVICE_SID, messages go out through the Messaging
+Service instead (Twilio picks the number and keeps its own sticky sender); the
+pool numbers, if listed, still set how many paced lanes a broadcast gets.
+"""
+import contextvars
+import hashlib
+import logging
+import threading
+import time
+from collections import OrderedDict, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from typing import Callable, Dict, Iterable, List, Optional, Tuple, Union
+
+from app.adapters.storage import get_db
+from app.config import settings
+from app.services import hot_cache
+from app.services.metrics import SENDER_MESSAGES
+
+log = logging.getLogger("sender_pool")
+db = get_db()
+
+MAX_REMEMBERED = 50_000  # phones whose inbound `To` was already recorded by this process
+
+Message = Union[str, Callable[[], str]]  # text, or built in the sender's lane (e.g. needs reads)
+
+
+@lru_cache(maxsize=4)
+def _parse(raw: Optional[str], fallback: str) -> Tuple[str, ...]:
+    numbers = tuple(dict.fromkeys(n.strip() for n in (raw or "").split(",") if n.strip()))
+    return numbers or (fallback,)
+
+
+def senders() -> Tuple[str, ...]:
+    """The pool's numbers (TWILIO_NUMBER alone when no pool is configured)."""
+    return _parse(settings.TWILIO_SENDER_NUMBERS, settings.TWILIO_NUMBER)
+
+
+def _weight(sender: str, phone: str) -> bytes:
+    return hashlib.sha1(f"{sender}|{phone}".encode()).digest()
+
+
+def sender_for(phone: str, preferred: Optional[str] = None) -> str:
+    """The number `phone` is sent from: `preferred` if it's in the pool, else its hashed number."""
+    pool = senders()
+    if preferred in pool:
+        return preferred
+    if len(pool) == 1:
+        return pool[0]
+    return max(pool, key=lambda s: _weight(s, phone))
+
+
+def send_kwargs(sender: str) -> dict:
+    """`messages.create` arguments naming the sender."""
+    if settings.TWILIO_MESSAGING_SERVICE_SID:
+        return {"messaging_service_sid": settings.TWILIO_MESSAGING_SERVICE_SID}
+    return {"from_": sender}
+
+
+class _Pacer:
+    """Spaces sends from one number at most `rate` per second (0 = unpaced)."""
+
+    def __init__(self, rate: float):
+        self.interval = 1.0 / rate if rate > 0 else 0.0
+        self._next = 0.0
+        self._lock = threading.Lock()
+
+    def wait(self) -> None:
+        if not self.interval:
+            return
+        with self._lock:
+            now = time.monotonic()
+            at = max(now, self._next)
+            self._next = at + self.interval
+        if at > now:
+            time.sleep(at - now)
+
+
+_pacers: Dict[str, _Pacer] = {}
+_pacers_lock = threading.Lock()
+
+
+def _pacer(sender: str) -> _Pacer:
+    with _pacers_lock:
+        pacer = _pacers.get(sender)
+        if pacer is None:
+            # Without a pool, sends stay unpaced as before (Twilio queues them)
+            rate = settings.SENDER_RATE_PER_SECOND if settings.TWILIO_SENDER_NUMBERS else 0
+            pacer = _pacers[sender] = _Pacer(rate)
+        return pacer
+
+
+def _run_lane(sender: str, items: List[Tuple[str, Message]], send: Callable[[str, str, str], bool]) -> int:
+    pacer, failures = _pacer(sender), 0
+    for to, message in items:
+        text = message() if callable(message) else message
+        pacer.wait()
+        ok = send(to, text, sender)
+        SENDER_MESSAGES.inc(sender=sender, outcome="ok" if ok else "error")
+        failures += not ok
+    return failures
+
+
+def broadcast(items: Iterable[Tuple[str, Optional[str], Message]], send: Callable[[str, str, str], bool]) -> int:
+    """
+    Send (phone, preferred sender, message) items through the pool, one paced
+    lane per number; `send(to, text, sender)` returns False on failure.
+    Returns the number of failed sends.
+    """
+    lanes: Dict[str, List[Tuple[str, Message]]] = defaultdict(list)
+    for to, preferred, message in items:
+        lanes[sender_for(to, preferred)].append((to, message))
+    if len(lanes) < 2:
+        return sum(_run_lane(sender, queued, send) for sender, queued in lanes.items())
+    with ThreadPoolExecutor(max_workers=len(lanes), thread_name_prefix="senders") as pool:
+        futures = [pool.submit(contextvars.copy_context().run, _run_lane, sender, queued, send)
+                   for sender, queued in lanes.items()]
+        return sum(f.result() for f in futures)
+
+
+_remembered: "OrderedDict[str, str]" = OrderedDict()
+_remembered_lock = threading.Lock()
+
+
+def _stored_sender(user_id: str) -> Optional[str]:
+    cached = hot_cache.get_user(user_id)
+    if cached is not None:
+        return cached.sender
+    snap = db.collection("users").document(user_id).get(field_paths=["sender"])
+    return (snap.to_dict() or {}).get("sender") if snap.exists else None
+
+
+def remember_inbound(user_id: Optional[str], e164: str, to_number: Optional[str]) -> None:
+    """Record the pool number a user texted so broadcasts to them come from it."""
+    if not user_id or not to_number or len(senders()) < 2 or to_number not in senders():
+        return
+    with _remembered_lock:
+        if _remembered.get(e164) == to_number:
+            _remembered.move_to_end(e164)
+            return
+        _remembered[e164] = to_number
+        while len(_remembered) > MAX_REMEMBERED:
+            _remembered.popitem(last=False)
+    try:
+        if _stored_sender(user_id) == to_number:
+            return  # already recorded (by an earlier process or instance)
+        hot_cache.invalidate_user(user_id)
+        db.collection("users").document(user_id).set({"sender": to_number}, merge=True)
+    except Exception as e:
+        with _remembered_lock:
+            _remembered.pop(e164, None)
+        log.warning("⚠️ Could not record sender %s for %s: %s", to_number, e164, e)
+        return
+    log.debug("📟 %s now texts %s", e164, to_number)
@@ -1,8 +1,11 @@
 import re
+import logging
 # from levenshtein import distance
 from app.models.models import MessageActions
 from typing import List, Dict, Any
 
+log = logging.getLogger("parser")
+
 # Accepts: " - 3", ": 3", " x3", "(3)", "[3]", "{3}", "3", "3 pt", "3 pts", "3 points" at the END
 POINTS_RE = re.compile(
     r"""(?:\s*(?:[-:x]\s*|[\(\[\{]\s*))?      # optional delimiter or opening bracket
@@ -70,6 +73,18 @@ def parse_message(message: str) -> MessageActions:
     if stripped == "list":
         parsed_actions.list_goals = True
         return parsed_actions
+    if stripped in {"week", "this week"}:
+        parsed_actions.week = True
+        return parsed_actions
+    if stripped in {"month", "this month"}:
+        parsed_actions.month = True
+        return parsed_actions
+    if stripped == "streak":
+        parsed_actions.streak = True
+        return parsed_actions
+    if stripped in {"carry on", "carry off"}:
+        parsed_actions.carry_over = stripped == "carry on"
+        return parsed_actions
 
     new_goals: List[Dict[str, int | str]] = []
     completed: List[str] = []
@@ -84,7 +99,7 @@ def parse_message(message: str) -> MessageActions:
         elif re.match(r'^\s*pair\b', part, flags=re.IGNORECASE):
             device_id = part.split(None, 1)[1].strip() if len(part.split(None, 1)) > 1 else None
             if device_id:
-                print("Device pairing requested:", device_id)
+                log.debug("Device pairing requested: %s", device_id)
                 parsed_actions.device_id = device_id
         else:
             goal = extract_new_goal(part)
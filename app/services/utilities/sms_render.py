@@ -0,0 +1,105 @@
+# app/services/utilities/sms_render.py
+"""
+Segment-aware rendering for outbound SMS.
+
+A message that fits GSM-7 bills 160 chars per segment (153 when split); one
+emoji or curly quote switches the whole message to UCS-2 at 70 (67). This
+module counts segments, swaps in GSM-safe glyphs when SMS_LEAN_MODE is on,
+and compacts whitespace when a message is over SMS_SEGMENT_BUDGET.
+"""
+import math
+import re
+from typing import Tuple
+
+from app.config import settings
+from app.services.metrics import SMS_SEGMENTS
+
+GSM7_BASIC = set(
+    "@£$¥èéùìòÇ\nØø\rÅåΔ_ΦΓΛΩΠΨΣΘΞÆæßÉ !\"#¤%&'()*+,-./0123456789:;<=>?"
+    "¡ABCDEFGHIJKLMNOPQRSTUVWXYZÄÖÑÜ§¿abcdefghijklmnopqrstuvwxyzäöñüà"
+)
+GSM7_EXTENDED = set("^{}\\[~]|€\f")  # cost two septets (escape + char)
+
+# Lean-mode substitutes for characters we use that would force UCS-2
+GSM_SUBSTITUTES = {
+    "‘": "'", "’": "'", "‚": "'", "“": '"', "”": '"', "„": '"',
+    "–": "-", "—": "-", "…": "...", "•": "-", " ": " ",
+    "✓": "+", "✔": "+", "▢": "-", "■": "#", "□": "-",
+}
+
+_BLANK_LINES = re.compile(r"\n[ \t]*\n+")
+_TRAILING_WS = re.compile(r"[ \t]+\n")
+_MULTI_SPACE = re.compile(r"[ \t]{2,}")
+
+
+def is_gsm7(text: str) -> bool:
+    return all(c in GSM7_BASIC or c in GSM7_EXTENDED for c in text)
+
+
+def segment_info(text: str) -> Tuple[str, int]:
+    """(encoding, billed segments) for a message body."""
+    if is_gsm7(text):
+        units = sum(2 if c in GSM7_EXTENDED else 1 for c in text)
+        single, multi, encoding = 160, 153, "GSM-7"
+    else:
+        units = len(text.encode("utf-16-le")) // 2  # emoji take two code units
+        single, multi, encoding = 70, 67, "UCS-2"
+    if units <= single:
+        return encoding, 1
+    return encoding, math.ceil(units / multi)
+
+
+def segment_count(text: str) -> int:
+    return segment_info(text)[1]
+
+
+def to_gsm(text: str) -> str:
+    """Replace known glyphs with GSM-safe ones and drop anything else outside GSM-7 (emoji)."""
+    out = []
+    for c in text:
+        c = GSM_SUBSTITUTES.get(c, c)
+        if len(c) > 1 or c in GSM7_BASIC or c in GSM7_EXTENDED:
+            out.append(c)
+    text = "".join(out)
+    text = _MULTI_SPACE.sub(" ", text)
+    return "\n".join(line.strip() for line in text.split("\n"))
+
+
+def compact(text: str) -> str:
+    """Collapse blank lines and padding; never changes wording."""
+    text = _TRAILING_WS.sub("\n", text.strip())
+    text = _BLANK_LINES.sub("\n", text)
+    return _MULTI_SPACE.sub(" ", text)
+
+
+def lean_mode() -> bool:
+    return bool(settings.SMS_LEAN_MODE)
+
+
+def glyphs() -> dict:
+    """Checklist/progress glyphs for the current mode."""
+    if lean_mode():
+        return {"done": "+", "todo": "-", "bar_on": "#", "bar_off": "-", "quote_l": '"', "quote_r": '"'}
+    return {"done": "✓", "todo": "▢", "bar_on": "■", "bar_off": "▢", "quote_l": "“", "quote_r": "”"}
+
+
+def segments_as_sent(text: str) -> int:
+    """Segments `text` will bill after render_sms's lean-mode substitutions."""
+    return segment_count(compact(to_gsm(text)) if lean_mode() else text)
+
+
+def render_sms(text: str, *, kind: str = "reply", budget: int = 0) -> str:
+    """
+    Final pass before a body goes to Twilio: GSM-safe and compact in lean mode,
+    compacted when over the segment budget otherwise, and the segment count
+    reported to metrics.
+    """
+    budget = budget or settings.SMS_SEGMENT_BUDGET
+    if lean_mode():
+        text = compact(to_gsm(text))
+    encoding, segments = segment_info(text)
+    if segments > budget:
+        text = compact(text)
+        encoding, segments = segment_info(text)
+    SMS_SEGMENTS.observe(segments, kind=kind, encoding=encoding)
+    return text
@@ -0,0 +1,94 @@
+# app/tools/bench_models.py
+"""
+Construction cost and memory of goal/user representations.
+
+Compares the pydantic boundary models (Goal, UserDoc) with the slotted
+records the services use (GoalRecord, UserRecord), decoding the same
+storage-shaped dicts.
+
+    python -m app.tools.bench_models                 # 100k goals, 10k users
+    python -m app.tools.bench_models --goals 500000 --json
+"""
+import argparse
+import gc
+import json
+import time
+import tracemalloc
+from datetime import datetime, timezone
+from typing import Callable, List, Optional
+
+from app.models.models import Goal, GoalRecord, UserDoc, UserRecord
+
+
+def _goal_docs(n: int) -> List[dict]:
+    now = datetime.now(timezone.utc)
+    return [
+        {"goal_text": f"goal number {i}", "points": i % 5, "complete": i % 3 == 0,
+         "synced_to_device": False, "created_at": now, "updated_at": None, "updated_by": None}
+        for i in range(n)
+    ]
+
+
+def _user_docs(n: int) -> List[dict]:
+    now = datetime.now(timezone.utc)
+    return [
+        {"user_id": f"u{i}", "display_name": f"User {i}", "timezone": "America/Chicago",
+         "phones": [f"+1312555{i:04d}"], "devices": [], "activated": True,
+         "created_at": now, "updated_at": now}
+        for i in range(n)
+    ]
+
+
+def _measure(label: str, build: Callable[[], list]) -> dict:
+    gc.collect()
+    started = time.perf_counter()
+    objs = build()
+    seconds = time.perf_counter() - started
+    del objs
+
+    gc.collect()
+    tracemalloc.start()
+    objs = build()
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    n = len(objs)
+    return {
+        "label": label,
+        "n": n,
+        "total_ms": round(seconds * 1000, 1),
+        "us_per_obj": round(seconds / n * 1e6, 3),
+        "mib": round(current / 2**20, 2),
+        "bytes_per_obj": round(current / n),
+    }
+
+
+def run(goals: int, users: int) -> List[dict]:
+    gdocs = _goal_docs(goals)
+    udocs = _user_docs(users)
+    return [
+        _measure("Goal (pydantic)", lambda: [Goal(**d) for d in gdocs]),
+        _measure("GoalRecord.from_doc", lambda: [GoalRecord.from_doc(d) for d in gdocs]),
+        _measure("UserDoc (pydantic)", lambda: [UserDoc(**d) for d in udocs]),
+        _measure("UserRecord.from_doc", lambda: [UserRecord.from_doc(d) for d in udocs]),
+    ]
+
+
+def main(argv: Optional[list] = None) -> int:
+    p = argparse.ArgumentParser(description="Benchmark pydantic models vs slotted records.")
+    p.add_argument("--goals", type=int, default=100_000)
+    p.add_argument("--users", type=int, default=10_000)
+    p.add_argument("--json", action="store_true", help="print results as JSON")
+    args = p.parse_args(argv)
+
+    rows = run(args.goals, args.users)
+    if args.json:
+        print(json.dumps(rows, indent=2))
+        return 0
+    print(f"{'representation':<22}{'n':>9}{'total ms':>11}{'µs/obj':>9}{'MiB':>9}{'B/obj':>8}")
+    for r in rows:
+        print(f"{r['label']:<22}{r['n']:>9}{r['total_ms']:>11}{r['us_per_obj']:>9}{r['mib']:>9}{r['bytes_per_obj']:>8}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
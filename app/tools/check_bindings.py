@@ -0,0 +1,36 @@
+# app/tools/check_bindings.py
+"""
+Run the phone binding consistency check by hand.
+
+    python -m app.tools.check_bindings --dry-run     # report only
+    python -m app.tools.check_bindings --json        # backfill, full report as JSON
+
+See app/services/binding_check.py.
+"""
+import argparse
+import json
+from typing import Optional
+
+from app.services.binding_check import check_bindings
+
+
+def main(argv: Optional[list] = None) -> int:
+    p = argparse.ArgumentParser(description="Check users.phones against phone_bindings.")
+    p.add_argument("--dry-run", action="store_true", help="report missing bindings without backfilling")
+    p.add_argument("--json", action="store_true", help="print the full report as JSON")
+    args = p.parse_args(argv)
+
+    report = check_bindings(fix=not args.dry_run).as_dict()
+    if args.json:
+        print(json.dumps(report, indent=2, default=str))
+    else:
+        print(f"users={report['users']} phones={report['phones']} bindings={report['bindings']} "
+              f"backfilled={report['backfilled']} {report['counts']}")
+        for kind in ("conflicts", "orphans"):
+            for item in report[kind][:20]:
+                print(f"{kind[:-1]}: {item}")
+    return 1 if report["counts"]["conflict"] or report["counts"]["orphan"] else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
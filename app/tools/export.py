@@ -0,0 +1,40 @@
+# app/tools/export.py
+"""
+Export one user's messages, parsed responses and goals as NDJSON.
+
+    python -m app.tools.export USER_ID > history.ndjson
+    python -m app.tools.export USER_ID --gzip -o history.ndjson.gz
+
+Same stream as GET /export/{user_id} (app/services/export.py).
+"""
+import argparse
+import sys
+from typing import Optional
+
+from app.services import export
+
+
+def main(argv: Optional[list] = None) -> int:
+    p = argparse.ArgumentParser(description="Stream a user's history as NDJSON.")
+    p.add_argument("user_id")
+    p.add_argument("--gzip", action="store_true", help="gzip the output")
+    p.add_argument("-o", "--output", help="write here instead of stdout")
+    args = p.parse_args(argv)
+
+    phones = export.user_phones(args.user_id)
+    if phones is None:
+        print(f"user {args.user_id} not found", file=sys.stderr)
+        return 1
+    chunks = (export.export_gzip if args.gzip else export.export_ndjson)(args.user_id, phones)
+    out = open(args.output, "wb") if args.output else sys.stdout.buffer
+    try:
+        for chunk in chunks:
+            out.write(chunk)
+    finally:
+        if args.output:
+            out.close()
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
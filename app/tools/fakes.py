@@ -0,0 +1,111 @@
+# app/tools/fakes.py
+"""
+Local stand-ins for the external services (Twilio REST, Firebase Auth) so the
+app can be exercised end-to-end without network access. Only used by tools.
+"""
+import itertools
+import threading
+import time
+from types import SimpleNamespace
+from typing import List, Optional
+
+
+class FakeTwilioClient:
+    """Records outbound messages; Verify always approves."""
+
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+        self.sent: List[dict] = []
+        self._lock = threading.Lock()
+        self._sid = itertools.count(1)
+        self.messages = SimpleNamespace(create=self._create_message)
+        self.verify = SimpleNamespace(v2=SimpleNamespace(services=self._verify_service))
+
+    def _create_message(self, to: str, body: str, from_: Optional[str] = None, **kwargs):
+        if self.latency:
+            time.sleep(self.latency)
+        with self._lock:
+            sid = f"SMfake{next(self._sid):026d}"
+            self.sent.append({"sid": sid, "to": to, "from": from_ or kwargs.get("messaging_service_sid"), "body": body})
+        return SimpleNamespace(sid=sid, status="queued")
+
+    def _verify_service(self, sid: str):
+        ok = SimpleNamespace(status="approved")
+        return SimpleNamespace(
+            verifications=SimpleNamespace(create=lambda **kw: SimpleNamespace(status="pending")),
+            verification_checks=SimpleNamespace(create=lambda **kw: ok),
+        )
+
+
+class FakeAuth:
+    """Subset of `firebase_admin.auth` used by the services, kept in memory."""
+
+    class UserNotFoundError(Exception):
+        pass
+
+    def __init__(self):
+        self._by_uid = {}
+        self._by_phone = {}
+        self._lock = threading.Lock()
+        self._uid = itertools.count(1)
+        self.calls = 0
+
+    def get_user_by_phone_number(self, phone_number: str):
+        self.calls += 1
+        with self._lock:
+            uid = self._by_phone.get(phone_number)
+            if uid is None:
+                raise self.UserNotFoundError(phone_number)
+            return self._by_uid[uid]
+
+    def create_user(self, uid: Optional[str] = None, phone_number: Optional[str] = None,
+                    display_name: Optional[str] = None, email: Optional[str] = None, **kwargs):
+        self.calls += 1
+        with self._lock:
+            uid = uid or f"fakeuid{next(self._uid):08d}"
+            rec = SimpleNamespace(uid=uid, phone_number=phone_number, display_name=display_name, email=email)
+            self._by_uid[uid] = rec
+            if phone_number:
+                self._by_phone[phone_number] = uid
+            return rec
+
+    class ImportUserRecord(SimpleNamespace):
+        def __init__(self, uid: str, phone_number: Optional[str] = None, display_name: Optional[str] = None,
+                     email: Optional[str] = None, **kwargs):
+            super().__init__(uid=uid, phone_number=phone_number, display_name=display_name, email=email)
+
+    def import_users(self, users: list):
+        """Upserts by uid; a phone number owned by another uid fails that row (like Firebase)."""
+        self.calls += 1
+        errors = []
+        with self._lock:
+            for i, rec in enumerate(users):
+                owner = self._by_phone.get(rec.phone_number) if rec.phone_number else None
+                if owner and owner != rec.uid:
+                    errors.append(SimpleNamespace(index=i, reason="phone number already exists"))
+                    continue
+                self._by_uid[rec.uid] = rec
+                if rec.phone_number:
+                    self._by_phone[rec.phone_number] = rec.uid
+        return SimpleNamespace(success_count=len(users) - len(errors), failure_count=len(errors), errors=errors)
+
+    def delete_user(self, uid: str):
+        self.calls += 1
+        with self._lock:
+            rec = self._by_uid.pop(uid, None)
+            if rec and rec.phone_number:
+                self._by_phone.pop(rec.phone_number, None)
+
+
+def install_fakes(twilio: Optional[FakeTwilioClient] = None, auth: Optional[FakeAuth] = None):
+    """Swap the module-level Twilio clients and Auth modules for the fakes."""
+    from app.services import auth_phone, bulk_import, cron_service, firebase_service
+
+    twilio = twilio or FakeTwilioClient()
+    auth = auth or FakeAuth()
+    auth_phone.twilio_client = twilio
+    cron_service.twilio_client = twilio
+    auth_phone.auth = auth
+    firebase_service.auth = auth
+    bulk_import.auth = auth
+    return twilio, auth
@@ -0,0 +1,48 @@
+# app/tools/import_users.py
+"""
+Bulk-import users from a CSV (header row) or NDJSON file.
+
+    python -m app.tools.import_users partners.csv
+    python -m app.tools.import_users partners.ndjson --activate --errors errors.ndjson
+
+Columns: phone (required), display_name, timezone, email, uid. Re-running the
+same file resumes where it stopped (see app/services/bulk_import.py).
+"""
+import argparse
+import json
+import os
+import sys
+from typing import Optional
+
+from app.services import bulk_import
+
+
+def main(argv: Optional[list] = None) -> int:
+    p = argparse.ArgumentParser(description="Bulk-import users from CSV/NDJSON.")
+    p.add_argument("path")
+    p.add_argument("--format", choices=("csv", "ndjson"), help="default: from the file extension")
+    p.add_argument("--job-id", help="resume key (default: hash of the file)")
+    p.add_argument("--activate", action="store_true", help="enable daily prompts for imported users")
+    p.add_argument("--errors", help="write per-row errors here as NDJSON")
+    args = p.parse_args(argv)
+
+    with open(args.path, "rb") as f:
+        data = f.read()
+    fmt = args.format or ("ndjson" if os.path.splitext(args.path)[1] in (".ndjson", ".jsonl") else "csv")
+    rows = bulk_import.parse_rows(data, fmt)
+    result = bulk_import.import_users(rows, args.job_id or bulk_import.job_id_for(data), activated=args.activate)
+
+    summary = result.as_dict()
+    errors = summary.pop("errors")
+    if args.errors:
+        with open(args.errors, "w") as f:
+            f.writelines(json.dumps(e) + "\n" for e in errors)
+    else:
+        for e in errors[:20]:
+            print(f"row {e['row']}: {e['phone']!r} {e['error']}", file=sys.stderr)
+    print(json.dumps(summary))
+    return 1 if errors else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,357 @@
+# app/tools/loadtest.py
+"""
+Load harness for POST /webhook/sms.
+
+Generates a realistic message mix from many simulated phones, signs every
+request the way Twilio does (RequestValidator), and drives the app either
+in-process (ASGI) or over a local uvicorn. Storage runs on the in-memory
+engine and Twilio/Firebase Auth are faked, so numbers measure our own code.
+
+    python -m app.tools.loadtest --messages 2000 --users 200 --concurrency 20
+    python -m app.tools.loadtest --serve --json          # over local uvicorn
+    python -m app.tools.loadtest --max-p99-ms 50         # exit 1 if slower
+    python -m app.tools.loadtest --budgets               # exit 1 on storage budget / N+1 violations
+    python -m app.tools.loadtest --storage-latency-ms 20 # simulate Firestore round-trips
+    python -m app.tools.loadtest --hot-cache             # serve users/goals from listener-fed cache
+"""
+import os
+import sys
+
+# Must be set before app.config is imported anywhere.
+os.environ.setdefault("STORAGE_BACKEND", "memory")
+os.environ.setdefault("TWILIO_ACCOUNT_SID", "AC" + "0" * 32)
+os.environ.setdefault("TWILIO_AUTH_TOKEN", "loadtest-auth-token")
+os.environ.setdefault("TWILIO_VERIFY_SID", "VA" + "0" * 32)
+os.environ.setdefault("TWILIO_NUMBER", "+13125550100")
+os.environ.setdefault("MY_PHONE_NUMBER", "+13125550101")
+os.environ.setdefault("LOG_LEVEL", "DEBUG" if "--verbose" in sys.argv else "WARNING")
+if "--budgets" in sys.argv:
+    os.environ["STORAGE_PROFILE"] = "true"
+for _i, _arg in enumerate(sys.argv):
+    if _arg == "--storage-latency-ms" and _i + 1 < len(sys.argv):
+        os.environ["MEMORY_STORAGE_LATENCY_MS"] = sys.argv[_i + 1]
+# Simulated phones send far faster than real ones; per-phone limits are opt-in here.
+os.environ.setdefault("RATE_LIMIT_ENABLED", "true" if "--rate-limit" in sys.argv else "false")
+if "--hot-cache" in sys.argv:
+    os.environ["HOT_CACHE"] = "true"
+
+import argparse
+import asyncio
+import json
+import random
+import statistics
+import threading
+import time
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import List, Optional, Tuple
+
+import httpx
+import phonenumbers
+from twilio.request_validator import RequestValidator
+
+from app.config import settings
+
+GOAL_WORDS = [
+    "walk the dog", "go to the gym", "finish project", "read 20 pages", "call mom",
+    "meal prep", "stretch", "write journal", "clean kitchen", "practice guitar",
+    "study spanish", "pay bills", "water plants", "laundry", "meditate",
+]
+
+# kind -> weight; roughly what production traffic looks like
+DEFAULT_MIX = {
+    "goals": 35,
+    "done": 30,
+    "list": 20,
+    "signup": 10,
+    "pair": 5,
+}
+
+
+@dataclass
+class Phone:
+    e164: str
+    known: bool
+    goals: List[str] = field(default_factory=list)
+    said_hi: bool = False
+
+
+@dataclass
+class Result:
+    kind: str
+    status: int
+    seconds: float
+
+
+def _make_phones(rng: random.Random, count: int, known: bool, used: set) -> List[Phone]:
+    phones = []
+    while len(phones) < count:
+        candidate = f"+1312{rng.randint(2000000, 9999999)}"
+        if candidate in used:
+            continue
+        if not phonenumbers.is_valid_number(phonenumbers.parse(candidate, "US")):
+            continue
+        used.add(candidate)
+        phones.append(Phone(candidate, known))
+    return phones
+
+
+def seed_users(db, phones: List[Phone]) -> None:
+    """Create profile + phone binding for every known phone, in chunked batches."""
+    from app.utilities import utcnow
+
+    now = utcnow()
+    batch = db.batch()
+    for i, phone in enumerate(p for p in phones if p.known):
+        uid = f"load{i:07d}"
+        batch.set(db.collection("users").document(uid), {
+            "user_id": uid,
+            "display_name": f"Load {i}",
+            "phones": [phone.e164],
+            "timezone": "America/Chicago",
+            "activated": True,
+            "created_at": now,
+            "updated_at": now,
+        })
+        batch.set(db.collection("phone_bindings").document(phone.e164), {
+            "user_id": uid,
+            "verified": True,
+            "bound_at": now,
+            "released_at": None,
+            "last_seen": now,
+            "labels": ["primary"],
+        })
+        if len(batch) >= 400:
+            batch.commit()
+            batch = db.batch()
+    if len(batch):
+        batch.commit()
+
+
+def build_messages(rng: random.Random, known: List[Phone], unknown: List[Phone], count: int,
+                   mix: dict) -> List[Tuple[str, Phone, str]]:
+    kinds = list(mix)
+    weights = [mix[k] for k in kinds]
+    out = []
+    for _ in range(count):
+        kind = rng.choices(kinds, weights)[0]
+        if kind == "signup" and unknown:
+            phone = rng.choice(unknown)
+            body = "YES" if phone.said_hi else rng.choice(["hi", "hello", "what is this?"])
+            phone.said_hi = True
+        else:
+            phone = rng.choice(known)
+            if kind == "goals" or (kind == "done" and not phone.goals):
+                kind = "goals"
+                picked = rng.sample(GOAL_WORDS, rng.randint(1, 4))
+                phone.goals.extend(picked)
+                body = "\n".join(f"{g} {rng.randint(1, 5)}" for g in picked)
+            elif kind == "done":
+                goal = phone.goals.pop(rng.randrange(len(phone.goals)))
+                body = f"done {' '.join(goal.split()[:2])}"
+            elif kind == "list":
+                body = rng.choice(["list", "List", "LIST"])
+            elif kind == "pair":
+                body = f"pair ESP-{rng.randint(0, 0xFFFFFF):06X}"
+            else:
+                body = "help"
+        out.append((kind, phone, body))
+    return out
+
+
+def sign(url: str, params: dict, auth_token: str) -> str:
+    return RequestValidator(auth_token).compute_signature(url, params)
+
+
+async def _drive(client: httpx.AsyncClient, base_url: str, messages, concurrency: int,
+                 auth_token: str, to_number: str, sid_offset: int = 0) -> List[Result]:
+    url = f"{base_url}/webhook/sms"
+    sem = asyncio.Semaphore(concurrency)
+    results: List[Result] = []
+
+    async def one(i: int, kind: str, phone: Phone, body: str):
+        params = {
+            "From": phone.e164,
+            "To": to_number,
+            "Body": body,
+            "MessageSid": f"SM{sid_offset + i:032x}",
+            "AccountSid": settings.TWILIO_ACCOUNT_SID or "",
+        }
+        headers = {"X-Twilio-Signature": sign(url, params, auth_token)}
+        async with sem:
+            started = time.perf_counter()
+            resp = await client.post(url, data=params, headers=headers)
+            results.append(Result(kind, resp.status_code, time.perf_counter() - started))
+
+    await asyncio.gather(*(one(i, *m) for i, m in enumerate(messages)))
+    return results
+
+
+def _percentile(sorted_values: List[float], pct: float) -> float:
+    if not sorted_values:
+        return 0.0
+    k = max(0, min(len(sorted_values) - 1, round(pct / 100 * len(sorted_values) + 0.5) - 1))
+    return sorted_values[k]
+
+
+def summarize(results: List[Result], wall: float, ops=None) -> dict:
+    lat = sorted(r.seconds * 1000 for r in results)
+    n = len(results)
+    report = {
+        "messages": n,
+        "wall_seconds": round(wall, 3),
+        "throughput_per_s": round(n / wall, 1) if wall else 0.0,
+        "latency_ms": {
+            "p50": round(_percentile(lat, 50), 3),
+            "p95": round(_percentile(lat, 95), 3),
+            "p99": round(_percentile(lat, 99), 3),
+            "mean": round(statistics.fmean(lat), 3) if lat else 0.0,
+            "max": round(lat[-1], 3) if lat else 0.0,
+        },
+        "status": dict(Counter(r.status for r in results)),
+        "by_kind": {},
+    }
+    for kind in sorted({r.kind for r in results}):
+        kl = sorted(r.seconds * 1000 for r in results if r.kind == kind)
+        report["by_kind"][kind] = {
+            "count": len(kl),
+            "p50": round(_percentile(kl, 50), 3),
+            "p99": round(_percentile(kl, 99), 3),
+        }
+    if ops is not None and n:
+        report["storage_per_message"] = {
+            "reads": round(ops["reads"] / n, 2),
+            "writes": round(ops["writes"] / n, 2),
+            "deletes": round(ops["deletes"] / n, 2),
+        }
+    return report
+
+
+def _start_uvicorn(app, port: int):
+    import uvicorn
+
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning", lifespan="off"))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    deadline = time.time() + 10
+    while not server.started:
+        if time.time() > deadline:
+            raise RuntimeError("uvicorn did not start")
+        time.sleep(0.05)
+    return server, thread
+
+
+async def run(args) -> dict:
+    from app.adapters.storage import get_db, totals
+    from app.tools.fakes import install_fakes
+    from app.main import app
+
+    twilio, auth = install_fakes()
+    db = get_db()
+    rng = random.Random(args.seed)
+    used: set = set()
+    known = _make_phones(rng, args.users, True, used)
+    unknown = _make_phones(rng, args.unknown, False, used)
+    seed_users(db, known)
+    if args.hot_cache:
+        from app.services import hot_cache
+        hot_cache.start()
+    warm = build_messages(rng, known, unknown, min(20, args.messages), DEFAULT_MIX)
+    messages = build_messages(rng, known, unknown, args.messages, DEFAULT_MIX)
+    auth_token = settings.TWILIO_AUTH_TOKEN
+
+    server = None
+    try:
+        if args.serve:
+            server, thread = _start_uvicorn(app, args.port)
+            base_url = f"http://127.0.0.1:{args.port}"
+            client = httpx.AsyncClient(timeout=30)
+        else:
+            base_url = "http://testserver"
+            client = httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url=base_url)
+
+        # warm up imports/caches so they don't land in the measured window
+        await _drive(client, base_url, warm, 1, auth_token, settings.TWILIO_NUMBER, sid_offset=len(messages))
+        before = totals.as_dict()
+        started = time.perf_counter()
+        results = await _drive(client, base_url, messages, args.concurrency, auth_token, settings.TWILIO_NUMBER)
+        wall = time.perf_counter() - started
+        after = totals.as_dict()
+        await client.aclose()
+    finally:
+        if server is not None:
+            server.should_exit = True
+            thread.join(timeout=5)
+
+    # process-wide totals work for both modes: uvicorn runs in this process too
+    ops = {k: after[k] - before[k] for k in ("reads", "writes", "deletes")}
+    report = summarize(results, wall, ops)
+    report["mode"] = "uvicorn" if args.serve else "asgi"
+    report["twilio_sends"] = len(twilio.sent)
+    report["auth_calls"] = auth.calls
+    from app.services.metrics import ADMISSION_SHED, RATE_LIMITED
+    report["shed"] = int(sum(ADMISSION_SHED.value(route="sms", reason=r) for r in ("queue_full", "timeout")))
+    report["rate_limited"] = int(sum(RATE_LIMITED.value(bucket=b, action=a)
+                                     for b in ("phone", "sid") for a in ("reply", "drop")))
+    if args.budgets:
+        from app.adapters.storage_profiler import violations
+        report["budget_violations"] = list(violations)
+    return report
+
+
+def main(argv: Optional[list] = None) -> int:
+    p = argparse.ArgumentParser(description="Load-test /webhook/sms with signed Twilio traffic.")
+    p.add_argument("--messages", type=int, default=1000)
+    p.add_argument("--users", type=int, default=100, help="known (bound) phones")
+    p.add_argument("--unknown", type=int, default=20, help="unknown phones that try to sign up")
+    p.add_argument("--concurrency", type=int, default=10)
+    p.add_argument("--seed", type=int, default=1)
+    p.add_argument("--serve", action="store_true", help="drive a local uvicorn instead of in-process ASGI")
+    p.add_argument("--port", type=int, default=8765)
+    p.add_argument("--json", action="store_true", help="print the report as JSON")
+    p.add_argument("--verbose", action="store_true", help="log at DEBUG while running")
+    p.add_argument("--max-p99-ms", type=float, default=None, help="fail if p99 latency exceeds this")
+    p.add_argument("--max-ops-per-msg", type=float, default=None, help="fail if reads+writes per message exceed this")
+    p.add_argument("--budgets", action="store_true", help="profile storage per request; fail on route budget / N+1 violations")
+    p.add_argument("--storage-latency-ms", type=float, default=0, help="simulated round-trip per storage call")
+    p.add_argument("--rate-limit", action="store_true", help="keep inbound SMS rate limiting on")
+    p.add_argument("--hot-cache", action="store_true", help="enable the listener-fed user/goal cache (HOT_CACHE)")
+    args = p.parse_args(argv)
+
+    report = asyncio.run(run(args))
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        lat = report["latency_ms"]
+        print(f"{report['messages']} msgs in {report['wall_seconds']}s ({report['mode']}) "
+              f"-> {report['throughput_per_s']} msg/s")
+        print(f"latency ms: p50={lat['p50']} p95={lat['p95']} p99={lat['p99']} max={lat['max']}")
+        for kind, k in report["by_kind"].items():
+            print(f"  {kind:<7} n={k['count']:<6} p50={k['p50']} p99={k['p99']}")
+        if "storage_per_message" in report:
+            s = report["storage_per_message"]
+            print(f"storage per msg: reads={s['reads']} writes={s['writes']} deletes={s['deletes']}")
+        extra = [f"{k}: {report[k]}" for k in ("shed", "rate_limited") if report[k]]
+        print(f"status: {report['status']}" + (f" ({', '.join(extra)})" if extra else ""))
+
+    failed = False
+    if args.max_p99_ms is not None and report["latency_ms"]["p99"] > args.max_p99_ms:
+        print(f"FAIL: p99 {report['latency_ms']['p99']}ms > {args.max_p99_ms}ms", file=sys.stderr)
+        failed = True
+    if args.max_ops_per_msg is not None and "storage_per_message" in report:
+        s = report["storage_per_message"]
+        if s["reads"] + s["writes"] > args.max_ops_per_msg:
+            print(f"FAIL: {s['reads'] + s['writes']} storage ops/msg > {args.max_ops_per_msg}", file=sys.stderr)
+            failed = True
+    if report.get("budget_violations"):
+        for v in report["budget_violations"][:10]:
+            print(f"FAIL: {v}", file=sys.stderr)
+        failed = True
+    if any(code != 200 for code in report["status"]):
+        print(f"FAIL: non-200 responses {report['status']}", file=sys.stderr)
+        failed = True
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
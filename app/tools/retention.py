@@ -0,0 +1,33 @@
+# app/tools/retention.py
+"""
+Run the retention job by hand and print per-collection throughput.
+
+    python -m app.tools.retention                       # settings.RETENTION_DAYS
+    python -m app.tools.retention --days 90 --archive-dir /mnt/archive --json
+"""
+import argparse
+import json
+from typing import Optional
+
+from app.services.retention import run_retention
+
+
+def main(argv: Optional[list] = None) -> int:
+    p = argparse.ArgumentParser(description="Archive and delete old messages/user_responses.")
+    p.add_argument("--days", type=int, help="retention window (default: RETENTION_DAYS)")
+    p.add_argument("--archive-dir", help="archive root (default: RETENTION_ARCHIVE_DIR)")
+    p.add_argument("--json", action="store_true", help="print results as JSON")
+    args = p.parse_args(argv)
+
+    rows = [s.as_dict() for s in run_retention(days=args.days, archive_dir=args.archive_dir)]
+    if args.json:
+        print(json.dumps(rows, indent=2))
+        return 0
+    print(f"{'collection':<16}{'scanned':>9}{'archived':>10}{'deleted':>9}{'seconds':>9}{'docs/s':>9}")
+    for r in rows:
+        print(f"{r['collection']:<16}{r['scanned']:>9}{r['archived']:>10}{r['deleted']:>9}{r['seconds']:>9}{r['docs_per_second']:>9}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -1,13 +1,42 @@
 from datetime import datetime, timezone
+from functools import lru_cache
+from typing import Dict, Iterable, Optional
 import phonenumbers
 
+PHONE_CACHE_SIZE = 8192  # distinct (raw, region) pairs; invalid inputs are cached too
+
 # --- helpers -----------------------------------------------------------------
 def utcnow() -> datetime:
     return datetime.now(timezone.utc)
 
-def normalize_to_e164(raw: str, default_region: str = "US") -> str:
-    """Normalize any incoming phone string to E.164 or raise ValueError."""
-    num = phonenumbers.parse(raw, default_region)
+def utc_iso(value) -> str:
+    """UTC ISO-8601 for datetimes (naive = UTC); strings pass through. Sorts chronologically."""
+    if isinstance(value, datetime):
+        if value.tzinfo is None:
+            value = value.replace(tzinfo=timezone.utc)
+        return value.astimezone(timezone.utc).isoformat()
+    return str(value or "")
+
+@lru_cache(maxsize=PHONE_CACHE_SIZE)
+def _e164_or_none(raw: str, default_region: str) -> Optional[str]:
+    try:
+        num = phonenumbers.parse(raw, default_region)
+    except phonenumbers.NumberParseException:
+        return None
     if not phonenumbers.is_valid_number(num):
-        raise ValueError(f"Invalid phone number: {raw}")
+        return None
     return phonenumbers.format_number(num, phonenumbers.PhoneNumberFormat.E164)
+
+def normalize_to_e164(raw: str, default_region: str = "US") -> str:
+    """Normalize any incoming phone string to E.164 or raise ValueError (memoized)."""
+    e164 = _e164_or_none(raw, default_region)
+    if e164 is None:
+        raise ValueError(f"Invalid phone number: {raw}")
+    return e164
+
+def normalize_many(raws: Iterable[str], default_region: str = "US") -> Dict[str, Optional[str]]:
+    """Bulk variant for imports/broadcasts: raw -> E.164, or None when invalid."""
+    return {raw: _e164_or_none(raw, default_region) for raw in raws}
+
+def phone_cache_info():
+    return _e164_or_none.cache_info()
@@ -0,0 +1,44 @@
+# tests/conftest.py
+"""
+Tests run against the in-memory storage backend and the fakes in
+app/tools/fakes.py, so no Firestore, Twilio or Firebase Auth is needed.
+The environment has to be in place before the first `app` import.
+"""
+import os
+
+os.environ.update(
+    STORAGE_BACKEND="memory",
+    TWILIO_ACCOUNT_SID="AC" + "0" * 32,
+    TWILIO_AUTH_TOKEN="test",
+    TWILIO_VERIFY_SID="VA0",
+    TWILIO_NUMBER="+13125550100",
+    MY_PHONE_NUMBER="+13125550101",
+    LOG_LEVEL="WARNING",
+)
+
+import pytest  # noqa: E402
+
+from app.adapters.storage import get_db  # noqa: E402
+from app.tools.fakes import install_fakes  # noqa: E402
+
+
+@pytest.fixture(scope="session")
+def fakes():
+    return install_fakes()
+
+
+@pytest.fixture(autouse=True)
+def db(fakes):
+    """The shared memory store, emptied (with the per-process caches) before each test."""
+    from app.services import auth_session, goal_view, idempotency
+
+    store = get_db()
+    store.clear()
+    with idempotency._lock:
+        idempotency._recent.clear()
+    with goal_view._lock:
+        goal_view._views.clear()
+    with auth_session.store._lock:
+        auth_session.store._sessions.clear()
+    fakes[0].sent.clear()
+    return store
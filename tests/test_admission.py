@@ -0,0 +1,20 @@
+import asyncio
+
+from app.services.admission import Limiter
+
+
+def test_limiter_queues_then_sheds():
+    async def scenario():
+        limiter = Limiter("test", limit=1, queue=1)
+        assert await limiter.acquire(timeout=1) is None          # takes the only slot
+        queued = asyncio.ensure_future(limiter.acquire(timeout=1))
+        await asyncio.sleep(0)
+        assert await limiter.acquire(timeout=1) == "queue_full"  # queue of one is taken
+        limiter.release()                                        # slot passes to the queued request
+        assert await queued is None
+        assert limiter.active == 1
+        assert await limiter.acquire(timeout=0.01) == "timeout"  # nobody releases in time
+        limiter.release()
+        assert limiter.active == 0
+
+    asyncio.run(scenario())
@@ -0,0 +1,61 @@
+import pytest
+
+from app.services import bulk_import
+
+ROWS = [{"phone": f"31255512{i:02d}", "display_name": f"User {i}"} for i in range(5)]
+
+
+def _users(db) -> dict:
+    return {s.id: s.to_dict() for s in db.collection("users").get()}
+
+
+def test_imports_users_and_bindings(db):
+    result = bulk_import.import_users(ROWS + [{"phone": "nope"}, {"phone": "3125551200"}], "job1")
+
+    assert (result.created, result.skipped) == (5, 0)
+    assert [e["error"] for e in result.errors] == ["invalid phone", "duplicate phone in file"]
+    users = _users(db)
+    uid = bulk_import.uid_for_phone("+13125551200")
+    assert users[uid]["phones"] == ["+13125551200"] and users[uid]["activated"] is False
+    assert db.collection("phone_bindings").document("+13125551200").get().to_dict()["user_id"] == uid
+    assert db.collection("imports").document("job1").get().to_dict()["status"] == "done"
+
+
+def test_resumes_a_job_that_died_midway(db, monkeypatch):
+    monkeypatch.setattr(bulk_import, "AUTH_IMPORT_LIMIT", 2)
+    real_write = bulk_import._write_profiles
+    calls = []
+
+    def crash_on_second_chunk(rows, activated):
+        calls.append(len(rows))
+        if len(calls) == 2:
+            raise RuntimeError("worker died")
+        real_write(rows, activated)
+
+    monkeypatch.setattr(bulk_import, "_write_profiles", crash_on_second_chunk)
+    with pytest.raises(RuntimeError):
+        bulk_import.import_users(ROWS, "job1")
+    assert db.collection("imports").document("job1").get().to_dict()["next_row"] == 2
+
+    monkeypatch.setattr(bulk_import, "_write_profiles", real_write)
+    result = bulk_import.import_users(ROWS, "job1")
+
+    assert (result.created, result.skipped, result.errors) == (3, 2, [])
+    assert len(_users(db)) == 5
+    job = db.collection("imports").document("job1").get().to_dict()
+    assert (job["next_row"], job["created"], job["status"]) == (5, 5, "done")
+
+
+def test_reimport_keeps_existing_users_activation_and_phones(db):
+    bulk_import.import_users(ROWS[:1], "job1")
+    uid = bulk_import.uid_for_phone("+13125551200")
+    user_ref = db.collection("users").document(uid)
+    user_ref.update({"activated": True, "phones": ["+13125551200", "+13125550000"]})
+    created_at = user_ref.get().to_dict()["created_at"]
+
+    bulk_import.import_users([{"phone": "3125551200", "display_name": "Renamed"}], "job2")
+
+    user = user_ref.get().to_dict()
+    assert user["activated"] is True and user["created_at"] == created_at
+    assert user["phones"] == ["+13125551200", "+13125550000"]
+    assert user["display_name"] == "Renamed"
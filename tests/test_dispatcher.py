@@ -0,0 +1,46 @@
+import threading
+import time
+
+from app.services import dispatcher
+from app.services.dispatcher import KeyedDispatcher
+
+
+def test_messages_for_one_key_run_in_order_across_bursts():
+    pool = KeyedDispatcher(workers=4, name="test")
+    seen = {"a": [], "b": []}
+    running = {"a": 0, "b": 0}
+    overlap = []
+    lock = threading.Lock()
+
+    def handle(key, i):
+        with lock:
+            running[key] += 1
+            overlap.append(running[key])
+        time.sleep(0.001)
+        seen[key].append(i)
+        with lock:
+            running[key] -= 1
+        return i
+
+    n = dispatcher.MAX_BURST * 3
+    futures = [pool.submit(key, handle, key, i) for i in range(n) for key in ("a", "b")]
+    assert [f.result(timeout=10) for f in futures] == [i for i in range(n) for _ in ("a", "b")]
+    pool.shutdown()
+
+    assert seen == {"a": list(range(n)), "b": list(range(n))}
+    assert max(overlap) == 1  # never two messages of one key at once
+    assert not pool.busy("a") and not pool.busy("b")
+
+
+def test_handler_errors_reach_the_caller_and_the_key_keeps_going():
+    pool = KeyedDispatcher(workers=1, name="test")
+
+    def fail():
+        raise ValueError("bad message")
+
+    failed = pool.submit("a", fail)
+    ok = pool.submit("a", lambda: "next")
+
+    assert isinstance(failed.exception(timeout=5), ValueError)
+    assert ok.result(timeout=5) == "next"
+    pool.shutdown()
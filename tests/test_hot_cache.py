@@ -0,0 +1,78 @@
+import pytest
+
+from app.config import settings
+from app.services import hot_cache
+
+DAY = "2026-10-19"
+
+
+@pytest.fixture
+def cache(db, monkeypatch):
+    monkeypatch.setattr(settings, "HOT_CACHE", True)
+    for uid in ("alice", "bob"):
+        db.collection("users").document(uid).set({"user_id": uid, "activated": True, "timezone": "UTC"})
+    hot_cache.start()
+    yield db
+    hot_cache.stop()
+
+
+def _goals(db, uid):
+    return db.collection("users").document(uid).collection("days").document(DAY).collection("goals")
+
+
+def test_user_stays_dirty_until_its_own_write_is_seen(cache):
+    assert hot_cache.get_user("alice").display_name is None
+
+    hot_cache.invalidate_user("alice")
+    cache.collection("users").document("bob").set({"display_name": "Bob"}, merge=True)
+    assert hot_cache.get_user("alice") is None  # a snapshot for bob says nothing about alice
+
+    cache.collection("users").document("alice").set({"display_name": "Alice"}, merge=True)
+    assert hot_cache.get_user("alice").display_name == "Alice"
+
+
+def test_goal_view_stays_dirty_until_the_written_goals_are_seen(cache):
+    goals = _goals(cache, "alice")
+    goals.document("g1").set({"goal_text": "run", "points": 1, "complete": False})
+    goals.document("g2").set({"goal_text": "read", "points": 1, "complete": False})
+    assert hot_cache.goal_snapshots("alice", DAY) is None  # opens the listener
+    assert len(hot_cache.goal_snapshots("alice", DAY)) == 2
+
+    hot_cache.invalidate_goals("alice", ["g1"])
+    goals.document("g2").update({"complete": True})
+    assert hot_cache.goal_snapshots("alice", DAY) is None
+
+    goals.document("g1").update({"complete": True})
+    assert all(s.to_dict()["complete"] for s in hot_cache.goal_snapshots("alice", DAY))
+
+
+def test_goal_view_without_ids_waits_out_the_dirty_window(cache, monkeypatch):
+    goals = _goals(cache, "alice")
+    goals.document("g1").set({"goal_text": "run", "points": 1, "complete": False})
+    hot_cache.goal_snapshots("alice", DAY)
+
+    hot_cache.invalidate_goals("alice")
+    goals.document("g1").update({"complete": True})
+    assert hot_cache.goal_snapshots("alice", DAY) is None
+
+    monkeypatch.setattr(hot_cache, "DIRTY_SECONDS", 0.0)
+    assert hot_cache.goal_snapshots("alice", DAY)[0].to_dict()["complete"]
+
+
+def test_listeners_open_and_close_outside_the_lock(cache, monkeypatch):
+    monkeypatch.setattr(settings, "HOT_CACHE_MAX_USERS", 1)
+    collection = type(_goals(cache, "alice"))
+    held = []
+    on_snapshot = collection.on_snapshot
+
+    def checked(self, callback):
+        held.append(hot_cache._lock._is_owned())
+        watch = on_snapshot(self, callback)
+        unsubscribe = watch.unsubscribe
+        watch.unsubscribe = lambda: (held.append(hot_cache._lock._is_owned()), unsubscribe())
+        return watch
+
+    monkeypatch.setattr(collection, "on_snapshot", checked)
+    hot_cache.goal_snapshots("alice", DAY)
+    hot_cache.goal_snapshots("bob", DAY)  # evicts alice's view
+    assert held == [False, False, False]
@@ -0,0 +1,114 @@
+import threading
+from datetime import timedelta
+
+import pytest
+
+from app.services import idempotency, messaging_service
+from app.services.messaging_service import handle_incoming_message
+from app.utilities import utcnow
+from app.tools.loadtest import Phone, seed_users
+
+PHONE = "+13125551234"
+
+
+def _goal_count(db) -> int:
+    return len(list(db.collection_group("goals").stream()))
+
+
+def test_replays_the_first_reply_for_a_retried_sid(db):
+    seed_users(db, [Phone(PHONE, True)])
+
+    first = handle_incoming_message("run 3 points", PHONE, e164=PHONE, sid="SM1")
+    again = handle_incoming_message("run 3 points", PHONE, e164=PHONE, sid="SM1")
+
+    assert again == first
+    assert _goal_count(db) == 1
+
+
+def test_replays_from_storage_when_the_process_has_not_seen_the_sid(db):
+    seed_users(db, [Phone(PHONE, True)])
+    first = handle_incoming_message("run 3 points", PHONE, e164=PHONE, sid="SM1")
+
+    with idempotency._lock:  # another worker, or evicted from the LRU
+        idempotency._recent.clear()
+    again = handle_incoming_message("run 3 points", PHONE, e164=PHONE, sid="SM1")
+
+    assert again == first
+    assert _goal_count(db) == 1
+
+
+def test_new_sid_is_processed(db):
+    seed_users(db, [Phone(PHONE, True)])
+    handle_incoming_message("run 3 points", PHONE, e164=PHONE, sid="SM1")
+    handle_incoming_message("read 1 point", PHONE, e164=PHONE, sid="SM2")
+
+    assert _goal_count(db) == 2
+
+
+def test_retry_after_a_failed_delivery_processes_the_message(db, monkeypatch):
+    seed_users(db, [Phone(PHONE, True)])
+    real_commit = messaging_service.commit_actions
+    calls = []
+
+    def fail_first(*args, **kwargs):
+        calls.append(1)
+        if len(calls) == 1:
+            raise RuntimeError("storage unavailable")
+        return real_commit(*args, **kwargs)
+
+    monkeypatch.setattr(messaging_service, "commit_actions", fail_first)
+    with pytest.raises(RuntimeError):
+        handle_incoming_message("run 3 points", PHONE, e164=PHONE, sid="SM1")
+    assert db.collection("messages").document("SM1").get().to_dict()["status"] == "failed"
+
+    reply = handle_incoming_message("run 3 points", PHONE, e164=PHONE, sid="SM1")
+
+    assert "run" in reply
+    assert _goal_count(db) == 1
+    saved = db.collection("messages").document("SM1").get().to_dict()
+    assert (saved["status"], saved["reply"], saved["attempts"]) == ("replied", reply, 1)
+
+
+def _claim(db, sid: str, age: timedelta) -> None:
+    at = (utcnow() - age).isoformat()
+    db.collection("messages").document(sid).set(
+        {"body": "run 3 points", "from": PHONE, "received_at": at, "claimed_at": at, "status": "processing"})
+
+
+def test_retry_takes_over_a_stale_claim(db):
+    seed_users(db, [Phone(PHONE, True)])
+    _claim(db, "SM1", timedelta(seconds=idempotency.CLAIM_STALE_SECONDS + 5))  # its worker died
+
+    reply = handle_incoming_message("run 3 points", PHONE, e164=PHONE, sid="SM1")
+
+    assert reply != idempotency.EMPTY_TWIML
+    assert _goal_count(db) == 1
+
+
+def test_retry_does_not_run_a_claim_still_in_flight_elsewhere(db, monkeypatch):
+    seed_users(db, [Phone(PHONE, True)])
+    monkeypatch.setattr(idempotency, "PENDING_WAIT_SECONDS", 0.05)
+    monkeypatch.setattr(idempotency, "STORAGE_POLL_SECONDS", 0.01)
+    _claim(db, "SM1", timedelta(seconds=1))
+
+    assert handle_incoming_message("run 3 points", PHONE, e164=PHONE, sid="SM1") == idempotency.EMPTY_TWIML
+    assert _goal_count(db) == 0
+
+
+def test_retry_waits_for_the_running_delivery():
+    assert idempotency.claim("SM1") is None
+    replies = []
+    retry = threading.Thread(target=lambda: replies.append(idempotency.claim("SM1")))
+    retry.start()
+
+    idempotency.finish("SM1", "<Response>ok</Response>")
+    retry.join(timeout=5)
+
+    assert replies == ["<Response>ok</Response>"]
+
+
+def test_abandoned_sid_can_be_claimed_again():
+    assert idempotency.claim("SM1") is None
+    idempotency.abandon("SM1")
+
+    assert idempotency.claim("SM1") is None
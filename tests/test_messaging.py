@@ -0,0 +1,19 @@
+from app.services import messaging_service
+from app.services.messaging_service import handle_incoming_message
+from app.tools.loadtest import Phone, seed_users
+
+PHONE = "+13125551234"
+
+
+def test_unparseable_message_from_a_bound_user_gets_help(db, monkeypatch):
+    seed_users(db, [Phone(PHONE, True)])
+
+    def broken_parser(message):
+        raise ValueError("parser bug")
+
+    monkeypatch.setattr(messaging_service, "parse_message", broken_parser)
+    reply = handle_incoming_message("???", PHONE, e164=PHONE, sid="SM1")
+
+    assert "need help?" in reply
+    saved = db.collection("messages").document("SM1").get().to_dict()
+    assert saved["parse_status"] == "failed" and saved["reply"] == reply
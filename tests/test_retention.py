@@ -0,0 +1,69 @@
+import glob
+import gzip
+import json
+import os
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from app.services import retention
+
+NOW = datetime(2026, 3, 1, tzinfo=timezone.utc)
+
+
+def _seed(db, old: int, recent: int) -> None:
+    batch = db.batch()
+    for i in range(old):
+        at = NOW - timedelta(days=400, minutes=i)
+        batch.set(db.collection("messages").document(f"SMold{i:03d}"), {"body": f"old {i}", "received_at": at.isoformat()})
+    for i in range(recent):
+        at = NOW - timedelta(days=1, minutes=i)
+        batch.set(db.collection("messages").document(f"SMnew{i:03d}"), {"body": f"new {i}", "received_at": at.isoformat()})
+    batch.commit()
+
+
+def _archived_ids(root) -> list:
+    ids = []
+    for path in glob.glob(os.path.join(root, "messages", "month=*", "*.jsonl.gz")):
+        with gzip.open(path, "rt", encoding="utf-8") as f:
+            ids.extend(json.loads(line)["id"] for line in f)
+    return ids
+
+
+def test_archives_checkpoints_and_deletes_old_messages(db, tmp_path, monkeypatch):
+    monkeypatch.setattr(retention, "PAGE_SIZE", 3)
+    _seed(db, old=10, recent=2)
+
+    stats = retention.archive_collection("messages", NOW - timedelta(days=365), str(tmp_path), "run1")
+
+    assert (stats.archived, stats.deleted) == (10, 10)
+    assert sorted(_archived_ids(tmp_path)) == [f"SMold{i:03d}" for i in range(10)]
+    assert sorted(s.id for s in db.collection("messages").get()) == ["SMnew000", "SMnew001"]
+    checkpoint = db.collection("retention_checkpoints").document("messages").get().to_dict()
+    assert checkpoint["through_id"] == "SMold000"  # the newest old message, last in received_at order
+
+
+def test_resumes_after_crash_between_checkpoint_and_delete(db, tmp_path, monkeypatch):
+    monkeypatch.setattr(retention, "PAGE_SIZE", 3)
+    _seed(db, old=10, recent=2)
+    real_delete = retention._delete
+    calls = []
+
+    def crash_on_second_page(refs):
+        calls.append(len(refs))
+        if len(calls) == 2:
+            raise RuntimeError("worker died")
+        real_delete(refs)
+
+    monkeypatch.setattr(retention, "_delete", crash_on_second_page)
+    with pytest.raises(RuntimeError):
+        retention.archive_collection("messages", NOW - timedelta(days=365), str(tmp_path), "run1")
+    assert len(_archived_ids(tmp_path)) == 6  # two pages archived, only the first deleted
+
+    monkeypatch.setattr(retention, "_delete", real_delete)
+    stats = retention.archive_collection("messages", NOW - timedelta(days=365), str(tmp_path), "run2")
+
+    ids = _archived_ids(tmp_path)
+    assert sorted(ids) == [f"SMold{i:03d}" for i in range(10)]  # each exactly once
+    assert (stats.archived, stats.deleted) == (4, 7)
+    assert sorted(s.id for s in db.collection("messages").get()) == ["SMnew000", "SMnew001"]
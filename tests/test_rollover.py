@@ -0,0 +1,85 @@
+from datetime import datetime, timedelta, timezone
+
+from app.models.models import UserRecord
+from app.services import rollover, rollups
+
+WEDNESDAY = datetime(2026, 10, 14, 12, 0, tzinfo=timezone.utc)
+MONDAY = datetime(2026, 10, 19, 12, 0, tzinfo=timezone.utc)
+
+
+def _seed(db, now: datetime, uid: str = "u1") -> str:
+    """A UTC user with one finished and two unfinished goals yesterday; returns yesterday's key."""
+    yesterday = (now - timedelta(days=1)).date().isoformat()
+    db.collection("users").document(uid).set(
+        {"user_id": uid, "activated": True, "timezone": "UTC", "phones": ["+13125550123"]})
+    goals = db.collection("users").document(uid).collection("days").document(yesterday).collection("goals")
+    created = now - timedelta(hours=20)
+    batch = db.batch()
+    for goal_id, text, points, complete in [("g1", "read", 1, True), ("g2", "run", 2, False), ("g3", "cook", 3, False)]:
+        batch.set(goals.document(goal_id), {"goal_text": text, "points": points, "complete": complete,
+                                            "synced_to_device": False, "created_at": created})
+    batch.commit()
+    return yesterday
+
+
+def _today_goals(db, uid: str, now: datetime) -> dict:
+    day = db.collection("users").document(uid).collection("days").document(now.date().isoformat())
+    return {s.id: s.to_dict() for s in day.collection("goals").get()}
+
+
+def _day(db, uid: str, now: datetime) -> dict:
+    return db.collection("users").document(uid).collection("days").document(now.date().isoformat()).get().to_dict()
+
+
+def test_carries_unfinished_goals_once(db):
+    yesterday = _seed(db, WEDNESDAY)
+
+    assert rollover.run_rollover(WEDNESDAY) == (1, 2, 0)
+    assert rollover.run_rollover(WEDNESDAY) == (0, 0, 0)
+
+    goals = _today_goals(db, "u1", WEDNESDAY)
+    assert sorted(goals) == ["g2", "g3"]
+    assert all(g["carried_from"] == yesterday and not g["complete"] for g in goals.values())
+    day = _day(db, "u1", WEDNESDAY)
+    assert (day["goals_total"], day["total_points"], day["carried"]) == (2, 5, 2)
+    assert day["version"] == 1  # one goal write, one version bump (see goal_view)
+    # Same week and month as yesterday, where these goals are already counted
+    assert rollups.get_rollup("u1", rollups.week_key(WEDNESDAY.date().isoformat()))["goals_total"] == 0
+    assert rollups.get_rollup("u1", rollups.month_key(WEDNESDAY.date().isoformat()))["goals_total"] == 0
+    assert db.collection("users").document("u1").get().to_dict()["rollover_day"] == WEDNESDAY.date().isoformat()
+
+
+def test_carry_into_a_new_week_counts_in_that_week_only(db):
+    _seed(db, MONDAY)
+
+    assert rollover.run_rollover(MONDAY) == (1, 2, 0)
+
+    today = MONDAY.date().isoformat()
+    assert rollups.get_rollup("u1", rollups.week_key(today))["goals_total"] == 2
+    week = db.collection("users").document("u1").collection("rollups").document(rollups.week_key(today)).get()
+    assert "carried" not in week.to_dict()
+    assert rollups.get_rollup("u1", rollups.month_key(today))["goals_total"] == 0
+
+
+def test_overlapping_run_with_stale_users_changes_nothing(db, monkeypatch):
+    _seed(db, WEDNESDAY)
+    stale = {"u1": UserRecord.from_doc(db.collection("users").document("u1").get().to_dict(), "u1")}
+    assert rollover.run_rollover(WEDNESDAY) == (1, 2, 0)
+    db.collection("users").document("u1").collection("days").document(WEDNESDAY.date().isoformat()) \
+        .collection("goals").document("g2").update({"complete": True})
+
+    # A second scheduler that read the user before the first run set its checkpoint
+    monkeypatch.setattr(rollover, "_load_users", lambda user_ids: stale)
+    assert rollover.run_rollover(WEDNESDAY) == (0, 0, 0)
+
+    assert _today_goals(db, "u1", WEDNESDAY)["g2"]["complete"] is True
+    day = _day(db, "u1", WEDNESDAY)
+    assert (day["goals_total"], day["carried"]) == (2, 2)
+
+
+def test_opted_out_users_are_not_carried(db):
+    _seed(db, WEDNESDAY)
+    db.collection("users").document("u1").update({"rollover": False})
+
+    assert rollover.run_rollover(WEDNESDAY) == (0, 0, 0)
+    assert _today_goals(db, "u1", WEDNESDAY) == {}
@@ -0,0 +1,26 @@
+from app.services import auth_session
+from app.services.messaging_service import handle_incoming_message
+
+PHONE = "+13125559999"
+
+
+def _bound(db) -> bool:
+    return db.collection("phone_bindings").document(PHONE).get().exists
+
+
+def test_yes_creates_the_account_only_after_the_prompt(db):
+    handle_incoming_message("yes", PHONE, e164=PHONE, sid="SM1")  # unprompted: gets the prompt
+    assert not _bound(db)
+
+    handle_incoming_message("yes", PHONE, e164=PHONE, sid="SM2")
+    assert _bound(db)
+
+
+def test_yes_after_a_restart_still_answers_the_prompt(db):
+    handle_incoming_message("hi", PHONE, e164=PHONE, sid="SM1")
+    with auth_session.store._lock:  # a new process (or another instance) has no sessions in memory
+        auth_session.store._sessions.clear()
+
+    handle_incoming_message("yes", PHONE, e164=PHONE, sid="SM2")
+
+    assert _bound(db)
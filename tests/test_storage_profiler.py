@@ -0,0 +1,30 @@
+import asyncio
+
+import httpx
+from fastapi import FastAPI
+
+from app.adapters import storage_profiler
+from app.adapters.storage_profiler import StorageBudget, install_profiling_middleware
+
+
+def test_middleware_reports_ops_and_flags_the_route_budget(db):
+    app = FastAPI()
+
+    @app.post("/things/{thing_id}")
+    def write_thing(thing_id: str):
+        db.collection("things").document(thing_id).set({"n": 1})
+        db.collection("things").document(thing_id).get()
+        return {"ok": True}
+
+    install_profiling_middleware(app, {"/things/{thing_id}": StorageBudget(reads=1, writes=0)})
+
+    async def call():
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://t") as client:
+            return await client.post("/things/a")
+
+    storage_profiler.violations.clear()
+    response = asyncio.run(call())
+
+    assert response.json() == {"ok": True}
+    assert response.headers["X-Storage-Ops"] == "reads=1;writes=1;deletes=0;calls=2"
+    assert storage_profiler.violations == ["POST /things/{thing_id}: writes 1 > budget 0"]